@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import gzip
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.transcript_archive import TranscriptArchive  # noqa: E402
+
+WORDS = "bonjour merci staff joueur ban remboursement boutique grade bug restitution preuve capture ticket".split()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def make_blob(path: str, rng: random.Random, lines: int) -> None:
+    with gzip.open(path, "wb", compresslevel=6) as f:
+        f.write(b"Transcript Ticket - bench\n" + b"-" * 50 + b"\n")
+        for i in range(lines):
+            text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 20)))
+            f.write(f"[2025-01-01 12:{i % 60:02d}:00 UTC] membre{i % 7}: {text}\n".encode("utf-8"))
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="atlas-archive-")
+    archive = TranscriptArchive(os.path.join(directory, "archive"), segment_max_bytes=args.segment_mb * 1024 * 1024)
+    await archive.open()
+    try:
+        ids = []
+        started = time.perf_counter()
+        for i in range(args.tickets):
+            blob = os.path.join(directory, f"blob-{i}.txt.gz")
+            make_blob(blob, rng, rng.randint(10, args.max_lines))
+            record = await archive.store(1, 10_000 + i, 20_000 + i % 500, "Plainte", "Plainte — bench",
+                                         1_700_000_000 + i, 1_700_003_600 + i, blob)
+            ids.append(record.id)
+        stored = time.perf_counter() - started
+        segments = [n for n in os.listdir(archive.directory) if n.startswith("segment-")]
+        size = sum(os.path.getsize(os.path.join(archive.directory, n)) for n in segments) / 1024 / 1024
+        print(f"{args.tickets} tickets archivés en {stored:.2f} s, {len(segments)} segment(s), {size:.1f} Mo")
+
+        lookups, reads = [], []
+        raw_bytes = 0
+        for _ in range(args.reads):
+            t0 = time.perf_counter()
+            record = await archive.get(1, rng.choice(ids))
+            t1 = time.perf_counter()
+            data = archive.read_text(record)
+            t2 = time.perf_counter()
+            assert len(data) == record.raw_length
+            raw_bytes += len(data)
+            lookups.append(t1 - t0)
+            reads.append(t2 - t1)
+        print(f"index : p50 {percentile(lookups, 0.5) * 1000:.2f} ms, p99 {percentile(lookups, 0.99) * 1000:.2f} ms")
+        print(f"lecture + décompression : p50 {percentile(reads, 0.5) * 1000:.2f} ms, "
+              f"p99 {percentile(reads, 0.99) * 1000:.2f} ms (moyenne {raw_bytes / args.reads / 1024:.0f} Kio)")
+        print(f"RSS max : {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} Mo")
+    finally:
+        await archive.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Écriture et relecture aléatoire de l'archive segmentée des transcripts.")
+    parser.add_argument("--tickets", type=int, default=5_000)
+    parser.add_argument("--max-lines", type=int, default=2_000)
+    parser.add_argument("--reads", type=int, default=1_000)
+    parser.add_argument("--segment-mb", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench.load_test import DATA_DIR, setup_world, webhook_url  # noqa: E402
+from bench.fake_discord import FakeAPI, FakeInteraction, FakeMessage, FakeUser, FakeWebhook, next_id  # noqa: E402
+import cogs.ticket as ticket  # noqa: E402
+from utils.scheduler import DeadlineScheduler  # noqa: E402
+
+
+async def scenario(args: argparse.Namespace) -> None:
+    # Tickets réels (faux client) avec des délais de quelques secondes : les tickets muets doivent être
+    # relancés puis fermés, ceux où l'on continue d'écrire jamais.
+    api = FakeAPI(latency=args.latency, jitter=0.0)
+    bot, guilds, staff = setup_world(api)
+    guild = guilds[0]
+    ticket.TICKET_OPEN_RATE = 1000.0
+    ticket.TICKET_OPEN_BURST = args.tickets
+    ticket.RENDER_POOL.workers = 0
+    ticket.ATTACHMENT_MIRROR.workers = 0
+    cog = ticket.Ticket(bot)
+    await cog.cog_load()
+    ticket.LOG_DELIVERY._webhooks[webhook_url(guild.id)] = FakeWebhook(api)
+
+    rng = random.Random(1)
+    players = []
+    for i in range(args.tickets):
+        player = FakeUser(api, next_id(), f"joueur{i}")
+        bot.register_user(player)
+        guild.add_member(player)
+        modal = ticket.ReasonModal(rng.choice(ticket.REASON_OPTIONS)[0])
+        modal.raison._value = "Bench inactivité"
+        await modal.on_submit(FakeInteraction(api, bot, player, guild))
+        players.append(player)
+    # Délais activés une fois tous les tickets ouverts, pour que le chrono parte du même instant.
+    for config in ticket.GUILD_CONFIGS.values():
+        config.idle_timeouts = {label: (args.remind, args.close) for label, _desc, _emoji in ticket.REASON_OPTIONS}
+    for state in list(ticket.CHANNEL_TICKETS.values()):
+        state.last_activity = time.time()
+        ticket.schedule_idle(state)
+    active = players[::2]
+    active_states = [ticket.get_ticket(guild.id, p.id) for p in active]
+    idle_channels = {ticket.get_ticket(guild.id, p.id).channel_id for p in players[1::2]}
+
+    started = time.perf_counter()
+    relay_times = []
+    while time.perf_counter() - started < args.duration:
+        for player in active:
+            t = time.perf_counter()
+            await cog.on_message(FakeMessage(player, player.dm_channel, "toujours là"))
+            relay_times.append(time.perf_counter() - t)
+        await asyncio.sleep(args.remind / 3)
+
+    closed_active = sum(1 for state in active_states if ticket.ticket_for_channel(state.channel_id) is None)
+    remaining_idle = sum(1 for cid in idle_channels if ticket.ticket_for_channel(cid) is not None)
+    reminded = sum(1 for p in players[1::2] if any("⏰" in str(m) for m in p.received))
+    relay_times.sort()
+    print(f"Tickets : {args.tickets} (moitié active pendant {args.duration:.0f} s) | relance {args.remind:.1f} s, "
+          f"fermeture {args.close:.1f} s")
+    print(f"  inactifs relancés : {reminded}/{len(idle_channels)} | inactifs encore ouverts : {remaining_idle}")
+    print(f"  actifs fermés à tort : {closed_active}/{len(active_states)}")
+    print(f"  relais joueur → staff p50 {relay_times[len(relay_times) // 2] * 1000:.2f} ms "
+          f"({len(relay_times)} messages)")
+    print(f"  échéances suivies : {len(ticket.IDLE_SCHEDULER)}, tas : {len(ticket.IDLE_SCHEDULER._heap)} entrée(s)")
+    await cog.cog_unload()
+
+
+async def synthetic(count: int) -> None:
+    # Planificateur seul : `count` clés dont l'activité repousse l'échéance avant qu'elle n'arrive
+    # (mise à jour d'un float, aucune opération sur le tas), puis toutes expirent.
+    last_activity = {}
+    fired = 0
+    timeout = 1.0
+
+    async def callback(key: int):
+        nonlocal fired
+        due = last_activity[key] + timeout
+        if due > time.time():
+            return due
+        fired += 1
+        return None
+
+    scheduler: DeadlineScheduler[int] = DeadlineScheduler(name="bench")
+    now = time.time()
+    t = time.perf_counter()
+    for key in range(count):
+        last_activity[key] = now
+        scheduler.schedule(key, now + timeout)
+    schedule_cost = (time.perf_counter() - t) / count
+
+    t = time.perf_counter()
+    touched = time.time()
+    for key in range(count):
+        last_activity[key] = touched + 0.5
+    touch_cost = (time.perf_counter() - t) / count
+
+    started = time.perf_counter()
+    scheduler.start(callback)
+    while fired < count:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    await scheduler.stop()
+    print(f"Synthétique : {count} clés | schedule {schedule_cost * 1e6:.2f} µs | activité {touch_cost * 1e9:.0f} ns | "
+          f"toutes expirées en {elapsed:.2f} s (dont 1,5 s d'attente)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Banc du balayage d'inactivité des tickets.")
+    parser.add_argument("--tickets", type=int, default=200)
+    parser.add_argument("--remind", type=float, default=1.0)
+    parser.add_argument("--close", type=float, default=2.0)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--synthetic", type=int, default=100_000)
+    args = parser.parse_args()
+    try:
+        asyncio.run(scenario(args))
+        asyncio.run(synthetic(args.synthetic))
+    finally:
+        shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+from datetime import datetime
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.transcript_log import TranscriptEntry  # noqa: E402
+
+AUTHORS = [f"joueur{i}#{1000 + i}" for i in range(20)] + [f"modo{i}" for i in range(5)]
+
+
+def _messages(count: int) -> List[tuple]:
+    rng = random.Random(42)
+    out = []
+    for _ in range(count):
+        author = rng.choice(AUTHORS)
+        staff = author.startswith("modo")
+        is_att = rng.random() < 0.1
+        content = f"https://cdn.discordapp.com/attachments/{rng.getrandbits(60)}/image.png" if is_att else "ok " * rng.randint(1, 20)
+        out.append((author, staff, content, is_att))
+    return out
+
+
+def build_dicts(messages: List[tuple]) -> list:
+    return [
+        {
+            "by": f"{author} (staff)" if staff else str(author),
+            "content": content,
+            "ts": datetime.utcnow(),
+            "internal": False,
+            "is_attachment": is_att,
+        }
+        for author, staff, content, is_att in messages
+    ]
+
+
+def build_entries(messages: List[tuple]) -> list:
+    return [
+        TranscriptEntry.now(f"{author} (staff)" if staff else str(author), content, is_attachment=is_att)
+        for author, staff, content, is_att in messages
+    ]
+
+
+def measure(builder: Callable[[List[tuple]], list], messages: List[tuple]) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    entries = builder(messages)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # Le contenu est partagé par les deux représentations : on mesure uniquement l'enveloppe.
+    assert len(entries) == len(messages)
+    return (after - before) / len(messages)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Octets par entrée de transcript : dict vs TranscriptEntry.")
+    parser.add_argument("-n", "--count", type=int, default=100_000)
+    args = parser.parse_args()
+
+    messages = _messages(args.count)
+    as_dict = measure(build_dicts, messages)
+    as_slots = measure(build_entries, messages)
+    print(f"Entrées mesurées        : {args.count}")
+    print(f"dict (avant)            : {as_dict:8.1f} octets/entrée")
+    print(f"TranscriptEntry (après) : {as_slots:8.1f} octets/entrée")
+    print(f"Gain                    : {100 * (1 - as_slots / as_dict):8.1f} %")
+
+
+if __name__ == "__main__":
+    main()
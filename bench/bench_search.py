@@ -0,0 +1,90 @@
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.search_index import KIND_MESSAGE, KIND_NOTE, SearchIndex, SearchQuery  # noqa: E402
+
+WORDS = (
+    "bonjour merci staff joueur ban kick remboursement boutique achat grade serveur bug crash "
+    "restitution inventaire katana souffle démon pourfendeur mission village rang plainte preuve "
+    "capture écran insulte triche duplication argent ticket question candidature"
+).split()
+CATEGORIES = ["Plainte", "Question", "Boutique", "Candidature Staff", "Candidature RP", "Autre"]
+GUILD_ID = 1
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    rng = random.Random(args.seed)
+    directory = tempfile.mkdtemp(prefix="atlas-search-")
+    index = SearchIndex(os.path.join(directory, "search.db"))
+    await index.open()
+    try:
+        users = [10_000 + i for i in range(args.users)]
+        ts = int(time.time()) - 365 * 86400
+        started = time.perf_counter()
+        for i in range(args.docs):
+            ts += rng.randint(1, 120)
+            user = rng.choice(users)
+            content = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 25)))
+            kind = KIND_NOTE if rng.random() < 0.05 else KIND_MESSAGE
+            index.add(GUILD_ID, user, user * 7, CATEGORIES[user % len(CATEGORIES)], kind, f"membre{user}", ts, content)
+        await index.flush()
+        indexed = time.perf_counter() - started
+        size = os.path.getsize(os.path.join(directory, "search.db")) / 1024 / 1024
+        print(f"{args.docs} documents indexés en {indexed:.2f} s ({args.docs / indexed:.0f}/s), base {size:.1f} Mo")
+
+        scenarios = {
+            "mot fréquent": lambda: SearchQuery(GUILD_ID, rng.choice(WORDS)),
+            "deux mots": lambda: SearchQuery(GUILD_ID, f"{rng.choice(WORDS)} {rng.choice(WORDS)}"),
+            "préfixe": lambda: SearchQuery(GUILD_ID, rng.choice(WORDS)[:3] + "*"),
+            "mot + joueur": lambda: SearchQuery(GUILD_ID, rng.choice(WORDS), user_id=rng.choice(users)),
+            "mot + catégorie": lambda: SearchQuery(GUILD_ID, rng.choice(WORDS), category=rng.choice(CATEGORIES)),
+            "joueur seul": lambda: SearchQuery(GUILD_ID, user_id=rng.choice(users)),
+            "phrase rare": lambda: SearchQuery(GUILD_ID, "katana duplication triche"),
+        }
+        print(f"{'requête':<18}{'p50 ms':>10}{'p99 ms':>10}{'page 5 ms':>11}")
+        for name, make in scenarios.items():
+            timings = []
+            deep = []
+            for _ in range(args.queries):
+                query = make()
+                t0 = time.perf_counter()
+                hits, cursor = await index.search(query)
+                timings.append(time.perf_counter() - t0)
+                t0 = time.perf_counter()
+                for _page in range(4):
+                    if cursor is None:
+                        break
+                    hits, cursor = await index.search(query, cursor)
+                deep.append(time.perf_counter() - t0)
+            print(f"{name:<18}{percentile(timings, 0.5) * 1000:>10.2f}{percentile(timings, 0.99) * 1000:>10.2f}"
+                  f"{percentile(deep, 0.5) * 1000 / 4:>11.2f}")
+    finally:
+        await index.close()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latence de /recherche sur un index FTS5 synthétique.")
+    parser.add_argument("--docs", type=int, default=300_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
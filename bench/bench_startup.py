@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def rss_mb() -> float:
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def child(steady: float) -> None:
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    started = time.perf_counter()
+    import main
+
+    main.load_settings()
+    bot = main.create_bot()
+    result = {}
+
+    async def on_ready():
+        if result:
+            return
+        result["time_to_ready"] = time.perf_counter() - started
+        result["rss_ready"] = rss_mb()
+        await asyncio.sleep(steady)
+        result["rss_steady"] = rss_mb()
+        result["guilds"] = len(bot.guilds)
+        result["members_cached"] = sum(len(g.members) for g in bot.guilds)
+        result["users_cached"] = len(bot.users)
+        result["messages_cached"] = len(bot.cached_messages)
+        print("BENCH " + json.dumps(result), flush=True)
+        await bot.close()
+
+    bot.add_listener(on_ready, "on_ready")
+    asyncio.run(main.run())
+
+
+def run_mode(low_memory: bool, steady: float) -> dict:
+    env = dict(os.environ, LOW_MEMORY_MODE="1" if low_memory else "0", METRICS_PORT="0")
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--steady", str(steady)],
+        env=env, capture_output=True, text=True, timeout=steady + 600,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH "):
+            return json.loads(line[len("BENCH "):])
+    raise RuntimeError(f"Le bot ne s'est pas connecté :\n{proc.stdout}\n{proc.stderr}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare le temps jusqu'à on_ready et la RSS stable entre le mode normal et LOW_MEMORY_MODE "
+                    "(nécessite TOKEN et GUILDID dans l'environnement ou le .env)."
+    )
+    parser.add_argument("--steady", type=float, default=60.0, help="secondes à attendre après on_ready avant la mesure stable")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.steady)
+        return
+
+    rows = [("normal", run_mode(False, args.steady)), ("basse mémoire", run_mode(True, args.steady))]
+    print(f"{'mode':<16}{'on_ready s':>12}{'RSS ready Mo':>14}{'RSS stable Mo':>15}{'membres':>10}{'users':>8}{'messages':>10}")
+    for name, r in rows:
+        print(f"{name:<16}{r['time_to_ready']:>12.2f}{r['rss_ready']:>14.1f}{r['rss_steady']:>15.1f}"
+              f"{r['members_cached']:>10}{r['users_cached']:>8}{r['messages_cached']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from utils.stats import TicketStats  # noqa: E402
+
+CATEGORIES = ["Plainte", "Question", "Boutique", "Candidature Staff", "Candidature RP", "Autre"]
+GUILD_ID = 1
+
+
+def exact_quantile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    directory = tempfile.mkdtemp(prefix="atlas-stats-")
+    path = os.path.join(directory, "stats.db")
+    try:
+        rng = random.Random(args.seed)
+        stats = TicketStats(path, persist_interval=3600)
+        await stats.open()
+        now = time.time()
+        start = now - args.days * 86400
+        replies, durations = [], []
+        t = time.perf_counter()
+        events = 0
+        for i in range(args.days * args.per_day):
+            opened = start + rng.uniform(0, args.days * 86400)
+            category = rng.choice(CATEGORIES)
+            stats.ticket_opened(GUILD_ID, category, ts=opened)
+            reply = rng.lognormvariate(7, 1.2)
+            duration = reply + rng.lognormvariate(9, 1.0)
+            stats.first_reply(GUILD_ID, category, reply, ts=opened + reply)
+            for k in range(args.messages):
+                stats.message(GUILD_ID, category, staff=bool(k % 2), ts=opened + duration * k / args.messages)
+            stats.ticket_closed(GUILD_ID, category, duration, ts=min(now - 1, opened + duration))
+            replies.append(reply)
+            durations.append(duration)
+            events += 3 + args.messages
+        feed = time.perf_counter() - t
+        print(f"{args.days * args.per_day} tickets sur {args.days} jours, {events} événements : "
+              f"{feed / events * 1e6:.2f} µs par événement")
+
+        for label, seconds in (("24 h", 86400), ("7 jours", 7 * 86400), ("30 jours", 30 * 86400),
+                               ("90 jours", 90 * 86400), ("365 jours", 365 * 86400)):
+            t = time.perf_counter()
+            per_category = stats.summary(GUILD_ID, now - seconds)
+            elapsed = time.perf_counter() - t
+            opened = sum(b.opened for b in per_category.values())
+            print(f"  résumé {label:<10} {elapsed * 1000:7.2f} ms ({opened} tickets)")
+
+        total = stats.summary(GUILD_ID, start)
+        merged = None
+        for bucket in total.values():
+            if merged is None:
+                merged = bucket
+            else:
+                merged.merge(bucket)
+        for name, sketch, values in (("1re réponse", merged.first_reply, replies), ("durée", merged.duration, durations)):
+            errors = []
+            for q in (0.5, 0.9, 0.99):
+                exact = exact_quantile(values, q)
+                errors.append(f"p{int(q * 100)} {abs(sketch.quantile(q) - exact) / exact * 100:.2f} %")
+            print(f"  erreur relative {name} : " + ", ".join(errors))
+
+        t = time.perf_counter()
+        await stats.close()
+        persisted = time.perf_counter() - t
+        t = time.perf_counter()
+        reloaded = TicketStats(path)
+        await reloaded.open()
+        reload_time = time.perf_counter() - t
+        check = sum(b.opened for b in reloaded.summary(GUILD_ID, start).values())
+        await reloaded.close()
+        print(f"Écriture {persisted:.2f} s, rechargement {reload_time:.2f} s ({check} tickets relus), "
+              f"base {os.path.getsize(path) / 1024:.0f} Kio")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Banc des statistiques incrémentales (/stats).")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--per-day", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=10, help="messages par ticket")
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
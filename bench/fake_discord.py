@@ -0,0 +1,410 @@
+import asyncio
+import contextvars
+import itertools
+import random
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+import discord
+from aiohttp import web
+
+_ids = itertools.count(1_100_000_000_000_000_000)
+
+CURRENT_OP: contextvars.ContextVar[str] = contextvars.ContextVar("CURRENT_OP", default="arrière-plan")
+
+
+def next_id() -> int:
+    return next(_ids)
+
+
+class FakeAPI:
+    # Simule l'API REST : chaque appel attend une latence aléatoire et est compté par opération.
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, seed: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.calls: Counter = Counter()
+        self.calls_by_op: Counter = Counter()
+        # (route, opération courante) → opération à créditer ; None : l'opération courante.
+        self.attribute: Optional[Callable[[str, str], str]] = None
+
+    async def call(self, route: str) -> None:
+        self.calls[route] += 1
+        op = CURRENT_OP.get()
+        self.calls_by_op[self.attribute(route, op) if self.attribute else op] += 1
+        delay = self.latency + self.rng.uniform(-self.jitter, self.jitter)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+
+class FakeRole:
+    def __init__(self, role_id: int, name: str = "@everyone"):
+        self.id = role_id
+        self.name = name
+
+
+class FakeUser:
+    def __init__(self, api: FakeAPI, user_id: int, name: str, bot: bool = False):
+        self.api = api
+        self.id = user_id
+        self.name = name
+        self.discriminator = "0"
+        self.bot = bot
+        self.dm_channel: Optional["FakeDMChannel"] = None
+        self.received: List[Any] = []
+
+    def __str__(self) -> str:
+        return self.name
+
+    @property
+    def mention(self) -> str:
+        return f"<@{self.id}>"
+
+    async def create_dm(self) -> "FakeDMChannel":
+        if self.dm_channel is None:
+            await self.api.call("users.create_dm")
+            self.dm_channel = FakeDMChannel(self.api, self)
+        return self.dm_channel
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> None:
+        dm = await self.create_dm()
+        await dm.send(content, **kwargs)
+
+
+class FakeDMChannel(discord.DMChannel):
+    def __init__(self, api: FakeAPI, recipient: FakeUser):
+        self.api = api
+        self.id = next_id()
+        self.recipient_user = recipient
+        self._state = None
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> "FakeMessage":
+        await self.api.call("dm.send")
+        self.recipient_user.received.append(content if content is not None else kwargs)
+        return FakeMessage(None, self, content or "")
+
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, api: FakeAPI, guild: "FakeGuild", name: str, category_id: Optional[int] = None,
+                 topic: Optional[str] = None, overwrites: Optional[dict] = None):
+        self.api = api
+        self.id = next_id()
+        self.name = name
+        self.guild = guild
+        self.category_id = category_id
+        self.topic = topic
+        self.position = 0
+        self._state = None
+        self._fake_overwrites = dict(overwrites or {})
+        self.sent: List[Any] = []
+        self.deleted = False
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> None:
+        await self.api.call("channel.send")
+        self.sent.append(content if content is not None else kwargs)
+
+    async def delete(self, *, reason: Optional[str] = None) -> None:
+        await self.api.call("channel.delete")
+        self.deleted = True
+        self.guild.remove_channel(self)
+
+    async def edit(self, **kwargs) -> "FakeTextChannel":
+        await self.api.call("channel.edit")
+        for key in ("name", "topic", "category_id", "position"):
+            if key in kwargs:
+                setattr(self, key, kwargs[key])
+        if "category" in kwargs:
+            self.category_id = kwargs["category"].id
+        if "overwrites" in kwargs:
+            self._fake_overwrites = dict(kwargs["overwrites"])
+        return self
+
+    async def set_permissions(self, target: Any, *, overwrite: Any = None, **kwargs) -> None:
+        await self.api.call("channel.set_permissions")
+        self._fake_overwrites[target] = overwrite
+
+
+class FakeCategory(discord.CategoryChannel):
+    def __init__(self, api: FakeAPI, guild: "FakeGuild", category_id: int, name: str):
+        self.api = api
+        self.id = category_id
+        self.name = name
+        self.guild = guild
+        self.position = 0
+        self.category_id = None
+        self._state = None
+
+    @property
+    def channels(self) -> List[FakeTextChannel]:
+        return [c for c in self.guild.text_channels if c.category_id == self.id]
+
+    @property
+    def text_channels(self) -> List[FakeTextChannel]:
+        return self.channels
+
+    async def create_text_channel(self, name: str, **kwargs) -> FakeTextChannel:
+        await self.api.call("guild.create_channel")
+        ch = FakeTextChannel(self.api, self.guild, name, self.id, kwargs.get("topic"), kwargs.get("overwrites"))
+        self.guild.add_channel(ch)
+        return ch
+
+
+class FakeGuild:
+    def __init__(self, api: FakeAPI, guild_id: int, name: str = "Atlas Bench"):
+        self.api = api
+        self.id = guild_id
+        self.name = name
+        self.default_role = FakeRole(guild_id)
+        self.member_count = 0
+        self._channels: Dict[int, Any] = {}
+        self._roles: Dict[int, FakeRole] = {}
+        self._members: Dict[int, FakeUser] = {}
+
+    def add_channel(self, channel: Any) -> None:
+        self._channels[channel.id] = channel
+
+    def remove_channel(self, channel: Any) -> None:
+        self._channels.pop(channel.id, None)
+
+    def add_category(self, category_id: int, name: str) -> FakeCategory:
+        cat = FakeCategory(self.api, self, category_id, name)
+        self.add_channel(cat)
+        return cat
+
+    @property
+    def text_channels(self) -> List[FakeTextChannel]:
+        return [c for c in self._channels.values() if isinstance(c, FakeTextChannel)]
+
+    @property
+    def channels(self) -> List[Any]:
+        return list(self._channels.values())
+
+    def get_channel(self, channel_id: int) -> Optional[Any]:
+        return self._channels.get(channel_id)
+
+    def get_role(self, role_id: int) -> Optional[FakeRole]:
+        return self._roles.get(role_id)
+
+    def get_emoji(self, emoji_id: int) -> None:
+        return None
+
+    def get_member(self, user_id: int) -> Optional[FakeUser]:
+        return self._members.get(user_id)
+
+    def add_member(self, user: FakeUser) -> None:
+        self._members[user.id] = user
+        self.member_count = len(self._members)
+
+
+class FakeBot:
+    def __init__(self, api: FakeAPI, cache_users: bool = True):
+        self.api = api
+        self.cache_users = cache_users
+        self.user = FakeUser(api, next_id(), "AtlasBot", bot=True)
+        self.guilds: List[FakeGuild] = []
+        self._users: Dict[int, FakeUser] = {}
+        self.views: List[discord.ui.View] = []
+
+    def add_guild(self, guild: FakeGuild) -> None:
+        self.guilds.append(guild)
+
+    def register_user(self, user: FakeUser) -> None:
+        self._users[user.id] = user
+
+    def get_guild(self, guild_id: int) -> Optional[FakeGuild]:
+        return next((g for g in self.guilds if g.id == guild_id), None)
+
+    def get_channel(self, channel_id: int) -> Optional[Any]:
+        for g in self.guilds:
+            ch = g.get_channel(channel_id)
+            if ch is not None:
+                return ch
+        return None
+
+    def get_user(self, user_id: int) -> Optional[FakeUser]:
+        return self._users.get(user_id) if self.cache_users else None
+
+    async def fetch_user(self, user_id: int) -> FakeUser:
+        await self.api.call("users.fetch")
+        user = self._users.get(user_id)
+        if user is None:
+            raise discord.NotFound(_FakeResponse(404), "Unknown User")
+        return user
+
+    def get_emoji(self, emoji_id: int) -> None:
+        return None
+
+    def add_view(self, view: discord.ui.View, **kwargs) -> None:
+        self.views.append(view)
+
+    def is_ready(self) -> bool:
+        return True
+
+
+class _FakeResponse:
+    def __init__(self, status: int):
+        self.status = status
+        self.reason = "fake"
+        self.headers: Dict[str, str] = {}
+
+
+class FakeInteractionResponse:
+    def __init__(self, api: FakeAPI):
+        self.api = api
+        self._done = False
+        self.messages: List[Any] = []
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def send_message(self, content: Optional[str] = None, **kwargs) -> None:
+        if self._done:
+            raise discord.InteractionResponded(None)
+        await self.api.call("interaction.respond")
+        self._done = True
+        self.messages.append(content if content is not None else kwargs)
+
+    async def defer(self, **kwargs) -> None:
+        if self._done:
+            raise discord.InteractionResponded(None)
+        await self.api.call("interaction.defer")
+        self._done = True
+
+    async def edit_message(self, **kwargs) -> None:
+        if self._done:
+            raise discord.InteractionResponded(None)
+        await self.api.call("interaction.edit")
+        self._done = True
+        self.messages.append(kwargs)
+
+    async def send_modal(self, modal: discord.ui.Modal) -> None:
+        await self.api.call("interaction.modal")
+        self._done = True
+
+
+class FakeFollowup:
+    def __init__(self, api: FakeAPI):
+        self.api = api
+        self.messages: List[Any] = []
+
+    async def send(self, content: Optional[str] = None, **kwargs) -> "FakeFollowupMessage":
+        await self.api.call("interaction.followup")
+        msg = FakeFollowupMessage(self.api, content)
+        self.messages.append(msg)
+        return msg
+
+
+class FakeFollowupMessage:
+    def __init__(self, api: FakeAPI, content: Optional[str]):
+        self.api = api
+        self.content = content
+
+    async def edit(self, content: Optional[str] = None, **kwargs) -> None:
+        await self.api.call("interaction.edit")
+        self.content = content
+
+
+class FakeInteraction:
+    def __init__(self, api: FakeAPI, client: FakeBot, user: FakeUser, guild: FakeGuild, channel: Any = None):
+        self.id = next_id()
+        self.client = client
+        self.user = user
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = channel
+        self.response = FakeInteractionResponse(api)
+        self.followup = FakeFollowup(api)
+
+    async def edit_original_response(self, content: Optional[str] = None, **kwargs) -> None:
+        await self.response.api.call("interaction.edit")
+
+
+class FakeCDN:
+    # Faux CDN HTTP local : contenu déterministe dérivé de `seed` (deux pièces jointes de même graine
+    # ont les mêmes octets), envoyé par blocs après une latence simulée.
+    def __init__(self, latency: float = 0.05, chunk: int = 64 * 1024):
+        self.latency = latency
+        self.chunk = chunk
+        self.requests = 0
+        self.active = 0
+        self.max_active = 0
+        self.base_url = ""
+        self._runner: Optional[web.AppRunner] = None
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            size = int(request.query.get("size", "150000"))
+            block = random.Random(request.query.get("seed", request.match_info["att_id"])).randbytes(self.chunk)
+            await asyncio.sleep(self.latency)
+            resp = web.StreamResponse(headers={"Content-Type": "application/octet-stream"})
+            resp.content_length = size
+            await resp.prepare(request)
+            sent = 0
+            while sent < size:
+                part = block[:min(self.chunk, size - sent)]
+                await resp.write(part)
+                sent += len(part)
+            await resp.write_eof()
+            return resp
+        finally:
+            self.active -= 1
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/attachments/{att_id}/{filename}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://127.0.0.1:{port}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def url_for(self, att_id: int, filename: str, size: int, seed: Optional[str] = None) -> str:
+        return f"{self.base_url}/attachments/{att_id}/{filename}?size={size}&seed={seed or att_id}"
+
+
+class FakeAttachment:
+    def __init__(self, filename: str, size: int = 150_000, cdn: Optional[FakeCDN] = None, seed: Optional[str] = None):
+        self.id = next_id()
+        self.filename = filename
+        self.size = size
+        if cdn is not None:
+            self.url = cdn.url_for(self.id, filename, size, seed)
+        else:
+            self.url = f"https://cdn.discordapp.com/attachments/{self.id}/{filename}"
+
+
+class FakeMessage:
+    def __init__(self, author: Optional[FakeUser], channel: Any, content: str = "",
+                 attachments: Optional[List[FakeAttachment]] = None, reply_to: Optional["FakeMessage"] = None):
+        self.id = next_id()
+        self.author = author
+        self.channel = channel
+        self.guild = getattr(channel, "guild", None)
+        self.content = content
+        self.attachments = attachments or []
+        self.created_at = time.time()
+        self.reference = discord.MessageReference(message_id=reply_to.id, channel_id=channel.id) if reply_to else None
+
+
+class FakeWebhook:
+    def __init__(self, api: FakeAPI):
+        self.api = api
+        self.sent = 0
+
+    async def send(self, **kwargs) -> None:
+        await self.api.call("webhook.send")
+        self.sent += 1
@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Awaitable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Les workers de rendu (spawn) réimportent ce script : ils doivent retrouver le même dossier de données.
+DATA_DIR = os.environ.get("ATLAS_BENCH_DATA_DIR") or tempfile.mkdtemp(prefix="atlas-bench-")
+os.environ["ATLAS_BENCH_DATA_DIR"] = DATA_DIR
+os.environ["TICKET_DATA_DIR"] = DATA_DIR
+os.environ.setdefault("GUILDID", "1100000000000000001")
+os.environ["TICKET_LOGS_WEBHOOK_URL"] = ""
+os.environ.setdefault("METRICS_PORT", "0")
+
+from bench.fake_discord import (  # noqa: E402
+    CURRENT_OP, FakeAPI, FakeAttachment, FakeBot, FakeCDN, FakeGuild, FakeInteraction,
+    FakeMessage, FakeTextChannel, FakeUser, FakeWebhook, next_id,
+)
+import cogs.ticket as ticket  # noqa: E402
+from utils.attachment_mirror import MIRROR_DOWNLOADS  # noqa: E402
+from utils.guild_config import GuildConfig  # noqa: E402
+
+OP_OPEN = "ouverture (on_submit)"
+OP_RELAY_IN = "relais joueur → staff"
+OP_RELAY_OUT = "relais staff → joueur"
+OP_COMMENT = "/commentaire"
+OP_CLOSE = "fermeture"
+# Un worker de relais hérite de l'opération qui l'a démarré, quel que soit le sens de ce qu'il envoie ensuite :
+# ses envois sont crédités selon la route (DM : vers le joueur, salon : vers le staff).
+RELAY_ROUTES = {"dm.send": OP_RELAY_OUT, "channel.send": OP_RELAY_IN}
+
+
+def attribute_call(route: str, op: str) -> str:
+    if op in (OP_RELAY_IN, OP_RELAY_OUT):
+        return RELAY_ROUTES.get(route, op)
+    return op
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+
+    async def timed(self, op: str, coro: Awaitable) -> None:
+        token = CURRENT_OP.set(op)
+        start = time.perf_counter()
+        try:
+            await coro
+        finally:
+            self.latencies[op].append(time.perf_counter() - start)
+            CURRENT_OP.reset(token)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def sample_loop_lag(samples: List[float], interval: float = 0.01) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        samples.append(max(0.0, loop.time() - expected))
+
+
+def webhook_url(guild_id: int) -> str:
+    return f"https://discord.com/api/webhooks/{guild_id}/{'x' * 68}"
+
+
+def setup_world(api: FakeAPI, guild_count: int = 1, categories_per_reason: int = 1):
+    bot = FakeBot(api)
+    staff = FakeUser(api, next_id(), "modo")
+    bot.register_user(staff)
+    guilds = []
+    ticket.GUILD_CONFIGS.clear()
+    for g in range(guild_count):
+        guild = FakeGuild(api, ticket.GUILD_ID if g == 0 else next_id(), f"Atlas Bench {g}")
+        bot.add_guild(guild)
+        categories: Dict[str, List[int]] = {}
+        for index, (label, _desc, _emoji) in enumerate(ticket.REASON_OPTIONS):
+            categories[label] = []
+            for overflow in range(categories_per_reason):
+                category_id = next_id()
+                guild.add_category(category_id, f"tickets-{index}-{overflow}")
+                categories[label].append(category_id)
+        logs = FakeTextChannel(api, guild, "logs-tickets")
+        guild.add_channel(logs)
+        guild.add_member(staff)
+        ticket.GUILD_CONFIGS[guild.id] = GuildConfig(guild.id, logs.id, webhook_url(guild.id), categories)
+        guilds.append(guild)
+    return bot, guilds, staff
+
+
+async def run_ticket(rec: Recorder, cog: "ticket.Ticket", bot: FakeBot, guild: FakeGuild, staff: FakeUser,
+                     player: FakeUser, cdn: Optional[FakeCDN], args: argparse.Namespace, rng: random.Random) -> None:
+    await asyncio.sleep(rng.uniform(0, args.ramp))
+    reason = rng.choice(ticket.REASON_OPTIONS)[0]
+    modal = ticket.ReasonModal(reason)
+    modal.raison._value = "Problème de bench"
+    await rec.timed(OP_OPEN, modal.on_submit(FakeInteraction(bot.api, bot, player, guild)))
+
+    state = ticket.get_ticket(guild.id, player.id)
+    if state is None:
+        return
+    channel = guild.get_channel(state.channel_id)
+
+    for i in range(args.messages):
+        # Graines tirées dans un petit ensemble : une partie des captures est postée dans plusieurs tickets.
+        attachments = [FakeAttachment(f"capture-{i}-{k}.png", cdn=cdn, seed=f"capture-{rng.randrange(args.distinct_attachments)}")
+                       for k in range(rng.randint(1, 5))] \
+            if rng.random() < args.attachment_ratio else []
+        await rec.timed(OP_RELAY_IN, cog.on_message(
+            FakeMessage(player, player.dm_channel, f"message joueur {i} " * rng.randint(1, 8), attachments)
+        ))
+        await asyncio.sleep(rng.uniform(0, args.think))
+        await rec.timed(OP_RELAY_OUT, cog.on_message(
+            FakeMessage(staff, channel, f"réponse staff {i}")
+        ))
+        await asyncio.sleep(rng.uniform(0, args.think))
+
+    for i in range(args.comments):
+        await rec.timed(OP_COMMENT, cog.commentaire.callback(
+            cog, FakeInteraction(bot.api, bot, staff, guild, channel), f"note interne {i}"
+        ))
+
+    view = ticket.TicketAdminView()
+    await rec.timed(OP_CLOSE, view.close.callback(FakeInteraction(bot.api, bot, staff, guild, channel)))
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    api = FakeAPI(latency=args.latency, jitter=args.jitter, seed=args.seed)
+    api.attribute = attribute_call
+    bot, guilds, staff = setup_world(api, args.guilds, args.categories)
+    rng = random.Random(args.seed)
+
+    ticket.CHANNEL_POOL.size = args.pool
+    ticket.RENDER_POOL.workers = args.render_workers
+    ticket.ATTACHMENT_MIRROR.workers = args.mirror_workers
+    cdn: Optional[FakeCDN] = None
+    if args.mirror_workers:
+        cdn = FakeCDN(latency=args.latency)
+        await cdn.start()
+    ticket.TICKET_OPEN_RATE = args.open_rate
+    ticket.TICKET_OPEN_BURST = args.open_burst
+    cog = ticket.Ticket(bot)
+    await cog.cog_load()
+    webhook = FakeWebhook(api)
+    for guild in guilds:
+        ticket.LOG_DELIVERY._webhooks[webhook_url(guild.id)] = webhook
+    await cog.on_ready()
+    if args.pool:
+        categories = [c for guild in guilds for c in ticket.ticket_categories(guild)]
+        while any(ticket.CHANNEL_POOL.available(c.id) < args.pool for c in categories):
+            await asyncio.sleep(0.05)
+
+    players = []
+    for i in range(args.tickets):
+        player = FakeUser(api, next_id(), f"joueur{i}")
+        guild = guilds[i % len(guilds)]
+        bot.register_user(player)
+        guild.add_member(player)
+        players.append((guild, player))
+
+    lag: List[float] = []
+    sampler = asyncio.create_task(sample_loop_lag(lag))
+    rec = Recorder()
+    calls_before = api.total
+    started = time.perf_counter()
+    await asyncio.gather(*(run_ticket(rec, cog, bot, g, staff, p, cdn, args, rng) for g, p in players))
+    handlers_done = time.perf_counter() - started
+
+    deadline = time.monotonic() + args.drain_timeout
+    while (len(ticket.LOG_DELIVERY) or ticket.CLOSE_TASKS) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    drained = time.perf_counter() - started
+    sampler.cancel()
+    await cog.cog_unload()
+    if cdn is not None:
+        await cdn.stop()
+
+    print(f"Tickets : {args.tickets} sur {len(guilds)} serveur(s) | messages/ticket : {args.messages} x2 | latence API simulée : "
+          f"{args.latency * 1000:.0f} ms ± {args.jitter * 1000:.0f} ms")
+    print(f"Handlers terminés en {handlers_done:.2f} s, logs livrés en {drained:.2f} s "
+          f"({webhook.sent} envoi(s) webhook, {len(ticket.LOG_DELIVERY)} en attente)")
+    print()
+    print(f"{'opération':<26}{'n':>7}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'appels/op':>11}")
+    for op in (OP_OPEN, OP_RELAY_IN, OP_RELAY_OUT, OP_COMMENT, OP_CLOSE):
+        values = rec.latencies.get(op, [])
+        if not values:
+            continue
+        per_op = api.calls_by_op[op] / len(values)
+        print(f"{op:<26}{len(values):>7}{percentile(values, 0.5) * 1000:>10.2f}"
+              f"{percentile(values, 0.99) * 1000:>10.2f}{max(values) * 1000:>10.2f}{per_op:>11.2f}")
+    print("  (envois des workers de relais imputés selon leur sens : dm.send → staff → joueur, channel.send → joueur → staff)")
+    background = api.calls_by_op["arrière-plan"]
+    print()
+    print(f"Appels API : {api.total - calls_before} au total, dont {background} en arrière-plan")
+    for route, count in sorted(api.calls.items(), key=lambda kv: -kv[1]):
+        print(f"  {route:<28}{count:>8}")
+    print()
+    print(f"Retard boucle d'événements : p50 {percentile(lag, 0.5) * 1000:.2f} ms | "
+          f"p99 {percentile(lag, 0.99) * 1000:.2f} ms | max {max(lag, default=0) * 1000:.2f} ms")
+    if cdn is not None:
+        results = {r: int(MIRROR_DOWNLOADS.get(result=r)) for r in ("stored", "deduplicated", "cached", "failed")}
+        print(f"Miroir : {cdn.requests} téléchargement(s), {cdn.max_active} simultané(s) au plus | "
+              + ", ".join(f"{r} {n}" for r, n in results.items()))
+    print(f"RSS max : {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} Mo")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Banc de charge hors ligne du cog ticket (faux client Discord).")
+    parser.add_argument("--tickets", type=int, default=300)
+    parser.add_argument("--messages", type=int, default=20, help="messages par sens et par ticket")
+    parser.add_argument("--comments", type=int, default=2)
+    parser.add_argument("--attachment-ratio", type=float, default=0.15)
+    parser.add_argument("--latency", type=float, default=0.05, help="latence API simulée (s)")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--think", type=float, default=0.05, help="pause max entre deux messages (s)")
+    parser.add_argument("--ramp", type=float, default=1.0, help="étalement des ouvertures (s)")
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--guilds", type=int, default=1, help="serveurs servis par le même processus")
+    parser.add_argument("--categories", type=int, default=1, help="catégories (débordement compris) par raison")
+    parser.add_argument("--open-rate", type=float, default=ticket.TICKET_OPEN_RATE, help="admissions par seconde")
+    parser.add_argument("--open-burst", type=int, default=ticket.TICKET_OPEN_BURST)
+    parser.add_argument("--pool", type=int, default=0, help="taille de la réserve de salons par catégorie")
+    parser.add_argument("--render-workers", type=int, default=ticket.TICKET_RENDER_WORKERS,
+                        help="processus de rendu des transcripts (0 : pool de threads)")
+    parser.add_argument("--mirror-workers", type=int, default=ticket.TICKET_MIRROR_WORKERS,
+                        help="téléchargements simultanés du miroir de pièces jointes (0 : désactivé)")
+    parser.add_argument("--distinct-attachments", type=int, default=200,
+                        help="contenus distincts parmi les pièces jointes simulées")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-data", action="store_true", help="conserve le dossier de données temporaire")
+    args = parser.parse_args()
+    try:
+        asyncio.run(main_async(args))
+    finally:
+        if not args.keep_data:
+            shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
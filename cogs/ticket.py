@@ -1,32 +1,96 @@
+import io
 import os
-from io import BytesIO
-from typing import Optional, Dict, List
-from datetime import datetime
+import time
+import asyncio
+from typing import Awaitable, Callable, Optional, Dict, List, Set, Tuple
+from datetime import datetime, timezone
 
 import aiohttp
 import discord
 from discord.ext import commands
 from discord import app_commands
 
+from utils import metrics
+from utils.admission import AdmissionController
+from utils.attachment_mirror import AttachmentMirror
+from utils.cache import TTLCache
+from utils.channel_pool import ChannelPool
+from utils.comments import CommentIndex
+from utils.guild_config import GuildConfig, load_guild_configs
+from utils.log_delivery import DELIVERIES, LogDeliveryQueue
+from utils.relay import RelayTarget, TicketRelay, TokenBucketLimiter
+from utils.render_worker import RenderJob, RenderPool
+from utils.scheduler import DeadlineScheduler
+from utils.search_index import KIND_ATTACHMENT, KIND_MESSAGE, KIND_NOTE, SearchHit, SearchIndex, SearchQuery
+from utils.stats import StatsBucket, TicketStats
+from utils.ticket_store import SQLiteTicketStore, TicketStore
+from utils.transcript_archive import ArchiveRecord, TranscriptArchive
+from utils.transcript_log import TranscriptEntry, TranscriptLog, TranscriptLogRegistry
+
 GUILD_ID = int(os.getenv("GUILDID", 0))
 LOGS_CHANNEL_ID = 1406806852536107088
 TICKET_LOGS_WEBHOOK_URL = os.getenv("TICKET_LOGS_WEBHOOK_URL", "")
+TICKET_LOGS_GZIP = os.getenv("TICKET_LOGS_GZIP", "0") == "1"
+TICKET_LOGS_HTML = os.getenv("TICKET_LOGS_HTML", "0") == "1"
+TICKET_RENDER_WORKERS = int(os.getenv("TICKET_RENDER_WORKERS", "1"))
+TICKET_MIRROR_WORKERS = int(os.getenv("TICKET_MIRROR_WORKERS", "4"))
+TICKET_MIRROR_MAX_BYTES = int(os.getenv("TICKET_MIRROR_MAX_BYTES", str(25 * 1024 * 1024)))
+TICKET_ATTACHMENT_BASE_URL = os.getenv("TICKET_ATTACHMENT_BASE_URL", "")
+# 0 : les copies locales sont gardées sans limite (data/attachments grossit avec chaque fichier distinct).
+TICKET_MIRROR_RETENTION_DAYS = float(os.getenv("TICKET_MIRROR_RETENTION_DAYS", "0"))
+DATA_DIR = os.getenv("TICKET_DATA_DIR", "data")
+RELAY_COALESCE_WINDOW = float(os.getenv("TICKET_RELAY_WINDOW", "0.2"))
+CHANNEL_POOL_SIZE = int(os.getenv("TICKET_CHANNEL_POOL_SIZE", "0"))
+TICKET_OPEN_RATE = float(os.getenv("TICKET_OPEN_RATE", "2"))
+TICKET_OPEN_BURST = int(os.getenv("TICKET_OPEN_BURST", "5"))
+USER_CACHE_SIZE = int(os.getenv("TICKET_USER_CACHE_SIZE", "1024"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "9108"))
+GUILDS_CONFIG_PATH = os.getenv("TICKET_GUILDS_CONFIG", os.path.join("config", "guilds.json"))
+TICKET_IDLE_SWEEP = os.getenv("TICKET_IDLE_SWEEP", "1") == "1"
 
 CUSTOM_EMOJI_ID = 1398652125180854382
 
-TICKET_CATEGORIES: Dict[str, int] = {
-    "Plainte": 1406833167385624646,
-    "Question": 0,
-    "Boutique": 0,
-    "Candidature Staff": 0,
-    "Candidature RP": 0,
-    "Autre": 0,
+# Plusieurs catégories par raison : Discord limite une catégorie à 50 salons, les suivantes servent de débordement.
+TICKET_CATEGORIES: Dict[str, List[int]] = {
+    "Plainte": [1406833167385624646],
+    "Question": [],
+    "Boutique": [],
+    "Candidature Staff": [],
+    "Candidature RP": [],
+    "Autre": [],
+}
+MAX_CHANNELS_PER_CATEGORY = 50
+
+# Par raison : (relance, fermeture automatique) en secondes sans message ; surchargeable par serveur (`idle`).
+TICKET_IDLE_TIMEOUTS: Dict[str, Tuple[float, float]] = {
+    "Plainte": (72 * 3600, 168 * 3600),
+    "Question": (24 * 3600, 48 * 3600),
+    "Boutique": (48 * 3600, 96 * 3600),
+    "Candidature Staff": (72 * 3600, 168 * 3600),
+    "Candidature RP": (72 * 3600, 168 * 3600),
+    "Autre": (24 * 3600, 48 * 3600),
 }
+# Serveur indisponible au moment d'une échéance (shard pas encore prêt…) : on repasse plus tard.
+IDLE_RETRY_DELAY = 600.0
 
 ROLE_TO_PING: Optional[int] = None
 BANNER_URL: Optional[str] = None
 EMBED_COLOR = discord.Color.dark_grey()
 
+# Guilde unique décrite par GUILDID et les constantes ci-dessus, utilisée quand config/guilds.json est absent.
+DEFAULT_GUILD_CONFIG = GuildConfig(
+    guild_id=GUILD_ID,
+    logs_channel_id=LOGS_CHANNEL_ID,
+    logs_webhook_url=TICKET_LOGS_WEBHOOK_URL,
+    categories=TICKET_CATEGORIES,
+    role_to_ping=ROLE_TO_PING,
+    banner_url=BANNER_URL,
+    idle_timeouts=TICKET_IDLE_TIMEOUTS,
+)
+GUILD_CONFIGS: Dict[int, GuildConfig] = load_guild_configs(GUILDS_CONFIG_PATH, DEFAULT_GUILD_CONFIG)
+COMMAND_GUILDS = [discord.Object(id=guild_id) for guild_id in GUILD_CONFIGS] or [discord.Object(id=GUILD_ID)]
+
 REASON_OPTIONS = [
     ("Plainte", "Problème / plainte / restitution", "📣"),
     ("Question", "Question générale / aide", "❓"),
@@ -36,18 +100,356 @@ REASON_OPTIONS = [
     ("Autre", "Autre demande", "🗂️"),
 ]
 
+TRANSCRIPT_LOGS = TranscriptLogRegistry(os.path.join(DATA_DIR, "transcripts"))
+RENDER_POOL = RenderPool(TICKET_RENDER_WORKERS)
+TRANSCRIPT_ARCHIVE = TranscriptArchive(os.path.join(DATA_DIR, "archive"))
+# Au-delà, /transcript renvoie le membre gzip archivé tel quel plutôt que le texte décompressé.
+ARCHIVE_INLINE_MAX = 8 * 1024 * 1024
+ATTACHMENT_MIRROR = AttachmentMirror(os.path.join(DATA_DIR, "attachments"), TICKET_MIRROR_WORKERS,
+                                     TICKET_MIRROR_MAX_BYTES, TICKET_ATTACHMENT_BASE_URL,
+                                     retention=TICKET_MIRROR_RETENTION_DAYS * 86400)
+# Au-delà, la fermeture n'attend plus les copies en cours : le transcript rendu garde l'URL du CDN.
+MIRROR_DRAIN_TIMEOUT = 30.0
+PENDING_MIRRORS: Dict[int, Set[asyncio.Task]] = {}
+# Fin des fermetures (copies, rendu, mise en file des logs) après la suppression du salon.
+CLOSE_TASKS: Set[asyncio.Task] = set()
+# Fermetures interrompues par un arrêt, reprises dès que leur guilde est disponible (on_ready).
+RESUMED_CLOSES: Dict[int, dict] = {}
+CHANNEL_POOL = ChannelPool(CHANNEL_POOL_SIZE)
+# Ouvertures en cours par catégorie : `category.channels` n'inclut un salon créé qu'à l'arrivée de l'événement du gateway.
+CATEGORY_RESERVATIONS: Dict[int, int] = {}
+ADMISSIONS: Dict[int, AdmissionController] = {}
+LOG_DELIVERY = LogDeliveryQueue(os.path.join(DATA_DIR, "outbox"), TICKET_LOGS_WEBHOOK_URL, LOGS_CHANNEL_ID)
+
 class TicketState:
-    def __init__(self, user_id: int, channel_id: int, reason: str):
+    __slots__ = ("guild_id", "user_id", "channel_id", "reason", "transcript", "opened_at", "last_activity", "reminded_at",
+                 "answered")
+
+    def __init__(self, guild_id: int, user_id: int, channel_id: int, reason: str):
+        self.guild_id = guild_id
         self.user_id = user_id
         self.channel_id = channel_id
         self.reason = reason
-        self.transcript: List[dict] = []
+        self.transcript = TRANSCRIPT_LOGS.open(channel_id)
         self.opened_at = datetime.utcnow()
+        self.last_activity = time.time()
+        self.reminded_at = 0.0
+        self.answered = False
+
+    @property
+    def category(self) -> str:
+        return self.reason.split(" — ", 1)[0]
+
+    @property
+    def opened_ts(self) -> float:
+        return self.opened_at.replace(tzinfo=timezone.utc).timestamp()
+
+# Clé (guild_id, user_id) : un joueur peut avoir un ticket ouvert sur chacun des serveurs servis.
+ACTIVE_TICKETS: Dict[Tuple[int, int], TicketState] = {}
+CHANNEL_TICKETS: Dict[int, TicketState] = {}
+USER_TICKETS: Dict[int, Dict[int, TicketState]] = {}
+
+COMMENTS_PER_PAGE = 10
+USER_COMMENTS = CommentIndex(max_resident=100)
+RELAYS: Dict[int, TicketRelay] = {}
+RELAY_LIMITER = TokenBucketLimiter()
+OPEN_LOCKS: Dict[Tuple[int, int], asyncio.Lock] = {}
+RECIPIENTS: TTLCache[int, Tuple[discord.abc.User, discord.DMChannel]] = TTLCache(max_size=USER_CACHE_SIZE, ttl=6 * 3600)
+# Joueur avec des tickets sur plusieurs serveurs : un DM n'est relayé que vers un ticket désigné explicitement,
+# soit en répondant à un DM du bot (message → salon du ticket), soit par le serveur choisi dans DMRouteView.
+DM_MESSAGE_TICKETS: TTLCache[int, int] = TTLCache(max_size=16 * USER_CACHE_SIZE, ttl=7 * 86400)
+DM_ROUTES: TTLCache[int, int] = TTLCache(max_size=USER_CACHE_SIZE, ttl=15 * 60)
+DM_ROUTE_PROMPTS: Dict[int, "DMRouteView"] = {}
+
+SEARCH_PAGE_SIZE = 8
+SEARCH_INDEX = SearchIndex(os.path.join(DATA_DIR, "search.db"))
+STATS = TicketStats(os.path.join(DATA_DIR, "stats.db"))
+STATS_PERIODS = [("24 h", 86400), ("7 jours", 7 * 86400), ("30 jours", 30 * 86400),
+                 ("90 jours", 90 * 86400), ("365 jours", 365 * 86400)]
+IDLE_SCHEDULER: DeadlineScheduler[int] = DeadlineScheduler(name="idle")
+CLOSING: Set[int] = set()
+STORE: TicketStore = SQLiteTicketStore(os.path.join(DATA_DIR, "tickets.db"))
+
+HANDLER_SECONDS = metrics.histogram("ticket_handler_seconds", "Durée des handlers du cog ticket.")
+TICKET_ERRORS = metrics.counter("ticket_errors_total", "Erreurs interceptées dans le cog ticket.")
+RELAY_FALLBACKS = metrics.counter("ticket_relay_fallbacks_total", "Relais impossibles signalés au staff.")
+IDLE_ACTIONS = metrics.counter("ticket_idle_actions_total", "Relances et fermetures automatiques pour inactivité.")
+metrics.gauge("ticket_open", "Tickets actuellement ouverts.", lambda: len(ACTIVE_TICKETS))
+metrics.gauge("ticket_transcript_bytes", "Octets écrits dans les transcripts des tickets ouverts.", lambda: TRANSCRIPT_LOGS.total_bytes())
+metrics.gauge("ticket_log_queue_depth", "Envois de logs en attente.", lambda: len(LOG_DELIVERY))
+metrics.gauge("ticket_relay_queue_depth", "Lignes en attente dans les files de relais.", lambda: sum(len(r) for r in RELAYS.values()))
+metrics.gauge("ticket_store_queue_depth", "Écritures en attente dans le stockage.", lambda: STORE.pending_writes())
+metrics.gauge("ticket_mirror_queue_depth", "Pièces jointes en attente de copie locale.", lambda: len(ATTACHMENT_MIRROR))
+metrics.gauge("ticket_idle_tracked", "Tickets suivis par le balayage d'inactivité.", lambda: len(IDLE_SCHEDULER))
+metrics.gauge("ticket_search_queue_depth", "Entrées en attente d'indexation.", lambda: SEARCH_INDEX.pending_writes())
+metrics.gauge("ticket_admission_queue_depth", "Ouvertures de ticket en attente d'admission.",
+              lambda: sum(len(a) for a in ADMISSIONS.values()))
+LOOP_LAG_MONITOR = metrics.LoopLagMonitor()
+METRICS_SERVER = metrics.MetricsServer(METRICS_HOST, METRICS_PORT)
+
+def build_metrics_embed() -> discord.Embed:
+    embed = discord.Embed(title="📊 Métriques tickets", color=EMBED_COLOR)
+    embed.add_field(name="Tickets ouverts", value=str(len(ACTIVE_TICKETS)), inline=True)
+    embed.add_field(name="Serveurs", value=str(len(GUILD_CONFIGS)), inline=True)
+    embed.add_field(name="Transcripts", value=f"{TRANSCRIPT_LOGS.total_bytes() / 1024:.1f} Kio", inline=True)
+    embed.add_field(
+        name="Files d'attente",
+        value=f"logs : {len(LOG_DELIVERY)} • relais : {sum(len(r) for r in RELAYS.values())} • stockage : {STORE.pending_writes()}",
+        inline=False
+    )
+    lines = []
+    for handler in ("open", "relay_player_to_staff", "relay_staff_to_player", "close"):
+        n = HANDLER_SECONDS.count(handler=handler)
+        if n:
+            lines.append(
+                f"`{handler}` — n={n} • p50 {HANDLER_SECONDS.quantile(0.5, handler=handler) * 1000:.0f} ms"
+                f" • p99 {HANDLER_SECONDS.quantile(0.99, handler=handler) * 1000:.0f} ms"
+            )
+    embed.add_field(name="Latence des handlers", value="\n".join(lines) or "*Aucune donnée*", inline=False)
+    embed.add_field(
+        name="API Discord",
+        value=f"{metrics.API_REQUESTS.total():.0f} requêtes • {metrics.API_RATE_LIMITED.total():.0f} × 429",
+        inline=True
+    )
+    embed.add_field(
+        name="Replis",
+        value=f"logs via salon : {DELIVERIES.get(result='fallback'):.0f}"
+              f" • DM fermés : {RELAY_FALLBACKS.total():.0f}",
+        inline=True
+    )
+    embed.add_field(
+        name="Boucle d'événements",
+        value=f"retard p99 {metrics.LOOP_LAG.quantile(0.99) * 1000:.1f} ms • dernier {LOOP_LAG_MONITOR.last * 1000:.1f} ms",
+        inline=False
+    )
+    embed.add_field(name="Erreurs", value=f"{TICKET_ERRORS.total():.0f}", inline=True)
+    return embed
+
+def get_admission(guild_id: int) -> AdmissionController:
+    # Les limites de création de salons de Discord s'appliquent par serveur : une file d'admission par guilde.
+    admission = ADMISSIONS.get(guild_id)
+    if admission is None:
+        admission = ADMISSIONS[guild_id] = AdmissionController(rate=TICKET_OPEN_RATE, burst=TICKET_OPEN_BURST)
+    return admission
+
+def index_ticket(state: TicketState):
+    ACTIVE_TICKETS[(state.guild_id, state.user_id)] = state
+    CHANNEL_TICKETS[state.channel_id] = state
+    USER_TICKETS.setdefault(state.user_id, {})[state.guild_id] = state
+    schedule_idle(state)
+
+def register_ticket(state: TicketState):
+    index_ticket(state)
+    STORE.save_ticket(state.guild_id, state.user_id, state.channel_id, state.reason, state.opened_at)
+
+def unindex_ticket(state: TicketState):
+    # Le ticket n'est plus ouvert ; sa ligne en base et son transcript sur disque sont laissés à l'appelant.
+    ACTIVE_TICKETS.pop((state.guild_id, state.user_id), None)
+    CHANNEL_TICKETS.pop(state.channel_id, None)
+    per_user = USER_TICKETS.get(state.user_id)
+    if per_user is not None:
+        per_user.pop(state.guild_id, None)
+        if not per_user:
+            del USER_TICKETS[state.user_id]
+    IDLE_SCHEDULER.cancel(state.channel_id)
+
+def forget_ticket(state: TicketState):
+    unindex_ticket(state)
+    STORE.delete_ticket(state.guild_id, state.user_id, state.channel_id)
+    TRANSCRIPT_LOGS.discard(state.channel_id)
+
+def idle_timeout(state: TicketState) -> Tuple[float, float]:
+    config = GUILD_CONFIGS.get(state.guild_id)
+    if config is None:
+        return TICKET_IDLE_TIMEOUTS.get(state.category, (0.0, 0.0))
+    return config.idle_timeout(state.category)
 
-ACTIVE_TICKETS: Dict[int, TicketState] = {}
-CHANNEL_TO_USER: Dict[int, int] = {}
+def next_idle_step(state: TicketState) -> Tuple[Optional[float], bool]:
+    # (échéance, relance ?) calculée depuis last_activity : un message n'a qu'à mettre ce champ à jour,
+    # l'échéance périmée est recalculée quand elle arrive.
+    remind, close = idle_timeout(state)
+    if state.reminded_at and state.last_activity > state.reminded_at:
+        state.reminded_at = 0.0
+    if remind and not state.reminded_at and (not close or remind < close):
+        return state.last_activity + remind, True
+    if not close:
+        return None, False
+    # Relance tardive (bot arrêté…) : le joueur garde quand même le délai annoncé.
+    due = state.last_activity + close
+    if state.reminded_at:
+        due = max(due, state.reminded_at + close - remind)
+    return due, False
 
-USER_COMMENTS: Dict[int, List[dict]] = {}
+def schedule_idle(state: TicketState):
+    if not TICKET_IDLE_SWEEP:
+        return
+    due, _remind = next_idle_step(state)
+    if due is not None:
+        IDLE_SCHEDULER.schedule(state.channel_id, due)
+
+def format_delay(seconds: float) -> str:
+    if seconds >= 86400 and seconds % 86400 == 0:
+        return f"{int(seconds // 86400)} j"
+    if seconds >= 3600:
+        return f"{round(seconds / 3600)} h"
+    return f"{max(1, round(seconds / 60))} min"
+
+def get_ticket(guild_id: int, user_id: int) -> Optional[TicketState]:
+    return ACTIVE_TICKETS.get((guild_id, user_id))
+
+def ticket_for_channel(channel_id: int) -> Optional[TicketState]:
+    return CHANNEL_TICKETS.get(channel_id)
+
+def ticket_for_dm(user_id: int, reference_id: Optional[int] = None) -> Optional[TicketState]:
+    # Un DM ne porte pas de guilde : avec plusieurs tickets, None tant que le joueur n'a pas désigné le serveur.
+    tickets = USER_TICKETS.get(user_id)
+    if not tickets:
+        return None
+    for channel_id in (DM_MESSAGE_TICKETS.get(reference_id) if reference_id else None, DM_ROUTES.get(user_id)):
+        state = CHANNEL_TICKETS.get(channel_id) if channel_id else None
+        if state is not None and state.user_id == user_id:
+            return state
+    if len(tickets) == 1:
+        return next(iter(tickets.values()))
+    return None
+
+async def send_ticket_dm(state: TicketState, dm: discord.DMChannel, content: Optional[str] = None, **kwargs):
+    # DM rattaché à un ticket : une réponse du joueur à ce message est relayée vers ce ticket.
+    sent = await dm.send(content, **kwargs)
+    if sent is not None:
+        DM_MESSAGE_TICKETS.set(sent.id, state.channel_id)
+    return sent
+
+def get_relay(state: TicketState) -> TicketRelay:
+    relay = RELAYS.get(state.channel_id)
+    if relay is None:
+        relay = RELAYS[state.channel_id] = TicketRelay(RELAY_LIMITER, window=RELAY_COALESCE_WINDOW)
+    return relay
+
+async def drain_relay(channel_id: int):
+    relay = RELAYS.pop(channel_id, None)
+    if relay is not None:
+        await relay.close()
+
+async def resolve_recipient(client: discord.Client, user_id: int) -> Optional[Tuple[discord.abc.User, discord.DMChannel]]:
+    cached = RECIPIENTS.get(user_id)
+    if cached:
+        return cached
+    user = client.get_user(user_id)
+    if user is None:
+        try:
+            user = await client.fetch_user(user_id)
+        except discord.HTTPException:
+            return None
+    dm = user.dm_channel or await user.create_dm()
+    RECIPIENTS.set(user_id, (user, dm))
+    return user, dm
+
+def record_transcript(state: TicketState, entry: TranscriptEntry):
+    state.transcript.append(entry)
+    state.last_activity = time.time()
+    # Les notes internes sont indexées une seule fois, via record_comment.
+    if not entry.internal:
+        SEARCH_INDEX.add(state.guild_id, state.user_id, state.channel_id, state.category,
+                         KIND_ATTACHMENT if entry.is_attachment else KIND_MESSAGE, entry.by, entry.ts, entry.content)
+
+async def _mirror_attachment(log: TranscriptLog, url: str, filename: str, size: int):
+    file = await ATTACHMENT_MIRROR.mirror(url, filename, size)
+    if file is not None:
+        log.add_mirror(url, ATTACHMENT_MIRROR.reference(file))
+
+def record_attachment(state: TicketState, by: str, att: discord.Attachment):
+    # L'entrée est écrite tout de suite, à sa place, avec l'URL du CDN ; la copie locale faite,
+    # le rendu du transcript la reprend (voir with_mirrors).
+    record_transcript(state, TranscriptEntry.now(by, att.url, is_attachment=True))
+    if not ATTACHMENT_MIRROR.enabled:
+        return
+    task = asyncio.create_task(_mirror_attachment(state.transcript, att.url, att.filename, att.size))
+    pending = PENDING_MIRRORS.setdefault(state.channel_id, set())
+    pending.add(task)
+
+    def _done(t: asyncio.Task):
+        tasks = PENDING_MIRRORS.get(state.channel_id)
+        if tasks is not None:
+            tasks.discard(t)
+            if not tasks:
+                del PENDING_MIRRORS[state.channel_id]
+
+    task.add_done_callback(_done)
+
+async def drain_mirrors(channel_id: int):
+    tasks = PENDING_MIRRORS.pop(channel_id, None)
+    if not tasks:
+        return
+    _finished, late = await asyncio.wait(tasks, timeout=MIRROR_DRAIN_TIMEOUT)
+    for task in late:
+        task.cancel()
+    if late:
+        await asyncio.gather(*late, return_exceptions=True)
+
+def record_comment(state: TicketState, comment: dict):
+    USER_COMMENTS.add((state.guild_id, state.user_id), comment)
+    STORE.add_comment(state.guild_id, state.user_id, comment)
+    SEARCH_INDEX.add(state.guild_id, state.user_id, state.channel_id, state.category, KIND_NOTE, comment["by"],
+                     int(comment["ts"].replace(tzinfo=timezone.utc).timestamp()), comment["content"])
+
+async def rehydrate_from_store():
+    snap = await STORE.load_snapshot(comments_per_user=USER_COMMENTS.max_resident)
+    await asyncio.get_running_loop().run_in_executor(
+        None, TRANSCRIPT_LOGS.preload, [row["channel_id"] for row in snap.tickets + snap.closing]
+    )
+    ACTIVE_TICKETS.clear()
+    CHANNEL_TICKETS.clear()
+    USER_TICKETS.clear()
+    USER_COMMENTS.clear()
+    RESUMED_CLOSES.clear()
+    for row in snap.closing:
+        RESUMED_CLOSES[row["channel_id"]] = row
+    for row in snap.tickets:
+        # Arrêt entre l'écriture du marqueur de fermeture et la suppression de la ligne : le ticket est fermé.
+        if row["channel_id"] in RESUMED_CLOSES:
+            continue
+        state = TicketState(row["guild_id"], row["user_id"], row["channel_id"], row["reason"])
+        state.opened_at = row["opened_at"]
+        tail = state.transcript.tail
+        state.last_activity = tail[-1].ts if tail else state.opened_at.replace(tzinfo=timezone.utc).timestamp()
+        # Seule la fin du transcript est en mémoire : au-delà, on suppose que le staff a déjà répondu.
+        state.answered = len(state.transcript) > len(tail) or any(e.by.endswith(" (staff)") for e in tail)
+        index_ticket(state)
+    for key, comments in snap.comments.items():
+        USER_COMMENTS.load(key, comments, snap.comment_counts.get(key, len(comments)))
+
+def ticket_categories(guild: discord.Guild, reason: Optional[str] = None) -> List[discord.CategoryChannel]:
+    config = GUILD_CONFIGS.get(guild.id)
+    if config is None:
+        return []
+    categories = [guild.get_channel(cid) for cid in config.category_ids(reason)]
+    return [c for c in categories if isinstance(c, discord.CategoryChannel)]
+
+def pick_category(guild: discord.Guild, reason: str, exclude: Set[int] = frozenset()) -> Optional[discord.CategoryChannel]:
+    # Réserve une place dans la catégorie choisie, à rendre avec release_category une fois le salon créé (ou non).
+    best, best_load = None, MAX_CHANNELS_PER_CATEGORY + 1
+    for category in ticket_categories(guild, reason):
+        if category.id in exclude:
+            continue
+        size = len(category.channels)
+        spare = CHANNEL_POOL.available(category.id) - CATEGORY_RESERVATIONS.get(category.id, 0)
+        # Salons du ticket une fois les ouvertures en cours terminées (réserve du pool déduite).
+        load = size - spare
+        if spare <= 0 and load >= MAX_CHANNELS_PER_CATEGORY:
+            continue
+        if load < best_load:
+            best, best_load = category, load
+    if best is not None:
+        CATEGORY_RESERVATIONS[best.id] = CATEGORY_RESERVATIONS.get(best.id, 0) + 1
+    return best
+
+def release_category(category_id: int):
+    left = CATEGORY_RESERVATIONS.get(category_id, 0) - 1
+    if left > 0:
+        CATEGORY_RESERVATIONS[category_id] = left
+    else:
+        CATEGORY_RESERVATIONS.pop(category_id, None)
 
 def get_emoji_markup(bot: commands.Bot, guild: Optional[discord.Guild], emoji_id: int) -> str:
     if not emoji_id:
@@ -69,116 +471,217 @@ def build_open_panel_description(emoji_str: str) -> str:
     )
     return head + body
 
-def build_comments_embed(user_id: int, guild: Optional[discord.Guild], limit: int = 10) -> Optional[discord.Embed]:
-    items = USER_COMMENTS.get(user_id, [])
-    if not items:
+def format_comment_line(it: dict, guild: Optional[discord.Guild]) -> str:
+    when = it["ts"].strftime("%Y-%m-%d %H:%M")
+    ch = guild.get_channel(it["channel_id"]) if guild else None
+    suffix = f" • #{ch.name}" if isinstance(ch, discord.TextChannel) else ""
+    return f"• **{when} UTC** — par **{it['by']}** : {it['content']}{suffix}"
+
+def build_comments_embed(guild: discord.Guild, user_id: int, limit: int = 10) -> Optional[discord.Embed]:
+    entry = USER_COMMENTS.get((guild.id, user_id))
+    if not entry or not entry.total:
         return None
-    items_sorted = sorted(items, key=lambda x: x["ts"], reverse=True)[:limit]
-    lines = []
-    for it in items_sorted:
-        when = it["ts"].strftime("%Y-%m-%d %H:%M")
-        who = it["by"]
-        txt = it["content"]
-        ch = guild.get_channel(it["channel_id"]) if guild else None
-        suffix = f" • #{ch.name}" if isinstance(ch, discord.TextChannel) else ""
-        lines.append(f"• **{when} UTC** — par **{who}** : {txt}{suffix}")
+    if entry.rendered is not None and entry.rendered[0] == limit:
+        return entry.rendered[1]
+    lines = [format_comment_line(it, guild) for it in entry.latest(limit)]
     embed = discord.Embed(
-        title=f"Historique des commentaires ({len(items)} au total)",
+        title=f"Historique des commentaires ({entry.total} au total)",
         description="\n".join(lines) if lines else "*Aucun commentaire*",
         color=discord.Color.blurple()
     )
     embed.set_footer(text="Commentaires ajoutés via /commentaire (notes internes)")
+    entry.rendered = (limit, embed)
     return embed
 
+async def fetch_comments_page(guild_id: int, user_id: int, page: int,
+                              per_page: int = COMMENTS_PER_PAGE) -> Tuple[List[dict], int]:
+    entry = USER_COMMENTS.get((guild_id, user_id))
+    if not entry:
+        return [], 0
+    offset = (page - 1) * per_page
+    if offset + per_page <= len(entry.recent) or len(entry.recent) >= entry.total:
+        return entry.latest(per_page, offset), entry.total
+    return await STORE.load_comments_page(guild_id, user_id, offset, per_page), entry.total
+
 async def send_logs_via_webhook(bot: commands.Bot,
                                 state: TicketState,
                                 user: Optional[discord.User],
                                 guild: discord.Guild,
-                                channel: discord.TextChannel):
-    lines: list[str] = []
-    for m in state.transcript:
-        ts = m["ts"].strftime("%Y-%m-%d %H:%M:%S")
-        by = m["by"]
-        content = (m.get("content") or "").strip()
-        internal = m.get("internal", False)
-        is_att = m.get("is_attachment", False)
-        tag_note = " [note]" if internal else ""
-        tag_file = " [fichier]" if is_att else ""
-        lines.append(f"[{ts} UTC]{tag_note}{tag_file} {by}: {content}")
-
-    full_text_only = "\n".join(lines)
-    embed_body_full = f"```txt\n{full_text_only}\n```"
-    MAX_DESC = 4000
-
-    def build_embed(desc: str, truncated: bool) -> discord.Embed:
-        e = discord.Embed(
-            title="🧾 Transcript Ticket",
-            description=desc,
-            color=discord.Color.dark_gray()
-        )
-        e.add_field(name="Joueur", value=(user.mention if user else str(state.user_id)), inline=True)
-        e.add_field(name="Salon", value=f"#{channel.name}", inline=True)
-        e.add_field(name="Raison", value=state.reason, inline=False)
-        e.add_field(name="Ouvert (UTC)", value=state.opened_at.strftime("%Y-%m-%d %H:%M:%S"), inline=True)
-        e.add_field(name="Fermé (UTC)", value=datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S"), inline=True)
-        e.add_field(name="Messages", value=str(len(state.transcript)), inline=True)
-        if truncated:
-            e.add_field(name="Note", value="Transcript tronqué dans l’embed. Le fichier joint contient l’intégralité.", inline=False)
-        return e
-
-    file_to_attach = None
-    if len(embed_body_full) <= MAX_DESC:
-        embed = build_embed(embed_body_full, truncated=False)
-    else:
-        used, acc = 0, []
-        for line in (full_text_only + "\n").splitlines(True):
-            if used + len(line) > MAX_DESC - 50:
-                break
-            acc.append(line)
-            used += len(line)
-        remaining_lines = max(0, len(full_text_only.splitlines()) - len("".join(acc).splitlines()))
-        truncated_body = "".join(acc).rstrip() + f"\n… (+{remaining_lines} lignes masquées)"
-        embed = build_embed(f"```txt\n{truncated_body}\n```", truncated=True)
-
-        buf = BytesIO()
-        header = (
-            f"Transcript Ticket — {guild.name}\n"
-            f"Joueur: {user.name if user else state.user_id} | Salon: #{channel.name}\n"
-            f"Raison: {state.reason}\n"
-            f"Ouvert (UTC): {state.opened_at:%Y-%m-%d %H:%M:%S} | "
-            f"Fermé (UTC): {datetime.utcnow():%Y-%m-%d %H:%M:%S}\n"
-            f"Messages: {len(state.transcript)}\n"
-            + "-"*50 + "\n"
+                                channel_name: str,
+                                auto_closed: bool = False,
+                                closed_at: Optional[datetime] = None):
+    closed_at = closed_at or datetime.utcnow()
+    message_count = len(state.transcript)
+    header = (
+        f"Transcript Ticket — {guild.name}\n"
+        f"Joueur: {user.name if user else state.user_id} | Salon: #{channel_name}\n"
+        f"Raison: {state.reason}\n"
+        f"Ouvert (UTC): {state.opened_at:%Y-%m-%d %H:%M:%S} | "
+        f"Fermé (UTC): {closed_at:%Y-%m-%d %H:%M:%S}\n"
+        f"Messages: {message_count}\n"
+        + "-"*50 + "\n"
+    )
+    # Le worker relit le transcript sur disque : on y pousse d'abord les lignes encore en mémoire.
+    await asyncio.get_running_loop().run_in_executor(None, state.transcript.flush, False)
+    rendered = await RENDER_POOL.render(RenderJob(
+        state.transcript.path,
+        header,
+        f"ticket-{state.user_id}",
+        title=f"Transcript Ticket — {guild.name}",
+        out_dir=os.path.join(DATA_DIR, "render"),
+        archive_path=os.path.join(DATA_DIR, "render", f"archive-{state.channel_id}.txt.gz"),
+        gzip_output=TICKET_LOGS_GZIP,
+        html_output=TICKET_LOGS_HTML,
+        mirrors_path=state.transcript.mirrors_path,
+    ))
+    archived: Optional[ArchiveRecord] = None
+    try:
+        archived = await TRANSCRIPT_ARCHIVE.store(
+            state.guild_id, state.channel_id, state.user_id, state.category, state.reason,
+            int(state.opened_at.replace(tzinfo=timezone.utc).timestamp()),
+            int(closed_at.replace(tzinfo=timezone.utc).timestamp()),
+            rendered.archive_path,
         )
-        buf.write((header + full_text_only + "\n").encode("utf-8"))
-        buf.seek(0)
-        file_to_attach = discord.File(buf, filename=f"ticket-{state.user_id}.txt")
-
-    async def _send_via_webhook():
-        async with aiohttp.ClientSession() as session:
-            webhook = discord.Webhook.from_url(TICKET_LOGS_WEBHOOK_URL, session=session)
-            if file_to_attach:
-                await webhook.send(embed=embed, file=file_to_attach, username="Ticket Logs")
-            else:
-                await webhook.send(embed=embed, username="Ticket Logs")
+    except Exception as e:
+        TICKET_ERRORS.inc(where="archive")
+        print(f"[ticket] Impossible d'archiver le transcript de #{channel_name} : {e}")
+        try:
+            os.remove(rendered.archive_path)
+        except OSError:
+            pass
 
-    async def _fallback_to_channel():
-        log_ch = bot.get_channel(LOGS_CHANNEL_ID)
-        if not isinstance(log_ch, discord.TextChannel):
-            return
-        if file_to_attach:
-            await log_ch.send(embed=embed, file=file_to_attach)
+    embed = discord.Embed(
+        title="🧾 Transcript Ticket",
+        description=rendered.preview,
+        color=discord.Color.dark_gray()
+    )
+    embed.add_field(name="Joueur", value=(user.mention if user else str(state.user_id)), inline=True)
+    embed.add_field(name="Salon", value=f"#{channel_name}", inline=True)
+    embed.add_field(name="Raison", value=state.reason, inline=False)
+    embed.add_field(name="Ouvert (UTC)", value=state.opened_at.strftime("%Y-%m-%d %H:%M:%S"), inline=True)
+    embed.add_field(name="Fermé (UTC)", value=closed_at.strftime("%Y-%m-%d %H:%M:%S"), inline=True)
+    embed.add_field(name="Messages", value=str(message_count), inline=True)
+    if auto_closed:
+        embed.add_field(name="Fermeture", value="Automatique (inactivité)", inline=False)
+    if archived is not None:
+        embed.add_field(name="Archive", value=f"n°{archived.id} • `/transcript numero:{archived.id}`", inline=False)
+    if rendered.truncated:
+        embed.add_field(name="Note", value="Transcript tronqué dans l’embed. Le fichier joint contient l’intégralité.", inline=False)
+
+    config = GUILD_CONFIGS.get(guild.id)
+    try:
+        if config is None:
+            await LOG_DELIVERY.enqueue(embed, rendered.files)
         else:
-            await log_ch.send(embed=embed)
+            await LOG_DELIVERY.enqueue(embed, rendered.files, webhook_url=config.logs_webhook_url,
+                                       channel_id=config.logs_channel_id)
+    except Exception:
+        rendered.discard()
+        raise
 
-    if TICKET_LOGS_WEBHOOK_URL:
+async def finish_close(client: discord.Client,
+                       state: TicketState,
+                       user: Optional[discord.User],
+                       guild: discord.Guild,
+                       channel_name: str,
+                       auto_closed: bool,
+                       closed_at: datetime):
+    # Le rendu relit le transcript sur disque : il n'a plus besoin du salon, supprimé entre-temps.
+    # Le marqueur de fermeture n'est levé qu'une fois les logs en file (ou le transcript mis de côté) :
+    # un arrêt avant ce point laisse la fermeture à reprendre au démarrage suivant.
+    try:
+        await drain_mirrors(state.channel_id)
+        await send_logs_via_webhook(client, state, user, guild, channel_name, auto_closed=auto_closed,
+                                    closed_at=closed_at)
+    except Exception as e:
+        TICKET_ERRORS.inc(where="close_logs")
+        print(f"[ticket] Impossible de mettre en file les logs du ticket #{channel_name} : {e}")
         try:
-            await _send_via_webhook()
+            await asyncio.get_running_loop().run_in_executor(
+                None, TRANSCRIPT_LOGS.set_aside, state.channel_id, LOG_DELIVERY.failed_directory
+            )
+        except OSError as e:
+            print(f"[ticket] Impossible de mettre de côté le transcript de #{channel_name} : {e}")
             return
-        except Exception:
-            await _fallback_to_channel()
     else:
-        await _fallback_to_channel()
+        TRANSCRIPT_LOGS.discard(state.channel_id)
+    STORE.delete_closing(state.channel_id)
+
+def spawn_finish_close(client: discord.Client,
+                       state: TicketState,
+                       user: Optional[discord.User],
+                       guild: discord.Guild,
+                       channel_name: str,
+                       auto_closed: bool,
+                       closed_at: datetime):
+    task = asyncio.create_task(finish_close(client, state, user, guild, channel_name, auto_closed, closed_at))
+    CLOSE_TASKS.add(task)
+    task.add_done_callback(CLOSE_TASKS.discard)
+
+def resume_closes(client: discord.Client):
+    for channel_id, row in list(RESUMED_CLOSES.items()):
+        guild = client.get_guild(row["guild_id"])
+        if guild is None:
+            continue
+        del RESUMED_CLOSES[channel_id]
+        state = TicketState(row["guild_id"], row["user_id"], channel_id, row["reason"])
+        state.opened_at = row["opened_at"]
+        print(f"[ticket] Reprise de la fermeture du ticket #{row['channel_name']}.")
+        spawn_finish_close(client, state, client.get_user(row["user_id"]), guild, row["channel_name"],
+                           row["auto_closed"], row["closed_at"])
+
+async def close_ticket(client: discord.Client,
+                       state: TicketState,
+                       guild: discord.Guild,
+                       channel: discord.TextChannel,
+                       auto_closed: bool = False) -> bool:
+    # Chemin commun au bouton de fermeture et au balayage d'inactivité ; False si une fermeture est déjà en cours.
+    # Le ticket est marqué CLOSING avant de vider son relais : les handlers l'ignorent dès lors.
+    # Copies de pièces jointes, rendu et logs se terminent en tâche de fond (finish_close), après la suppression du salon.
+    if state.channel_id in CLOSING:
+        return False
+    CLOSING.add(state.channel_id)
+    try:
+        user_id = state.user_id
+        config = GUILD_CONFIGS.get(state.guild_id)
+        banner_url = config.banner_url if config else BANNER_URL
+        recipient = await resolve_recipient(client, user_id)
+        user = recipient[0] if recipient else None
+        await drain_relay(channel.id)
+
+        closed_at = datetime.utcnow()
+        STATS.ticket_closed(state.guild_id, state.category, time.time() - state.opened_ts, auto_closed=auto_closed)
+        STORE.mark_closing(state.guild_id, state.user_id, state.channel_id, channel.name, state.reason,
+                           state.opened_at, closed_at, auto_closed)
+        unindex_ticket(state)
+        if user_id not in USER_TICKETS:
+            RECIPIENTS.pop(user_id)
+        spawn_finish_close(client, state, user, guild, channel.name, auto_closed, closed_at)
+
+        if user:
+            try:
+                description = (
+                    "Ton ticket a été fermé automatiquement faute d’activité. N’hésite pas à en rouvrir un si besoin."
+                    if auto_closed else
+                    "Merci d’avoir contacté le staff. N’hésite pas à rouvrir un ticket si besoin."
+                )
+                dm_close = discord.Embed(
+                    title="🗂️ Ticket fermé",
+                    description=description,
+                    color=discord.Color.dark_gray()
+                )
+                dm_close.add_field(name="Résumé", value=state.reason, inline=False)
+                dm_close.set_footer(text=f"{guild.name} • {datetime.utcnow().strftime('%d/%m/%Y %H:%M UTC')}")
+                if banner_url:
+                    dm_close.set_image(url=banner_url)
+                await recipient[1].send(embed=dm_close)
+            except discord.Forbidden:
+                pass
+
+        await channel.delete(reason="Ticket fermé (inactivité)" if auto_closed else "Ticket fermé")
+        return True
+    finally:
+        CLOSING.discard(state.channel_id)
 
 class ReasonModal(discord.ui.Modal, title="Ouvrir un ticket"):
     def __init__(self, reason_label: str):
@@ -193,62 +696,111 @@ class ReasonModal(discord.ui.Modal, title="Ouvrir un ticket"):
         )
         self.add_item(self.raison)
 
+    @HANDLER_SECONDS.timed(handler="open")
     async def on_submit(self, interaction: discord.Interaction):
         reason = self.reason_label
         detail = self.raison.value.strip()
 
-        existing = ACTIVE_TICKETS.get(interaction.user.id)
+        # Répondre tout de suite : la création du salon peut dépasser le délai de 3 s de Discord.
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
+        async def reply(content: str):
+            await interaction.followup.send(content, ephemeral=True)
+
+        config = GUILD_CONFIGS.get(interaction.guild.id) if interaction.guild else None
+        if config is None:
+            return await reply("⚠️ Les tickets ne sont pas configurés sur ce serveur.")
+
+        lock_key = (interaction.guild.id, interaction.user.id)
+        lock = OPEN_LOCKS.setdefault(lock_key, asyncio.Lock())
+        if lock.locked():
+            return await reply("⏳ Ton ticket est déjà en cours de création.")
+        async with lock:
+            try:
+                await self.open_ticket(interaction, reply, config, reason, detail)
+            except Exception as e:
+                # Après le defer, le joueur resterait sur « réfléchit… » : on lui répond quoi qu'il arrive.
+                TICKET_ERRORS.inc(where="open")
+                print(f"[ticket] Échec de l'ouverture d'un ticket pour {interaction.user} : {e}")
+                try:
+                    await reply("⚠️ Impossible de créer ton ticket pour le moment, réessaie dans quelques minutes.")
+                except discord.HTTPException:
+                    pass
+            finally:
+                OPEN_LOCKS.pop(lock_key, None)
+
+    async def open_ticket(self, interaction: discord.Interaction, reply, config: GuildConfig, reason: str, detail: str):
+        existing = get_ticket(interaction.guild.id, interaction.user.id)
         if existing:
-            existing_ch = interaction.guild.get_channel(existing.channel_id) if interaction.guild else None
+            existing_ch = interaction.guild.get_channel(existing.channel_id)
             if isinstance(existing_ch, discord.TextChannel):
-                return await interaction.response.send_message(
-                    f"⚠️ Tu as déjà un ticket ouvert : {existing_ch.mention}. Merci d’utiliser celui-ci.",
-                    ephemeral=True
-                )
+                return await reply(f"⚠️ Tu as déjà un ticket ouvert : {existing_ch.mention}. Merci d’utiliser celui-ci.")
             else:
-                ACTIVE_TICKETS.pop(interaction.user.id, None)
+                forget_ticket(existing)
+
+        if not config.category_ids(reason):
+            return await reply("⚠️ Catégorie non configurée.")
+        if not ticket_categories(interaction.guild, reason):
+            return await reply("⚠️ Catégorie introuvable.")
 
-        category_id = TICKET_CATEGORIES.get(reason, 0)
-        if not category_id:
-            return await interaction.response.send_message("⚠️ Catégorie non configurée.", ephemeral=True)
+        queue_message = None
 
-        category = interaction.guild.get_channel(category_id)
-        if not isinstance(category, discord.CategoryChannel):
-            return await interaction.response.send_message("⚠️ Catégorie introuvable.", ephemeral=True)
+        async def notify_position(position: int):
+            nonlocal queue_message
+            content = f"⏳ Beaucoup de demandes en ce moment : tu es **n°{position}** dans la file, ton ticket va s’ouvrir."
+            if queue_message is None:
+                queue_message = await interaction.followup.send(content, ephemeral=True, wait=True)
+            else:
+                await queue_message.edit(content=content)
+
+        await get_admission(interaction.guild.id).admit(notify_position)
 
         overwrites = {interaction.guild.default_role: discord.PermissionOverwrite(view_channel=False)}
-        if ROLE_TO_PING:
-            role = interaction.guild.get_role(int(ROLE_TO_PING))
+        if config.role_to_ping:
+            role = interaction.guild.get_role(config.role_to_ping)
             if role:
                 overwrites[role] = discord.PermissionOverwrite(
                     view_channel=True, send_messages=True, read_message_history=True
                 )
 
-        ch = await category.create_text_channel(
-            name=f"ticket-{interaction.user.name}-{interaction.user.discriminator}",
-            overwrites=overwrites,
-            topic=f"Ticket de {interaction.user} — {reason} : {detail}"
-        )
+        name = f"ticket-{interaction.user.name}-{interaction.user.discriminator}"
+        topic = f"Ticket de {interaction.user} — {reason} : {detail}"
+        tried: Set[int] = set()
+        ch = None
+        while ch is None:
+            category = pick_category(interaction.guild, reason, tried)
+            if category is None:
+                return await reply("⚠️ Toutes les catégories de tickets sont pleines, réessaie dans quelques minutes.")
+            try:
+                ch = await CHANNEL_POOL.acquire(category, name, overwrites, topic)
+                if ch is None:
+                    ch = await category.create_text_channel(name=name, overwrites=overwrites, topic=topic)
+            except discord.HTTPException as e:
+                # Catégorie pleine alors que le cache ne le montrait pas encore : on passe à la suivante.
+                if e.status != 400 or e.code != 50035:
+                    raise
+                tried.add(category.id)
+            finally:
+                release_category(category.id)
 
-        state = TicketState(interaction.user.id, ch.id, f"{reason} — {detail}")
-        ACTIVE_TICKETS[interaction.user.id] = state
-        CHANNEL_TO_USER[ch.id] = interaction.user.id
+        state = TicketState(interaction.guild.id, interaction.user.id, ch.id, f"{reason} — {detail}")
+        register_ticket(state)
+        STATS.ticket_opened(state.guild_id, state.category)
 
         emoji_str = get_emoji_markup(interaction.client, interaction.guild, CUSTOM_EMOJI_ID)
 
-        view = TicketAdminView()
-        await ch.send(
-            f"{emoji_str + ' ' if emoji_str else ''}**Nouveau ticket** — {interaction.user.mention}\n"
-            f"**Catégorie :** {reason}\n"
-            f"**Raison :** {detail}",
-            view=view
-        )
-
-        recap = build_comments_embed(interaction.user.id, interaction.guild, limit=10)
-        if recap:
-            await ch.send(embed=recap)
+        async def send_admin_panel():
+            await ch.send(
+                f"{emoji_str + ' ' if emoji_str else ''}**Nouveau ticket** — {interaction.user.mention}\n"
+                f"**Catégorie :** {reason}\n"
+                f"**Raison :** {detail}",
+                view=TicketAdminView()
+            )
+            recap = build_comments_embed(interaction.guild, interaction.user.id, limit=10)
+            if recap:
+                await ch.send(embed=recap)
 
-        try:
+        async def send_dm() -> bool:
             dm_embed = discord.Embed(
                 title="✅ Ticket créé",
                 description="Ton ticket a été ouvert. Tu peux répondre à ce message pour discuter avec le staff.",
@@ -257,14 +809,25 @@ class ReasonModal(discord.ui.Modal, title="Ouvrir un ticket"):
             dm_embed.add_field(name="Catégorie", value=reason, inline=True)
             dm_embed.add_field(name="Raison", value=detail or "*Non précisé*", inline=False)
             dm_embed.set_footer(text=f"{interaction.guild.name} • {datetime.utcnow().strftime('%d/%m/%Y %H:%M UTC')}")
-            if BANNER_URL:
-                dm_embed.set_image(url=BANNER_URL)
-            await interaction.user.send(embed=dm_embed)
-        except discord.Forbidden:
-            await interaction.response.send_message("⚠️ Impossible d’envoyer un DM (MP fermés).", ephemeral=True)
-            return
+            if config.banner_url:
+                dm_embed.set_image(url=config.banner_url)
+            try:
+                dm = interaction.user.dm_channel or await interaction.user.create_dm()
+                RECIPIENTS.set(interaction.user.id, (interaction.user, dm))
+                await send_ticket_dm(state, dm, embed=dm_embed)
+            except discord.Forbidden:
+                return False
+            return True
+
+        panel_result, dm_ok = await asyncio.gather(send_admin_panel(), send_dm(), return_exceptions=True)
+        for result in (panel_result, dm_ok):
+            if isinstance(result, BaseException):
+                TICKET_ERRORS.inc(where="open")
+                print(f"[ticket] Erreur à l'ouverture du ticket #{ch.name} : {result}")
 
-        await interaction.response.send_message("✅ Ticket créé. Vérifie tes DM.", ephemeral=True)
+        if dm_ok is not True:
+            return await reply("⚠️ Impossible d’envoyer un DM (MP fermés).")
+        await reply("✅ Ticket créé. Vérifie tes DM.")
 
 class ReasonSelect(discord.ui.Select):
     def __init__(self):
@@ -272,12 +835,151 @@ class ReasonSelect(discord.ui.Select):
             discord.SelectOption(label=label, description=desc, emoji=emoji)
             for (label, desc, emoji) in REASON_OPTIONS
         ]
-        super().__init__(placeholder="Sélectionnez la catégorie…", min_values=1, max_values=1, options=options)
+        super().__init__(placeholder="Sélectionnez la catégorie…", min_values=1, max_values=1, options=options,
+                         custom_id="ticket:reason_select")
 
     async def callback(self, interaction: discord.Interaction):
         choice = self.values[0]
         await interaction.response.send_modal(ReasonModal(choice))
 
+def parse_day(raw: str) -> int:
+    return int(datetime.strptime(raw.strip(), "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp())
+
+def format_search_hit(hit: SearchHit) -> str:
+    when = datetime.utcfromtimestamp(hit.ts).strftime("%Y-%m-%d %H:%M")
+    tag = {KIND_NOTE: " • note", KIND_ATTACHMENT: " • fichier"}.get(hit.kind, "")
+    text = " ".join(hit.snippet.split())
+    if len(text) > 220:
+        text = text[:219] + "…"
+    return f"• **{when} UTC** — <@{hit.user_id}> • {hit.category}{tag} • par **{hit.by}**\n> {text}"
+
+def build_search_embed(hits: List[SearchHit], page: int, has_next: bool) -> discord.Embed:
+    embed = discord.Embed(
+        title=f"🔎 Recherche — page {page}",
+        description="\n".join(format_search_hit(h) for h in hits) if hits else "*Aucun résultat*",
+        color=discord.Color.blurple()
+    )
+    embed.set_footer(text="Résultats du plus récent au plus ancien" + (" • ▶ pour la suite" if has_next else ""))
+    return embed
+
+class DMRouteView(discord.ui.View):
+    # Demande au joueur à quel serveur destiner ses messages ; ceux envoyés avant son choix attendent dans `messages`.
+    def __init__(self, user_id: int, tickets: List[TicketState], client: discord.Client,
+                 forward: Callable[[TicketState, discord.Message], Awaitable[None]]):
+        super().__init__(timeout=300)
+        self.user_id = user_id
+        self.forward = forward
+        self.messages: List[discord.Message] = []
+        self.prompt: Optional[discord.Message] = None
+        options = []
+        for state in tickets[:25]:
+            guild = client.get_guild(state.guild_id)
+            options.append(discord.SelectOption(label=guild.name if guild else str(state.guild_id),
+                                                description=state.category, value=str(state.channel_id)))
+        self.select = discord.ui.Select(placeholder="Serveur concerné…", options=options)
+        self.select.callback = self.choose
+        self.add_item(self.select)
+
+    async def choose(self, interaction: discord.Interaction):
+        DM_ROUTE_PROMPTS.pop(self.user_id, None)
+        self.stop()
+        state = CHANNEL_TICKETS.get(int(self.select.values[0]))
+        if state is None or state.user_id != self.user_id or state.channel_id in CLOSING:
+            return await interaction.response.edit_message(content="⚠️ Ce ticket est fermé, message non transmis.", view=None)
+        DM_ROUTES.set(self.user_id, state.channel_id)
+        label = next(o.label for o in self.select.options if o.value == self.select.values[0])
+        await interaction.response.edit_message(
+            content=f"✅ Transmis à **{label}**. Tes prochains messages iront aussi à ce serveur ; "
+                    f"réponds à un message d’un autre serveur pour changer.",
+            view=None
+        )
+        for message in self.messages:
+            await self.forward(state, message)
+
+    async def on_timeout(self):
+        if DM_ROUTE_PROMPTS.get(self.user_id) is self:
+            del DM_ROUTE_PROMPTS[self.user_id]
+        if self.prompt is not None:
+            try:
+                await self.prompt.edit(content="⌛ Aucun serveur choisi, message(s) non transmis.", view=None)
+            except discord.HTTPException:
+                pass
+
+class SearchResultsView(discord.ui.View):
+    # Pagination par curseur : on garde le curseur de début de chaque page déjà vue pour pouvoir revenir en arrière.
+    def __init__(self, author_id: int, query: SearchQuery, next_cursor: Optional[int]):
+        super().__init__(timeout=600)
+        self.author_id = author_id
+        self.query = query
+        self.starts: List[Optional[int]] = [None]
+        self.next_cursor = next_cursor
+        self.sync_buttons()
+
+    def sync_buttons(self):
+        self.previous.disabled = len(self.starts) <= 1
+        self.next.disabled = self.next_cursor is None
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return interaction.user.id == self.author_id
+
+    async def show(self, interaction: discord.Interaction, cursor: Optional[int]):
+        hits, self.next_cursor = await SEARCH_INDEX.search(self.query, cursor)
+        self.sync_buttons()
+        await interaction.response.edit_message(
+            embed=build_search_embed(hits, len(self.starts), self.next_cursor is not None), view=self
+        )
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.starts.pop()
+        await self.show(interaction, self.starts[-1])
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.starts.append(self.next_cursor)
+        await self.show(interaction, self.next_cursor)
+
+def format_duration(seconds: Optional[float]) -> str:
+    if seconds is None:
+        return "—"
+    if seconds < 60:
+        return f"{seconds:.0f} s"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    if seconds < 86400:
+        return f"{int(seconds // 3600)} h {int(seconds % 3600 // 60):02d}"
+    return f"{int(seconds // 86400)} j {int(seconds % 86400 // 3600)} h"
+
+def format_stats_bucket(bucket: StatsBucket) -> str:
+    auto = f" (dont {bucket.auto_closed} auto)" if bucket.auto_closed else ""
+    return (
+        f"Ouverts **{bucket.opened}** • fermés **{bucket.closed}**{auto}\n"
+        f"1re réponse : médiane {format_duration(bucket.first_reply.quantile(0.5))}"
+        f" • p90 {format_duration(bucket.first_reply.quantile(0.9))} (n={bucket.first_reply.count})\n"
+        f"Durée : médiane {format_duration(bucket.duration.quantile(0.5))}"
+        f" • p90 {format_duration(bucket.duration.quantile(0.9))}\n"
+        f"Messages : {bucket.player_messages} joueur • {bucket.staff_messages} staff"
+    )
+
+def build_stats_embed(guild_id: int, period: str, since: float, until: Optional[float] = None,
+                      category: Optional[str] = None) -> discord.Embed:
+    per_category = STATS.summary(guild_id, since, until, categories=[category] if category else None)
+    embed = discord.Embed(title=f"📊 Statistiques tickets — {period}", color=EMBED_COLOR)
+    if not per_category:
+        embed.description = "*Aucune donnée sur cette période.*"
+        return embed
+    if category is None and len(per_category) > 1:
+        total = StatsBucket()
+        for bucket in per_category.values():
+            total.merge(bucket)
+        embed.add_field(name="Toutes catégories", value=format_stats_bucket(total), inline=False)
+    for label, _desc, emoji in REASON_OPTIONS:
+        bucket = per_category.get(label)
+        if bucket is not None:
+            embed.add_field(name=f"{emoji} {label}", value=format_stats_bucket(bucket), inline=False)
+    embed.set_footer(text="Quantiles estimés (±2 %) • mis à jour en continu")
+    return embed
+
 class TicketOpenView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
@@ -287,169 +989,408 @@ class TicketAdminView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
 
-    @discord.ui.button(label="Fermer le ticket", style=discord.ButtonStyle.red, emoji="🗑️")
+    @discord.ui.button(label="Fermer le ticket", style=discord.ButtonStyle.red, emoji="🗑️", custom_id="ticket:close")
+    @HANDLER_SECONDS.timed(handler="close")
     async def close(self, interaction: discord.Interaction, button: discord.ui.Button):
-        user_id = CHANNEL_TO_USER.get(interaction.channel.id)
-        if not user_id:
+        state = ticket_for_channel(interaction.channel.id)
+        if not state:
             return await interaction.response.send_message("Ticket introuvable.", ephemeral=True)
-
-        state = ACTIVE_TICKETS.get(user_id)
-        user = interaction.client.get_user(user_id) or await interaction.client.fetch_user(user_id)
-
-        try:
-            await send_logs_via_webhook(interaction.client, state, user, interaction.guild, interaction.channel)
-        except Exception:
-            pass
-
-        if user:
-            try:
-                dm_close = discord.Embed(
-                    title="🗂️ Ticket fermé",
-                    description="Merci d’avoir contacté le staff. N’hésite pas à rouvrir un ticket si besoin.",
-                    color=discord.Color.dark_gray()
-                )
-                dm_close.add_field(name="Résumé", value=state.reason, inline=False)
-                dm_close.set_footer(text=f"{interaction.guild.name} • {datetime.utcnow().strftime('%d/%m/%Y %H:%M UTC')}")
-                if BANNER_URL:
-                    dm_close.set_image(url=BANNER_URL)
-                await user.send(embed=dm_close)
-            except discord.Forbidden:
-                pass
-
-        ACTIVE_TICKETS.pop(user_id, None)
-        CHANNEL_TO_USER.pop(interaction.channel.id, None)
-        await interaction.channel.delete(reason="Ticket fermé")
+        # La fermeture (vidage du relais, DM, suppression du salon) peut dépasser le délai de 3 s de Discord.
+        await interaction.response.defer()
+        if not await close_ticket(interaction.client, state, interaction.guild, interaction.channel):
+            await interaction.followup.send("⏳ Fermeture déjà en cours.", ephemeral=True)
 
 class Ticket(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
+        self.http_session: Optional[aiohttp.ClientSession] = None
+        self.warmed_guilds: Set[int] = set()
+
+    async def cog_load(self):
+        await STORE.open()
+        await SEARCH_INDEX.open()
+        await TRANSCRIPT_ARCHIVE.open()
+        await STATS.open()
+        await rehydrate_from_store()
+        TRANSCRIPT_LOGS.start()
+        RENDER_POOL.start()
+        if TICKET_IDLE_SWEEP:
+            IDLE_SCHEDULER.start(self.sweep_idle)
+        self.http_session = aiohttp.ClientSession(trace_configs=[metrics.http_trace_config()])
+        await LOG_DELIVERY.start(self.bot, self.http_session)
+        await ATTACHMENT_MIRROR.start(self.http_session)
+        self.bot.add_view(TicketOpenView())
+        self.bot.add_view(TicketAdminView())
+        LOOP_LAG_MONITOR.start()
+        await METRICS_SERVER.start()
+        print(f"[ticket] {len(ACTIVE_TICKETS)} ticket(s) ouvert(s) restauré(s) depuis le stockage.")
+        if RESUMED_CLOSES:
+            print(f"[ticket] {len(RESUMED_CLOSES)} fermeture(s) interrompue(s) à reprendre.")
+
+    async def cog_unload(self):
+        await IDLE_SCHEDULER.stop()
+        CHANNEL_POOL.stop()
+        await METRICS_SERVER.stop()
+        LOOP_LAG_MONITOR.stop()
+        await ATTACHMENT_MIRROR.stop()
+        # Copies annulées : le transcript garde l'URL d'origine, on attend seulement la fin des tâches.
+        await asyncio.gather(*(t for tasks in PENDING_MIRRORS.values() for t in tasks), return_exceptions=True)
+        # Fermetures en cours : leurs logs sont mis en file (sur disque) avant l'arrêt de l'envoi.
+        await asyncio.gather(*CLOSE_TASKS, return_exceptions=True)
+        await LOG_DELIVERY.stop()
+        if self.http_session is not None:
+            await self.http_session.close()
+            self.http_session = None
+        await RENDER_POOL.stop()
+        await TRANSCRIPT_LOGS.stop()
+        await SEARCH_INDEX.close()
+        await TRANSCRIPT_ARCHIVE.close()
+        await STATS.close()
+        await STORE.close()
+
+    @app_commands.command(name="metriques", description="Affiche les métriques internes du système de tickets.")
+    @app_commands.checks.has_permissions(administrator=True)
+    @app_commands.guilds(*COMMAND_GUILDS)
+    async def metriques(self, interaction: discord.Interaction):
+        await interaction.response.send_message(embed=build_metrics_embed(), ephemeral=True)
 
     @commands.command(name="ticket")
     @commands.has_permissions(administrator=True)
     async def ticket_panel(self, ctx: commands.Context):
+        config = GUILD_CONFIGS.get(ctx.guild.id)
+        if config is None:
+            return await ctx.send("⚠️ Les tickets ne sont pas configurés sur ce serveur.")
         emoji_str = get_emoji_markup(self.bot, ctx.guild, CUSTOM_EMOJI_ID)
         desc = build_open_panel_description(emoji_str)
 
         embed = discord.Embed(description=desc, color=EMBED_COLOR)
-        if BANNER_URL:
-            embed.set_image(url=BANNER_URL)
+        if config.banner_url:
+            embed.set_image(url=config.banner_url)
         embed.set_footer(text=f"{ctx.guild.name} • {datetime.utcnow().strftime('%d/%m/%Y %H:%M UTC')}")
         await ctx.send(embed=embed, view=TicketOpenView())
 
     @app_commands.command(name="commentaire", description="Ajoute un commentaire interne au ticket (non envoyé au joueur).")
     @app_commands.checks.has_permissions(manage_messages=True)
-    @app_commands.guilds(discord.Object(id=GUILD_ID))
+    @app_commands.guilds(*COMMAND_GUILDS)
     async def commentaire(self, interaction: discord.Interaction, texte: str):
         if not isinstance(interaction.channel, discord.TextChannel):
             return await interaction.response.send_message("Utilise cette commande dans un salon de ticket.", ephemeral=True)
 
-        user_id = CHANNEL_TO_USER.get(interaction.channel.id)
-        if not user_id:
-            return await interaction.response.send_message("Ce salon n'est pas lié à un ticket actif.", ephemeral=True)
-
-        state = ACTIVE_TICKETS.get(user_id)
+        state = ticket_for_channel(interaction.channel.id)
         if not state:
-            return await interaction.response.send_message("Ticket introuvable.", ephemeral=True)
+            return await interaction.response.send_message("Ce salon n'est pas lié à un ticket actif.", ephemeral=True)
+        if state.channel_id in CLOSING:
+            return await interaction.response.send_message("⏳ Ce ticket est en cours de fermeture.", ephemeral=True)
 
-        USER_COMMENTS.setdefault(user_id, []).append({
+        record_comment(state, {
             "by": str(interaction.user),
             "content": texte,
             "ts": datetime.utcnow(),
             "channel_id": interaction.channel.id
         })
 
-        state.transcript.append({
-            "by": f"{interaction.user} (note)",
-            "content": texte,
-            "ts": datetime.utcnow(),
-            "internal": True,
-            "is_attachment": False
-        })
+        record_transcript(state, TranscriptEntry.now(f"{interaction.user} (note)", texte, internal=True))
 
         await interaction.response.send_message("📝 Commentaire ajouté (note interne liée au joueur).", ephemeral=True)
         await interaction.channel.send(f"📝 **Note interne par {interaction.user.mention}** : {texte}")
 
+    @app_commands.command(name="commentaires", description="Affiche l'historique des commentaires internes d'un joueur.")
+    @app_commands.checks.has_permissions(manage_messages=True)
+    @app_commands.guilds(*COMMAND_GUILDS)
+    async def commentaires(self, interaction: discord.Interaction, joueur: discord.User, page: app_commands.Range[int, 1] = 1):
+        items, total = await fetch_comments_page(interaction.guild.id, joueur.id, page)
+        if not total:
+            return await interaction.response.send_message(f"Aucun commentaire pour {joueur.mention}.", ephemeral=True)
+        pages = (total + COMMENTS_PER_PAGE - 1) // COMMENTS_PER_PAGE
+        if not items:
+            return await interaction.response.send_message(f"Page inexistante (1 à {pages}).", ephemeral=True)
+        embed = discord.Embed(
+            title=f"Commentaires sur {joueur} — page {page}/{pages}",
+            description="\n".join(format_comment_line(it, interaction.guild) for it in items),
+            color=discord.Color.blurple()
+        )
+        embed.set_footer(text=f"{total} commentaire(s) au total • /commentaires page:{min(page + 1, pages)} pour la suite")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="recherche", description="Recherche dans les transcripts et les notes internes.")
+    @app_commands.describe(
+        texte="Mots recherchés (mot* pour un préfixe)",
+        joueur="Joueur à l'origine du ticket",
+        categorie="Catégorie du ticket",
+        depuis="Date de début (AAAA-MM-JJ)",
+        jusqua="Date de fin incluse (AAAA-MM-JJ)"
+    )
+    @app_commands.choices(categorie=[app_commands.Choice(name=label, value=label) for label, _d, _e in REASON_OPTIONS])
+    @app_commands.checks.has_permissions(manage_messages=True)
+    @app_commands.guilds(*COMMAND_GUILDS)
+    async def recherche(self, interaction: discord.Interaction,
+                        texte: Optional[str] = None,
+                        joueur: Optional[discord.User] = None,
+                        categorie: Optional[app_commands.Choice[str]] = None,
+                        depuis: Optional[str] = None,
+                        jusqua: Optional[str] = None):
+        try:
+            since = parse_day(depuis) if depuis else None
+            until = parse_day(jusqua) + 86400 if jusqua else None
+        except ValueError:
+            return await interaction.response.send_message("Date invalide : utilise le format AAAA-MM-JJ.", ephemeral=True)
+        query = SearchQuery(
+            interaction.guild.id,
+            text=texte or "",
+            user_id=joueur.id if joueur else None,
+            category=categorie.value if categorie else None,
+            since=since,
+            until=until,
+            limit=SEARCH_PAGE_SIZE,
+        )
+        hits, next_cursor = await SEARCH_INDEX.search(query)
+        view = SearchResultsView(interaction.user.id, query, next_cursor)
+        await interaction.response.send_message(
+            embed=build_search_embed(hits, 1, next_cursor is not None), view=view, ephemeral=True
+        )
+
+    @app_commands.command(name="stats", description="Statistiques des tickets sur une période.")
+    @app_commands.describe(
+        periode="Période jusqu'à maintenant ou jusqu'à la date de fin (24 h par défaut)",
+        categorie="Catégorie du ticket",
+        depuis="Date de début (AAAA-MM-JJ), remplace la période",
+        jusqua="Date de fin incluse (AAAA-MM-JJ)"
+    )
+    @app_commands.choices(
+        periode=[app_commands.Choice(name=label, value=seconds) for label, seconds in STATS_PERIODS],
+        categorie=[app_commands.Choice(name=label, value=label) for label, _d, _e in REASON_OPTIONS],
+    )
+    @app_commands.checks.has_permissions(manage_messages=True)
+    @app_commands.guilds(*COMMAND_GUILDS)
+    async def stats(self, interaction: discord.Interaction,
+                    periode: Optional[app_commands.Choice[int]] = None,
+                    categorie: Optional[app_commands.Choice[str]] = None,
+                    depuis: Optional[str] = None,
+                    jusqua: Optional[str] = None):
+        label, seconds = (periode.name, periode.value) if periode else STATS_PERIODS[0]
+        try:
+            until = parse_day(jusqua) + 86400 if jusqua else None
+            since = parse_day(depuis) if depuis else (until or time.time()) - seconds
+        except ValueError:
+            return await interaction.response.send_message("Date invalide : utilise le format AAAA-MM-JJ.", ephemeral=True)
+        if until is not None and since >= until:
+            return await interaction.response.send_message("La date de début doit précéder la date de fin.", ephemeral=True)
+        if depuis:
+            label = f"du {depuis.strip()} au {jusqua.strip()}" if jusqua else f"depuis le {depuis.strip()}"
+        elif jusqua:
+            label = f"{label} jusqu'au {jusqua.strip()} inclus"
+        embed = build_stats_embed(interaction.guild.id, label, since, until, categorie.value if categorie else None)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @app_commands.command(name="transcript", description="Renvoie le transcript d'un ticket fermé.")
+    @app_commands.describe(numero="Numéro d'archive du ticket", joueur="Liste les tickets archivés d'un joueur")
+    @app_commands.checks.has_permissions(manage_messages=True)
+    @app_commands.guilds(*COMMAND_GUILDS)
+    async def transcript(self, interaction: discord.Interaction,
+                         numero: Optional[int] = None,
+                         joueur: Optional[discord.User] = None):
+        if numero is None:
+            if joueur is None:
+                return await interaction.response.send_message("Indique un numéro d'archive ou un joueur.", ephemeral=True)
+            records = await TRANSCRIPT_ARCHIVE.for_user(interaction.guild.id, joueur.id)
+            if not records:
+                return await interaction.response.send_message(f"Aucun ticket archivé pour {joueur.mention}.", ephemeral=True)
+            embed = discord.Embed(
+                title=f"Tickets archivés de {joueur}",
+                description="\n".join(
+                    f"• `n°{r.id}` — {r.category} • fermé le {datetime.utcfromtimestamp(r.closed_at):%Y-%m-%d %H:%M} UTC"
+                    for r in records
+                ),
+                color=discord.Color.blurple()
+            )
+            embed.set_footer(text="/transcript numero:<n°> pour récupérer un transcript")
+            return await interaction.response.send_message(embed=embed, ephemeral=True)
+
+        record = await TRANSCRIPT_ARCHIVE.get(interaction.guild.id, numero)
+        if record is None:
+            return await interaction.response.send_message("Archive introuvable.", ephemeral=True)
+        compressed = record.raw_length > ARCHIVE_INLINE_MAX
+        # Vérifié avant la lecture : inutile de charger une archive que Discord refusera.
+        size = record.length if compressed else record.raw_length
+        if size > interaction.guild.filesize_limit:
+            return await interaction.response.send_message(
+                f"L'archive n°{record.id} pèse {size / (1024 * 1024):.1f} Mo, au-delà de la limite d'envoi du serveur "
+                f"({interaction.guild.filesize_limit // (1024 * 1024)} Mo).",
+                ephemeral=True
+            )
+        read = TRANSCRIPT_ARCHIVE.read_compressed if compressed else TRANSCRIPT_ARCHIVE.read_text
+        data = await asyncio.get_running_loop().run_in_executor(None, read, record)
+        filename = f"ticket-{record.user_id}-{record.id}.txt" + (".gz" if compressed else "")
+        try:
+            await interaction.response.send_message(
+                f"🧾 Archive n°{record.id} — <@{record.user_id}> • {record.reason}\n"
+                f"Ouvert le {datetime.utcfromtimestamp(record.opened_at):%Y-%m-%d %H:%M} UTC • "
+                f"fermé le {datetime.utcfromtimestamp(record.closed_at):%Y-%m-%d %H:%M} UTC",
+                file=discord.File(io.BytesIO(data), filename=filename),
+                ephemeral=True
+            )
+        except discord.HTTPException as e:
+            print(f"[transcript] Envoi de l'archive n°{record.id} impossible : {e}")
+            if not interaction.response.is_done():
+                await interaction.response.send_message(f"⚠️ Impossible d'envoyer l'archive n°{record.id}.", ephemeral=True)
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         if message.author.bot:
             return
 
         if isinstance(message.channel, discord.DMChannel):
-            state = ACTIVE_TICKETS.get(message.author.id)
-            if not state:
-                return
-            guild = self.bot.get_guild(GUILD_ID)
-            if not guild:
-                return
-            ch = guild.get_channel(state.channel_id)
-            if not isinstance(ch, discord.TextChannel):
-                return
-
-            if message.content:
-                state.transcript.append({
-                    "by": str(message.author),
-                    "content": message.content,
-                    "ts": datetime.utcnow(),
-                    "internal": False,
-                    "is_attachment": False
-                })
-                await ch.send(f"**{message.author} (joueur)** : {message.content}")
-
-            for att in message.attachments:
-                state.transcript.append({
-                    "by": str(message.author),
-                    "content": att.url,
-                    "ts": datetime.utcnow(),
-                    "internal": False,
-                    "is_attachment": True
-                })
-                await ch.send(att.url)
-
+            await self.relay_from_player(message)
         elif isinstance(message.channel, discord.TextChannel):
-            user_id = CHANNEL_TO_USER.get(message.channel.id)
-            if not user_id:
-                return
-            if message.content.startswith(("/", "!")):
-                return
-
-            user = self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
-            state = ACTIVE_TICKETS.get(user_id)
-            if not user or not state:
-                return
-
-            if message.content:
-                state.transcript.append({
-                    "by": f"{message.author} (staff)",
-                    "content": message.content,
-                    "ts": datetime.utcnow(),
-                    "internal": False,
-                    "is_attachment": False
-                })
-                try:
-                    await user.send(f"**{message.author} (staff)** : {message.content}")
-                except discord.Forbidden:
-                    await message.channel.send("⚠️ Impossible d’envoyer un DM au joueur (MP fermés).")
-
-            for att in message.attachments:
-                state.transcript.append({
-                    "by": f"{message.author} (staff)",
-                    "content": att.url,
-                    "ts": datetime.utcnow(),
-                    "internal": False,
-                    "is_attachment": True
-                })
-                try:
-                    await user.send(att.url)
-                except discord.Forbidden:
-                    pass
+            await self.relay_from_staff(message)
+
+    @HANDLER_SECONDS.timed(handler="relay_player_to_staff")
+    async def relay_from_player(self, message: discord.Message):
+        tickets = USER_TICKETS.get(message.author.id)
+        if not tickets:
+            return
+        reference_id = message.reference.message_id if message.reference else None
+        state = ticket_for_dm(message.author.id, reference_id)
+        if state is None:
+            return await self.ask_dm_route(message, list(tickets.values()))
+        if len(tickets) > 1:
+            DM_ROUTES.set(message.author.id, state.channel_id)
+        await self.forward_from_player(state, message)
+
+    async def ask_dm_route(self, message: discord.Message, tickets: List[TicketState]):
+        prompt = DM_ROUTE_PROMPTS.get(message.author.id)
+        if prompt is not None and not prompt.is_finished():
+            prompt.messages.append(message)
+            return
+        view = DM_ROUTE_PROMPTS[message.author.id] = DMRouteView(message.author.id, tickets, self.bot,
+                                                                  self.forward_from_player)
+        view.messages.append(message)
+        try:
+            view.prompt = await message.channel.send(
+                "📨 Tu as des tickets ouverts sur plusieurs serveurs : choisis celui à qui transmettre ce message "
+                "(ou réponds directement à un message du serveur concerné).",
+                view=view
+            )
+        except discord.HTTPException as e:
+            DM_ROUTE_PROMPTS.pop(message.author.id, None)
+            view.stop()
+            TICKET_ERRORS.inc(where="dm_route")
+            print(f"[ticket] Impossible de demander le serveur à {message.author} : {e}")
+
+    async def forward_from_player(self, state: TicketState, message: discord.Message):
+        # Ticket en cours de fermeture : son relais est vidé, un nouveau ne serait jamais fermé.
+        if state.channel_id in CLOSING:
+            return
+        guild = self.bot.get_guild(state.guild_id)
+        if not guild:
+            return
+        ch = guild.get_channel(state.channel_id)
+        if not isinstance(ch, discord.TextChannel):
+            return
+
+        STATS.message(state.guild_id, state.category, staff=False)
+        relay = get_relay(state)
+        target = RelayTarget(ch.id, ch.send)
+        if message.content:
+            record_transcript(state, TranscriptEntry.now(str(message.author), message.content))
+            relay.push(target, f"**{message.author} (joueur)** : {message.content}")
+
+        for att in message.attachments:
+            record_attachment(state, str(message.author), att)
+            relay.push(target, att.url)
+
+    @HANDLER_SECONDS.timed(handler="relay_staff_to_player")
+    async def relay_from_staff(self, message: discord.Message):
+        state = ticket_for_channel(message.channel.id)
+        if not state or state.channel_id in CLOSING:
+            return
+        if message.content.startswith(("/", "!")):
+            return
+        STATS.message(state.guild_id, state.category, staff=True)
+        if not state.answered:
+            state.answered = True
+            STATS.first_reply(state.guild_id, state.category, time.time() - state.opened_ts)
+
+        recipient = await resolve_recipient(self.bot, state.user_id)
+        if not recipient:
+            return
+        dm = recipient[1]
+
+        async def _dm_closed():
+            RELAY_FALLBACKS.inc(reason="dm_closed")
+            await message.channel.send("⚠️ Impossible d’envoyer un DM au joueur (MP fermés).")
+
+        # Le joueur reçoit dans un même DM les réponses de tous ses serveurs : on précise lequel dès qu'il y en a plusieurs.
+        origin = f"[{message.guild.name}] " if len(USER_TICKETS.get(state.user_id, ())) > 1 else ""
+        # Un autre serveur lui écrit : son choix précédent n'est plus évident, le prochain message sans réponse redemandera.
+        if DM_ROUTES.get(state.user_id) not in (None, state.channel_id):
+            DM_ROUTES.pop(state.user_id)
+        relay = get_relay(state)
+        target = RelayTarget(dm.id, lambda text: send_ticket_dm(state, dm, text), on_forbidden=_dm_closed)
+        if message.content:
+            record_transcript(state, TranscriptEntry.now(f"{message.author} (staff)", message.content))
+            relay.push(target, f"{origin}**{message.author} (staff)** : {message.content}")
+
+        for att in message.attachments:
+            record_attachment(state, f"{message.author} (staff)", att)
+            relay.push(target, att.url)
+
+    async def sweep_idle(self, channel_id: int) -> Optional[float]:
+        state = ticket_for_channel(channel_id)
+        if state is None:
+            return None
+        due, remind = next_idle_step(state)
+        if due is None or due > time.time():
+            return due
+        guild = self.bot.get_guild(state.guild_id)
+        if guild is None:
+            return time.time() + IDLE_RETRY_DELAY
+        channel = guild.get_channel(channel_id)
+        if not isinstance(channel, discord.TextChannel):
+            # Salon supprimé à la main : plus rien à fermer.
+            forget_ticket(state)
+            return None
+        if not remind:
+            IDLE_ACTIONS.inc(action="close")
+            await close_ticket(self.bot, state, guild, channel, auto_closed=True)
+            return None
+
+        IDLE_ACTIONS.inc(action="remind")
+        state.reminded_at = time.time()
+        remind_after, close_after = idle_timeout(state)
+        idle_for = format_delay(state.reminded_at - state.last_activity)
+        close_in = format_delay(close_after - remind_after) if close_after else None
+        if close_in is None:
+            notice = f"⏰ Aucun message depuis {idle_for} dans ce ticket."
+        else:
+            notice = f"⏰ Aucun message depuis {idle_for} : ce ticket sera fermé automatiquement dans {close_in} sans nouvelle activité."
+        try:
+            await channel.send(notice)
+        except discord.HTTPException as e:
+            TICKET_ERRORS.inc(where="idle_remind")
+            print(f"[ticket] Impossible d'envoyer la relance dans #{channel.name} : {e}")
+        recipient = await resolve_recipient(self.bot, state.user_id)
+        if recipient and close_in is not None:
+            try:
+                await send_ticket_dm(state, recipient[1],
+                                     f"⏰ Ton ticket sur **{guild.name}** ({state.category}) est sans réponse depuis "
+                                     f"{idle_for} : il sera fermé automatiquement dans {close_in} si tu n’y écris pas.")
+            except discord.Forbidden:
+                pass
+        return next_idle_step(state)[0]
 
     @commands.Cog.listener()
     async def on_ready(self):
-        try:
-            self.bot.add_view(TicketOpenView())
-            self.bot.add_view(TicketAdminView())
-        except Exception:
-            pass
+        resume_closes(self.bot)
+        if not CHANNEL_POOL.enabled:
+            return
+        # Avec AutoShardedBot, on_ready n'arrive qu'une fois tous les shards prêts ; les guildes absentes seront reprises au prochain.
+        for guild_id in GUILD_CONFIGS:
+            guild = self.bot.get_guild(guild_id)
+            if guild is None or guild_id in self.warmed_guilds:
+                continue
+            CHANNEL_POOL.warm(ticket_categories(guild))
+            self.warmed_guilds.add(guild_id)
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(Ticket(bot))
@@ -1,71 +1,178 @@
 import os
+import json
 import asyncio
+import hashlib
 import discord
 
+from typing import List, Optional
 from discord.ext import commands
 from dotenv import load_dotenv
 
-load_dotenv()
+from utils.guild_config import configured_guild_ids
+from utils.metrics import http_trace_config
 
-TOKEN = os.getenv("TOKEN")
-GUILD_ID_STR = os.getenv("GUILDID")
+STATUS_TEXT = "👹 Joue à Atlas | Demon Slayer Rp"
 
-if not TOKEN:
-    print("Erreur : Le TOKEN n'est pas défini dans le fichier .env")
-    exit(1)
+# Renseignés par load_settings() : les workers de rendu (spawn) réimportent ce module sans l'exécuter comme script,
+# rien ne doit donc se faire à l'import (lecture du .env, vérifications, construction du bot).
+TOKEN: Optional[str] = None
+GUILD_IDS: List[int] = []
+SHARD_COUNT = ""
+DATA_DIR = "data"
+SYNC_STATE_PATH = os.path.join(DATA_DIR, "command_sync.json")
+LOW_MEMORY_MODE = False
+LOW_MEMORY_MAX_MESSAGES = 100
 
-if not GUILD_ID_STR:
-    print("Erreur : Le GUILDID n'est pas défini dans le fichier .env")
-    exit(1)
+bot: Optional[commands.Bot] = None
 
-try:
-    GUILD_ID = int(GUILD_ID_STR)
-except ValueError:
-    print("Erreur : GUILDID n'est pas un nombre valide.")
-    exit(1)
+def load_settings():
+    global TOKEN, GUILD_IDS, SHARD_COUNT, DATA_DIR, SYNC_STATE_PATH, LOW_MEMORY_MODE, LOW_MEMORY_MAX_MESSAGES
+    load_dotenv()
 
-intents = discord.Intents.default()
-intents.message_content = True
-intents.members = True
+    TOKEN = os.getenv("TOKEN")
+    guild_id_str = os.getenv("GUILDID")
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+    if not TOKEN:
+        print("Erreur : Le TOKEN n'est pas défini dans le fichier .env")
+        exit(1)
+
+    guilds_config_path = os.getenv("TICKET_GUILDS_CONFIG", os.path.join("config", "guilds.json"))
+
+    if not guild_id_str and not os.path.exists(guilds_config_path):
+        print(f"Erreur : Le GUILDID n'est pas défini dans le fichier .env et {guilds_config_path} est absent")
+        exit(1)
+
+    try:
+        guild_id = int(guild_id_str or 0)
+    except ValueError:
+        print("Erreur : GUILDID n'est pas un nombre valide.")
+        exit(1)
+
+    try:
+        GUILD_IDS = configured_guild_ids(guilds_config_path, guild_id)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Erreur : {guilds_config_path} est invalide ({e}).")
+        exit(1)
+
+    # SHARD_COUNT vide : un seul shard. "auto" : nombre recommandé par Discord. Sinon nombre total de shards.
+    # Tous les shards tournent dans ce processus : les DM n'arrivent que sur le shard 0 et l'état des tickets
+    # (balayage d'inactivité, file des logs) n'est pas partagé, ils ne peuvent pas être répartis entre processus.
+    SHARD_COUNT = os.getenv("SHARD_COUNT", "").strip().lower()
+    if SHARD_COUNT not in ("", "auto") and not (SHARD_COUNT.isdigit() and int(SHARD_COUNT) > 0):
+        print("Erreur : SHARD_COUNT doit être vide, \"auto\" ou un nombre entier positif.")
+        exit(1)
+
+    DATA_DIR = os.getenv("TICKET_DATA_DIR", "data")
+    SYNC_STATE_PATH = os.path.join(DATA_DIR, "command_sync.json")
+    LOW_MEMORY_MODE = os.getenv("LOW_MEMORY_MODE", "0") == "1"
+    LOW_MEMORY_MAX_MESSAGES = int(os.getenv("LOW_MEMORY_MAX_MESSAGES", "100"))
+
+def cache_options(low_memory: bool) -> dict:
+    if not low_memory:
+        return {}
+    # Pas de chunking au démarrage ni de cache de membres : le cog ticket résout ses joueurs à la demande.
+    return {
+        "chunk_guilds_at_startup": False,
+        "member_cache_flags": discord.MemberCacheFlags.none(),
+        "max_messages": LOW_MEMORY_MAX_MESSAGES,
+    }
+
+def shard_options(shard_count: str) -> dict:
+    if shard_count in ("", "auto"):
+        return {}
+    return {"shard_count": int(shard_count)}
+
+def create_bot() -> commands.Bot:
+    global bot
+    intents = discord.Intents.default()
+    intents.message_content = True
+    intents.members = True
+
+    bot_class = commands.AutoShardedBot if SHARD_COUNT else commands.Bot
+    bot = bot_class(
+        command_prefix="!",
+        intents=intents,
+        http_trace=http_trace_config(),
+        # Envoyée dans chaque IDENTIFY : la présence survit aux reconnexions sans reprise de session.
+        activity=discord.CustomActivity(name=STATUS_TEXT),
+        **shard_options(SHARD_COUNT),
+        **cache_options(LOW_MEMORY_MODE)
+    )
+    bot.event(on_ready)
+    return bot
+
+startup_done = False
 
-@bot.event
 async def on_ready():
+    global startup_done
     print(f"Bot connecté en tant que {bot.user}")
-    bot.loop.create_task(update_status_periodically())
+    # on_ready est rappelé à chaque reconnexion de la gateway : le démarrage ne doit se faire qu'une fois.
+    if startup_done:
+        return
+    startup_done = True
+    for guild_id in GUILD_IDS:
+        if bot.get_guild(guild_id) is None:
+            print(f"Impossible de trouver la guilde avec l'ID {guild_id}.")
+        try:
+            await sync_commands_if_changed(discord.Object(id=guild_id))
+        except Exception as e:
+            print(f"Erreur lors de la synchronisation pour la guilde {guild_id} : {e}")
+
+def command_tree_hash(guild: discord.abc.Snowflake) -> str:
+    payload = sorted(
+        (cmd.to_dict(bot.tree) for cmd in bot.tree.get_commands(guild=guild)),
+        key=lambda c: (c.get("type", 1), c["name"])
+    )
+    raw = json.dumps({"application_id": bot.application_id, "commands": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def load_sync_state() -> dict:
     try:
-        guild = discord.Object(id=GUILD_ID)
-        synced = await bot.tree.sync(guild=guild)
-        print(f"Sync réussi ! {len(synced)} commande(s) synchronisée(s).")
+        with open(SYNC_STATE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_sync_state(state: dict):
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp = SYNC_STATE_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp, SYNC_STATE_PATH)
+
+async def sync_commands_if_changed(guild: discord.abc.Snowflake):
+    digest = command_tree_hash(guild)
+    state = load_sync_state()
+    if state.get(str(guild.id)) == digest:
+        print(f"Commandes inchangées pour la guilde {guild.id}, sync ignorée.")
+        return
+    synced = await bot.tree.sync(guild=guild)
+    state[str(guild.id)] = digest
+    save_sync_state(state)
+    print(f"Sync réussi pour la guilde {guild.id} ! {len(synced)} commande(s) synchronisée(s).")
+
+async def load_cog(cog: str):
+    try:
+        await bot.load_extension(cog)
+        print(f"Extension chargée : {cog}")
+    except discord.ext.commands.ExtensionFailed as e:
+        print(f"Erreur de chargement pour {cog}: Échec de l'extension. Détails: {str(e)}")
     except Exception as e:
-        print(f"Erreur lors de la synchronisation : {e}")
-
-async def update_status_periodically():
-    while True:
-        guild = bot.get_guild(GUILD_ID)
-        if guild is not None:
-            member_count = guild.member_count
-            await bot.change_presence(activity=discord.CustomActivity(name=f'👹 Joue à Atlas | Demon Slayer Rp'))
-        else:
-            print(f"Impossible de trouver la guilde avec l'ID {GUILD_ID}.")
-        await asyncio.sleep(60)
+        print(f"Erreur de chargement pour {cog}: Erreur générale. Détails: {str(e)}")
 
-async def main():
+async def run():
     cogs_list = [
         "cogs.ticket",
     ]
 
-    for cog in cogs_list:
-        try:
-            await bot.load_extension(cog)
-            print(f"Extension chargée : {cog}")
-        except discord.ext.commands.ExtensionFailed as e:
-            print(f"Erreur de chargement pour {cog}: Échec de l'extension. Détails: {str(e)}")
-        except Exception as e:
-           print(f"Erreur de chargement pour {cog}: Erreur générale. Détails: {str(e)}")
+    await asyncio.gather(*(load_cog(cog) for cog in cogs_list))
 
     await bot.start(TOKEN)
 
+async def main():
+    load_settings()
+    create_bot()
+    await run()
+
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,87 @@
+import asyncio
+import os
+
+import aiohttp
+
+from bench.fake_discord import FakeCDN
+from utils.attachment_mirror import AttachmentMirror
+
+
+def stored_files(directory):
+    return [
+        os.path.join(root, name)
+        for root, _dirs, names in os.walk(directory)
+        if os.path.basename(root) != "tmp"
+        for name in names
+    ]
+
+
+async def with_mirror(tmp_path, scenario, **kwargs):
+    cdn = FakeCDN(latency=0)
+    await cdn.start()
+    mirror = AttachmentMirror(str(tmp_path), **kwargs)
+    try:
+        async with aiohttp.ClientSession() as session:
+            await mirror.start(session)
+            try:
+                return await scenario(cdn, mirror)
+            finally:
+                await mirror.stop()
+    finally:
+        await cdn.stop()
+
+
+def test_same_content_is_stored_once(tmp_path):
+    async def scenario(cdn, mirror):
+        # Même graine : mêmes octets sous deux URL différentes.
+        first = await mirror.mirror(cdn.url_for(1, "a.png", 200_000, "capture"), "a.png")
+        second = await mirror.mirror(cdn.url_for(2, "b.png", 200_000, "capture"), "b.png")
+        return first, second
+
+    first, second = asyncio.run(with_mirror(tmp_path, scenario, workers=2))
+    assert first.sha256 == second.sha256
+    assert stored_files(str(tmp_path)) == [os.path.join(str(tmp_path), first.relpath)]
+    assert os.path.getsize(os.path.join(str(tmp_path), first.relpath)) == 200_000
+
+
+def test_same_url_is_downloaded_once(tmp_path):
+    async def scenario(cdn, mirror):
+        url = cdn.url_for(1, "a.png", 50_000)
+        files = await asyncio.gather(*(mirror.mirror(url, "a.png") for _ in range(5)))
+        return cdn.requests, files
+
+    requests, files = asyncio.run(with_mirror(tmp_path, scenario))
+    assert requests == 1
+    assert len({f.relpath for f in files}) == 1
+
+
+def test_announced_size_above_limit_is_skipped(tmp_path):
+    async def scenario(cdn, mirror):
+        file = await mirror.mirror(cdn.url_for(1, "big.mp4", 2_000), "big.mp4", size=2_000)
+        return cdn.requests, file
+
+    requests, file = asyncio.run(with_mirror(tmp_path, scenario, max_bytes=1_000))
+    assert file is None
+    assert requests == 0
+
+
+def test_oversized_download_leaves_nothing_behind(tmp_path):
+    async def scenario(cdn, mirror):
+        # Taille non annoncée par l'appelant : c'est la réponse du CDN qui est refusée.
+        return await mirror.mirror(cdn.url_for(1, "big.mp4", 300_000), "big.mp4")
+
+    file = asyncio.run(with_mirror(tmp_path, scenario, max_bytes=100_000))
+    assert file is None
+    assert stored_files(str(tmp_path)) == []
+    assert os.listdir(os.path.join(str(tmp_path), "tmp")) == []
+
+
+def test_start_removes_interrupted_downloads(tmp_path):
+    os.makedirs(os.path.join(str(tmp_path), "tmp"))
+    with open(os.path.join(str(tmp_path), "tmp", "dead.part"), "wb") as f:
+        f.write(b"partiel")
+
+    async def scenario(cdn, mirror):
+        return os.listdir(mirror.tmp_directory)
+
+    assert asyncio.run(with_mirror(tmp_path, scenario)) == []
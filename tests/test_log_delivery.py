@@ -0,0 +1,102 @@
+import asyncio
+import io
+import os
+
+import discord
+
+from bench.fake_discord import _FakeResponse
+from utils.log_delivery import LogDeliveryQueue
+
+WEBHOOK_URL = "https://discord.com/api/webhooks/1/token"
+
+
+class FakeWebhook:
+    # Lève les erreurs de `errors` dans l'ordre, puis accepte les envois.
+    def __init__(self, *errors: Exception):
+        self.errors = list(errors)
+        self.sent = 0
+
+    async def send(self, **kwargs):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.sent += 1
+
+
+class ReadyBot:
+    # Cache prêt, salon de logs introuvable.
+    def is_ready(self) -> bool:
+        return True
+
+    def get_channel(self, channel_id: int):
+        return None
+
+
+def http_error(status: int, retry_after: str = "") -> discord.HTTPException:
+    response = _FakeResponse(status)
+    if retry_after:
+        response.headers["Retry-After"] = retry_after
+    if status == 404:
+        return discord.NotFound(response, "Unknown Webhook")
+    return discord.HTTPException(response, "boom")
+
+
+def make_queue(tmp_path, webhook, bot=None) -> LogDeliveryQueue:
+    queue = LogDeliveryQueue(str(tmp_path), WEBHOOK_URL, 42)
+    queue._webhooks[WEBHOOK_URL] = webhook
+    queue.bot = bot
+    os.makedirs(queue.failed_directory, exist_ok=True)
+    return queue
+
+
+def attempt(queue: LogDeliveryQueue, times: int = 1):
+    async def run():
+        job_id = await queue.enqueue(discord.Embed(title="logs"), [("ticket.txt", io.BytesIO(b"transcript"))])
+        job = queue._load(job_id)
+        delays = [await queue._attempt(job_id, job) for _ in range(times)]
+        return job_id, job, delays
+
+    return asyncio.run(run())
+
+
+def test_delivered_job_is_removed(tmp_path):
+    webhook = FakeWebhook()
+    queue = make_queue(tmp_path, webhook)
+    job_id, _job, delays = attempt(queue)
+    assert delays == [None]
+    assert webhook.sent == 1
+    assert not os.path.exists(queue._job_dir(job_id))
+
+
+def test_server_error_backs_off_exponentially(tmp_path):
+    queue = make_queue(tmp_path, FakeWebhook(*(http_error(500) for _ in range(2))))
+    job_id, job, delays = attempt(queue, times=2)
+    assert delays == [queue.base_backoff, queue.base_backoff * 2]
+    assert job["attempts"] == 2
+    assert os.path.isdir(queue._job_dir(job_id))
+
+
+def test_rate_limit_waits_retry_after_without_counting_an_attempt(tmp_path):
+    queue = make_queue(tmp_path, FakeWebhook(http_error(429, retry_after="7")))
+    job_id, job, delays = attempt(queue)
+    assert delays == [7.0]
+    assert job["attempts"] == 0
+    assert os.path.isdir(queue._job_dir(job_id))
+
+
+def test_deleted_webhook_without_log_channel_is_dead_lettered(tmp_path):
+    queue = make_queue(tmp_path, FakeWebhook(http_error(404)), bot=ReadyBot())
+    job_id, _job, delays = attempt(queue)
+    assert delays == [None]
+    assert WEBHOOK_URL in queue._dead_webhooks
+    assert not os.path.exists(queue._job_dir(job_id))
+    assert os.listdir(queue.failed_directory) == [job_id]
+
+
+def test_deleted_webhook_is_not_retried(tmp_path):
+    webhook = FakeWebhook(http_error(404))
+    # Cache pas encore prêt : l'envoi reste en file pour le salon de logs, le webhook n'est plus appelé.
+    queue = make_queue(tmp_path, webhook)
+    job_id, _job, delays = attempt(queue, times=2)
+    assert delays == [queue.base_backoff, queue.base_backoff * 2]
+    assert webhook.sent == 0 and not webhook.errors
+    assert os.path.isdir(queue._job_dir(job_id))
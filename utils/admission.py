@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Optional
+
+from utils import metrics
+
+ADMISSION_WAIT = metrics.histogram(
+    "ticket_admission_wait_seconds", "Attente dans la file d'admission avant l'ouverture d'un ticket.",
+    buckets=(0.01, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+
+Notify = Callable[[int], Awaitable[None]]
+
+
+class _Waiter:
+    __slots__ = ("future", "notify", "last_position", "last_notified")
+
+    def __init__(self, future: asyncio.Future, notify: Optional[Notify]):
+        self.future = future
+        self.notify = notify
+        self.last_position = 0
+        self.last_notified = 0.0
+
+
+class AdmissionController:
+    # Seau à jetons : au-delà du débit, les ouvertures attendent leur tour dans une file FIFO.
+    def __init__(self, rate: float = 2.0, burst: int = 5, notify_interval: float = 3.0):
+        self.rate = rate
+        self.burst = burst
+        self.notify_interval = notify_interval
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._waiters: Deque[_Waiter] = deque()
+        self._drainer: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def admit(self, notify: Optional[Notify] = None) -> None:
+        self._refill()
+        if not self._waiters and self._tokens >= 1.0:
+            self._tokens -= 1.0
+            ADMISSION_WAIT.observe(0.0)
+            return
+        started = time.monotonic()
+        waiter = _Waiter(asyncio.get_running_loop().create_future(), notify)
+        self._waiters.append(waiter)
+        if self._drainer is None or self._drainer.done():
+            self._drainer = asyncio.create_task(self._drain())
+        if self._claim_notification(waiter, len(self._waiters), force=True):
+            await self._notify(waiter, len(self._waiters))
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+        ADMISSION_WAIT.observe(time.monotonic() - started)
+
+    def _claim_notification(self, waiter: _Waiter, position: int, force: bool = False) -> bool:
+        if waiter.notify is None or position == waiter.last_position:
+            return False
+        now = time.monotonic()
+        if not force and now - waiter.last_notified < self.notify_interval:
+            return False
+        waiter.last_position = position
+        waiter.last_notified = now
+        return True
+
+    async def _notify(self, waiter: _Waiter, position: int) -> None:
+        try:
+            await waiter.notify(position)
+        except Exception as e:
+            print(f"[admission] Impossible d'informer un joueur de sa position : {e}")
+
+    async def _drain(self) -> None:
+        while self._waiters:
+            self._refill()
+            if self._tokens < 1.0:
+                await asyncio.sleep((1.0 - self._tokens) / self.rate)
+                continue
+            waiter = self._waiters.popleft()
+            if waiter.future.done():
+                continue
+            self._tokens -= 1.0
+            waiter.future.set_result(None)
+            for position, other in enumerate(self._waiters, start=1):
+                if self._claim_notification(other, position):
+                    asyncio.create_task(self._notify(other, position))
@@ -0,0 +1,236 @@
+import asyncio
+import hashlib
+import os
+import re
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+
+from utils import metrics
+from utils.cache import TTLCache
+
+DOWNLOAD_CHUNK = 256 * 1024
+PRUNE_INTERVAL = 6 * 3600
+_EXT = re.compile(r"^\.[a-z0-9]{1,8}$")
+
+MIRROR_DOWNLOADS = metrics.counter("ticket_mirror_downloads_total", "Copies locales de pièces jointes, par résultat.")
+MIRROR_BYTES = metrics.counter("ticket_mirror_bytes_total", "Octets téléchargés par le miroir de pièces jointes.")
+MIRROR_SECONDS = metrics.histogram(
+    "ticket_mirror_seconds", "Durée du téléchargement d'une pièce jointe.",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+)
+
+
+class MirrorError(Exception):
+    pass
+
+
+class MirroredFile:
+    __slots__ = ("sha256", "ext", "size")
+
+    def __init__(self, sha256: str, ext: str, size: int):
+        self.sha256 = sha256
+        self.ext = ext
+        self.size = size
+
+    @property
+    def relpath(self) -> str:
+        return f"{self.sha256[:2]}/{self.sha256}{self.ext}"
+
+
+def _extension(filename: str) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    return ext if _EXT.match(ext) else ""
+
+
+class AttachmentMirror:
+    # Copie locale des pièces jointes (les liens du CDN Discord expirent) : `workers` téléchargements au plus
+    # en parallèle sur la session HTTP partagée, écriture par blocs, fichiers nommés par leur SHA-256
+    # pour qu'une même capture postée dans plusieurs tickets ne soit stockée qu'une fois.
+    # `workers` à 0 : miroir désactivé, les transcripts gardent l'URL d'origine.
+    # `retention` (secondes) : copies supprimées après ce délai sans nouvel envoi du même fichier ; 0 pour tout garder.
+    def __init__(self,
+                 directory: str,
+                 workers: int = 4,
+                 max_bytes: int = 25 * 1024 * 1024,
+                 base_url: str = "",
+                 read_timeout: float = 30.0,
+                 retention: float = 0.0):
+        self.directory = directory
+        self.tmp_directory = os.path.join(directory, "tmp")
+        self.workers = workers
+        self.max_bytes = max_bytes
+        self.base_url = base_url.rstrip("/")
+        self.read_timeout = read_timeout
+        self.retention = retention
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._queue: "asyncio.Queue[Tuple[str, str, asyncio.Future]]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._pruner: Optional[asyncio.Task] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._known: TTLCache[str, MirroredFile] = TTLCache(max_size=4096, ttl=6 * 3600)
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0 and bool(self._tasks)
+
+    def _prepare(self) -> None:
+        os.makedirs(self.tmp_directory, exist_ok=True)
+        # Téléchargements interrompus par un arrêt précédent.
+        for name in os.listdir(self.tmp_directory):
+            os.remove(os.path.join(self.tmp_directory, name))
+
+    async def start(self, session: aiohttp.ClientSession) -> None:
+        if self.workers <= 0 or self._tasks:
+            return
+        self.session = session
+        await asyncio.get_running_loop().run_in_executor(None, self._prepare)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+        if self.retention > 0:
+            self._pruner = asyncio.create_task(self._prune_loop())
+
+    async def stop(self) -> None:
+        if self._pruner is not None:
+            self._pruner.cancel()
+            await asyncio.gather(self._pruner, return_exceptions=True)
+            self._pruner = None
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        while not self._queue.empty():
+            _url, _name, fut = self._queue.get_nowait()
+            if not fut.done():
+                fut.cancel()
+        self._inflight.clear()
+
+    def reference(self, file: MirroredFile) -> str:
+        return f"{self.base_url}/{file.relpath}" if self.base_url else f"attachments/{file.relpath}"
+
+    def path_for(self, file: MirroredFile) -> str:
+        return os.path.join(self.directory, file.sha256[:2], f"{file.sha256}{file.ext}")
+
+    async def mirror(self, url: str, filename: str, size: int = 0) -> Optional[MirroredFile]:
+        # None si le miroir est désactivé ou si le fichier dépasse la taille maximale annoncée.
+        if not self.enabled or (size and size > self.max_bytes):
+            if self.enabled:
+                MIRROR_DOWNLOADS.inc(result="too_large")
+            return None
+        known = self._known.get(url)
+        if known is not None:
+            MIRROR_DOWNLOADS.inc(result="cached")
+            return known
+        fut = self._inflight.get(url)
+        if fut is None:
+            fut = self._inflight[url] = asyncio.get_running_loop().create_future()
+            self._queue.put_nowait((url, filename, fut))
+        # shield : l'annulation d'un appelant ne doit pas annuler le téléchargement partagé.
+        return await asyncio.shield(fut)
+
+    def _open_tmp(self) -> Tuple[str, object]:
+        path = os.path.join(self.tmp_directory, f"{uuid.uuid4().hex}.part")
+        return path, open(path, "wb")
+
+    def _commit(self, tmp_path: str, fp, file: MirroredFile) -> bool:
+        fp.flush()
+        os.fsync(fp.fileno())
+        fp.close()
+        dest = self.path_for(file)
+        if os.path.exists(dest):
+            os.remove(tmp_path)
+            # Renvoyé dans un nouveau ticket : la rétention repart de zéro.
+            os.utime(dest)
+            return False
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(tmp_path, dest)
+        return True
+
+    @staticmethod
+    def _discard(tmp_path: str, fp) -> None:
+        fp.close()
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+
+    async def _download(self, url: str, filename: str) -> MirroredFile:
+        loop = asyncio.get_running_loop()
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=self.read_timeout)
+        async with self.session.get(url, timeout=timeout) as resp:
+            if resp.status != 200:
+                raise MirrorError(f"HTTP {resp.status}")
+            if resp.content_length is not None and resp.content_length > self.max_bytes:
+                raise MirrorError(f"{resp.content_length} octets annoncés")
+            tmp_path, fp = await loop.run_in_executor(None, self._open_tmp)
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                # Jamais le fichier entier en mémoire : chaque bloc est haché puis écrit avant le suivant.
+                async for chunk in resp.content.iter_chunked(DOWNLOAD_CHUNK):
+                    size += len(chunk)
+                    if size > self.max_bytes:
+                        raise MirrorError(f"plus de {self.max_bytes} octets")
+                    digest.update(chunk)
+                    await loop.run_in_executor(None, fp.write, chunk)
+                file = MirroredFile(digest.hexdigest(), _extension(filename), size)
+                created = await loop.run_in_executor(None, self._commit, tmp_path, fp, file)
+            except BaseException:
+                await loop.run_in_executor(None, self._discard, tmp_path, fp)
+                raise
+        MIRROR_BYTES.inc(size)
+        MIRROR_DOWNLOADS.inc(result="stored" if created else "deduplicated")
+        return file
+
+    def prune(self, now: Optional[float] = None) -> int:
+        cutoff = (now or time.time()) - self.retention
+        removed = 0
+        for name in os.listdir(self.directory):
+            subdir = os.path.join(self.directory, name)
+            if subdir == self.tmp_directory or not os.path.isdir(subdir):
+                continue
+            for entry in os.scandir(subdir):
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+                    removed += 1
+        return removed
+
+    async def _prune_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                removed = await loop.run_in_executor(None, self.prune)
+            except OSError as e:
+                print(f"[mirror] Échec du nettoyage des copies : {e}")
+            else:
+                if removed:
+                    print(f"[mirror] {removed} copie(s) expirée(s) supprimée(s).")
+            await asyncio.sleep(PRUNE_INTERVAL)
+
+    async def _run(self) -> None:
+        while True:
+            url, filename, fut = await self._queue.get()
+            started = time.perf_counter()
+            try:
+                file = await self._download(url, filename)
+            except asyncio.CancelledError:
+                if not fut.done():
+                    fut.cancel()
+                self._inflight.pop(url, None)
+                raise
+            except Exception as e:
+                MIRROR_DOWNLOADS.inc(result="failed")
+                print(f"[mirror] Échec de la copie de {filename} : {e}")
+                if not fut.done():
+                    fut.set_result(None)
+            else:
+                self._known.set(url, file)
+                if not fut.done():
+                    fut.set_result(file)
+            finally:
+                MIRROR_SECONDS.observe(time.perf_counter() - started)
+                self._inflight.pop(url, None)
@@ -0,0 +1,89 @@
+import asyncio
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional
+
+import discord
+
+from utils import metrics
+
+POOL_HITS = metrics.counter("ticket_channel_pool_total", "Ouvertures de ticket servies par la réserve de salons, par résultat.")
+
+
+class ChannelPool:
+    # Salons cachés pré-créés par catégorie : ouvrir un ticket se résume à un seul `edit`.
+    def __init__(self, size: int, prefix: str = "ticket-reserve", max_per_category: int = 50):
+        self.size = size
+        self.max_per_category = max_per_category
+        self.prefix = prefix
+        self._free: Dict[int, Deque[int]] = {}
+        self._refills: Dict[int, asyncio.Task] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def available(self, category_id: int) -> int:
+        return len(self._free.get(category_id, ()))
+
+    def is_reserve(self, channel: discord.abc.GuildChannel) -> bool:
+        return channel.name.startswith(self.prefix)
+
+    def warm(self, categories: Iterable[discord.CategoryChannel]) -> None:
+        if not self.enabled:
+            return
+        for category in categories:
+            free = self._free[category.id] = deque(
+                ch.id for ch in category.text_channels if self.is_reserve(ch)
+            )
+            if len(free) < self.size:
+                self.schedule_refill(category)
+
+    def schedule_refill(self, category: discord.CategoryChannel) -> None:
+        task = self._refills.get(category.id)
+        if task is None or task.done():
+            self._refills[category.id] = asyncio.create_task(self._refill(category))
+
+    async def _refill(self, category: discord.CategoryChannel) -> None:
+        free = self._free.setdefault(category.id, deque())
+        hidden = {category.guild.default_role: discord.PermissionOverwrite(view_channel=False)}
+        while len(free) < self.size:
+            if len(category.channels) >= self.max_per_category:
+                return
+            try:
+                ch = await category.create_text_channel(name=f"{self.prefix}-{len(free) + 1}", overwrites=hidden)
+            except discord.HTTPException as e:
+                print(f"[pool] Impossible de pré-créer un salon dans {category.name} : {e}")
+                return
+            free.append(ch.id)
+
+    async def acquire(self,
+                      category: discord.CategoryChannel,
+                      name: str,
+                      overwrites: Dict,
+                      topic: str) -> Optional[discord.TextChannel]:
+        if not self.enabled:
+            return None
+        free = self._free.get(category.id)
+        ch = None
+        while free:
+            candidate = category.guild.get_channel(free.popleft())
+            if isinstance(candidate, discord.TextChannel):
+                ch = candidate
+                break
+        self.schedule_refill(category)
+        if ch is None:
+            POOL_HITS.inc(result="miss")
+            return None
+        try:
+            ch = await ch.edit(name=name, topic=topic, overwrites=overwrites) or ch
+        except discord.HTTPException as e:
+            POOL_HITS.inc(result="error")
+            print(f"[pool] Échec de la réutilisation du salon {ch.id} : {e}")
+            return None
+        POOL_HITS.inc(result="hit")
+        return ch
+
+    def stop(self) -> None:
+        for task in self._refills.values():
+            task.cancel()
+        self._refills.clear()
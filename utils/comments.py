@@ -0,0 +1,64 @@
+from collections import deque
+from itertools import islice
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+# (guild_id, user_id) : les commentaires d'un joueur sont propres à chaque serveur.
+UserKey = Tuple[int, int]
+
+
+class UserComments:
+    # Les `max_resident` commentaires les plus récents, triés par horodatage croissant.
+    def __init__(self, max_resident: int):
+        self.recent: Deque[dict] = deque(maxlen=max_resident)
+        self.total = 0
+        self.rendered: Optional[Any] = None
+
+    def add(self, comment: dict) -> None:
+        if not self.recent or self.recent[-1]["ts"] <= comment["ts"]:
+            self.recent.append(comment)
+        else:
+            index = len(self.recent)
+            while index > 0 and self.recent[index - 1]["ts"] > comment["ts"]:
+                index -= 1
+            if index == 0 and len(self.recent) == self.recent.maxlen:
+                # Trop ancien pour la fenêtre, mais le total affiché dans le récapitulatif change.
+                self.total += 1
+                self.rendered = None
+                return
+            if len(self.recent) == self.recent.maxlen:
+                self.recent.popleft()
+                index -= 1
+            self.recent.insert(index, comment)
+        self.total += 1
+        self.rendered = None
+
+    def latest(self, limit: int, offset: int = 0) -> List[dict]:
+        return list(islice(reversed(self.recent), offset, offset + limit))
+
+
+class CommentIndex:
+    def __init__(self, max_resident: int = 100):
+        self.max_resident = max_resident
+        self._users: Dict[UserKey, UserComments] = {}
+
+    def __contains__(self, key: UserKey) -> bool:
+        return key in self._users
+
+    def get(self, key: UserKey) -> Optional[UserComments]:
+        return self._users.get(key)
+
+    def add(self, key: UserKey, comment: dict) -> UserComments:
+        entry = self._users.get(key)
+        if entry is None:
+            entry = self._users[key] = UserComments(self.max_resident)
+        entry.add(comment)
+        return entry
+
+    def load(self, key: UserKey, comments: Iterable[dict], total: int) -> None:
+        entry = self._users[key] = UserComments(self.max_resident)
+        for comment in comments:
+            entry.add(comment)
+        entry.total = max(total, entry.total)
+
+    def clear(self) -> None:
+        self._users.clear()
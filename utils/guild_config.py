@@ -0,0 +1,72 @@
+import json
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class GuildConfig:
+    def __init__(self,
+                 guild_id: int,
+                 logs_channel_id: int = 0,
+                 logs_webhook_url: str = "",
+                 categories: Optional[Dict[str, List[int]]] = None,
+                 role_to_ping: Optional[int] = None,
+                 banner_url: Optional[str] = None,
+                 idle_timeouts: Optional[Dict[str, Tuple[float, float]]] = None):
+        self.guild_id = guild_id
+        self.logs_channel_id = logs_channel_id
+        self.logs_webhook_url = logs_webhook_url
+        self.categories: Dict[str, List[int]] = categories or {}
+        self.role_to_ping = role_to_ping
+        self.banner_url = banner_url
+        # Par catégorie : (relance, fermeture automatique) en secondes d'inactivité, 0 désactivant l'étape.
+        self.idle_timeouts: Dict[str, Tuple[float, float]] = idle_timeouts or {}
+
+    @classmethod
+    def from_dict(cls, raw: dict, defaults: "GuildConfig") -> "GuildConfig":
+        # Le secret du webhook peut rester dans l'environnement : `logs_webhook_env` donne le nom de la variable.
+        webhook_url = raw.get("logs_webhook_url")
+        if webhook_url is None and raw.get("logs_webhook_env"):
+            webhook_url = os.getenv(raw["logs_webhook_env"], "")
+        categories = raw.get("categories")
+        # `idle` en heures, catégorie par catégorie ; les catégories absentes gardent les délais par défaut.
+        idle_timeouts = dict(defaults.idle_timeouts)
+        for reason, timeouts in (raw.get("idle") or {}).items():
+            idle_timeouts[reason] = (float(timeouts.get("remind_hours") or 0) * 3600,
+                                     float(timeouts.get("close_hours") or 0) * 3600)
+        return cls(
+            guild_id=int(raw["guild_id"]),
+            logs_channel_id=int(raw.get("logs_channel_id") or 0),
+            logs_webhook_url=webhook_url or "",
+            categories={reason: [int(cid) for cid in ids] for reason, ids in categories.items()}
+            if categories is not None else {reason: [] for reason in defaults.categories},
+            role_to_ping=int(raw["role_to_ping"]) if raw.get("role_to_ping") else None,
+            banner_url=raw.get("banner_url", defaults.banner_url),
+            idle_timeouts=idle_timeouts,
+        )
+
+    def category_ids(self, reason: Optional[str] = None) -> List[int]:
+        if reason:
+            return self.categories.get(reason, [])
+        return [cid for cids in self.categories.values() for cid in cids]
+
+    def idle_timeout(self, category: str) -> Tuple[float, float]:
+        return self.idle_timeouts.get(category, (0.0, 0.0))
+
+
+def load_guild_configs(path: str, default: GuildConfig) -> Dict[int, GuildConfig]:
+    # Sans fichier de configuration, on retombe sur la guilde unique décrite par l'environnement.
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        return {default.guild_id: default} if default.guild_id else {}
+    guilds: Iterable[dict] = raw.get("guilds", []) if isinstance(raw, dict) else raw
+    configs: Dict[int, GuildConfig] = {}
+    for entry in guilds:
+        config = GuildConfig.from_dict(entry, default)
+        configs[config.guild_id] = config
+    return configs
+
+
+def configured_guild_ids(path: str, fallback_guild_id: int) -> List[int]:
+    return list(load_guild_configs(path, GuildConfig(fallback_guild_id)))
@@ -0,0 +1,324 @@
+import asyncio
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import IO, Dict, List, Optional, Sequence, Set, Tuple, Union
+
+import aiohttp
+import discord
+from discord.ext import commands
+
+from utils import metrics
+
+JOB_FILE = "job.json"
+
+# Un fichier joint est soit un flux (copié dans la file), soit un chemin sur le même disque (déplacé).
+Attachment = Tuple[str, Union[IO[bytes], str]]
+
+DELIVERIES = metrics.counter("ticket_log_deliveries_total", "Tentatives d'envoi des logs de tickets, par résultat.")
+DELIVERY_SECONDS = metrics.histogram(
+    "ticket_log_delivery_seconds", "Délai entre la mise en file et la livraison des logs.",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0),
+)
+
+
+def _write_json_atomic(path: str, data: dict) -> None:
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    if isinstance(exc, discord.RateLimited):
+        return exc.retry_after
+    if isinstance(exc, discord.HTTPException) and exc.status == 429:
+        headers = getattr(exc.response, "headers", None) or {}
+        try:
+            return float(headers.get("Retry-After", 1))
+        except (TypeError, ValueError):
+            return 1.0
+    return None
+
+
+def _is_permanent(exc: Exception) -> bool:
+    # 4xx hors 429 (dont 404 : webhook ou salon supprimé) : réessayer ne servira à rien.
+    return isinstance(exc, discord.HTTPException) and 400 <= exc.status < 500 and exc.status != 429
+
+
+class LogDeliveryQueue:
+    # File d'envoi persistante (un dossier par envoi dans `directory`) vidée par une tâche de fond.
+    # Chaque envoi peut porter sa propre destination ; `webhook_url` / `fallback_channel_id` servent par défaut.
+    # L'ordre n'est garanti que par destination : un envoi en attente de nouvel essai ne bloque que les suivants
+    # vers la même destination, pas ceux des autres serveurs.
+    def __init__(self,
+                 directory: str,
+                 webhook_url: str,
+                 fallback_channel_id: int,
+                 username: str = "Ticket Logs",
+                 base_backoff: float = 2.0,
+                 max_backoff: float = 300.0,
+                 fallback_after: int = 3,
+                 unresolved_after: int = 5):
+        self.directory = directory
+        self.failed_directory = os.path.join(directory, "failed")
+        self.webhook_url = webhook_url
+        self.fallback_channel_id = fallback_channel_id
+        self.username = username
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.fallback_after = fallback_after
+        # Sans webhook utilisable, tentatives avec un salon de logs introuvable avant de passer l'envoi dans failed/.
+        self.unresolved_after = unresolved_after
+        self.bot: Optional[commands.Bot] = None
+        self.session: Optional[aiohttp.ClientSession] = None
+        self._webhooks: Dict[str, Optional[discord.Webhook]] = {}
+        self._dead_webhooks: Set[str] = set()
+        self._pending: List[str] = []
+        self._jobs: Dict[str, dict] = {}
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.directory, job_id)
+
+    def _scan(self) -> List[str]:
+        os.makedirs(self.failed_directory, exist_ok=True)
+        jobs = []
+        for name in os.listdir(self.directory):
+            if os.path.isfile(os.path.join(self.directory, name, JOB_FILE)):
+                jobs.append(name)
+        jobs.sort()
+        return jobs
+
+    async def start(self, bot: commands.Bot, session: aiohttp.ClientSession) -> None:
+        self.bot = bot
+        self.session = session
+        self._webhook_for(self.webhook_url)
+        self._pending = await asyncio.get_running_loop().run_in_executor(None, self._scan)
+        self._jobs.clear()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        if self._pending:
+            print(f"[logs] {len(self._pending)} envoi(s) de logs en attente repris.")
+
+    async def stop(self) -> None:
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    def _webhook_for(self, url: str) -> Optional[discord.Webhook]:
+        if not url:
+            return None
+        if url not in self._webhooks:
+            try:
+                self._webhooks[url] = discord.Webhook.from_url(url, session=self.session)
+            except ValueError:
+                print("[logs] URL de webhook invalide, envoi via le salon de logs uniquement.")
+                self._webhooks[url] = None
+        return self._webhooks[url]
+
+    def _persist(self, job_id: str, embed: dict, files: Sequence[Attachment],
+                 webhook_url: str, channel_id: int) -> None:
+        tmp_dir = os.path.join(self.directory, f".{job_id}.tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        names = []
+        for index, (filename, fp) in enumerate(files):
+            stored = f"{index}-{os.path.basename(filename)}"
+            if isinstance(fp, str):
+                os.replace(fp, os.path.join(tmp_dir, stored))
+            else:
+                fp.seek(0)
+                with open(os.path.join(tmp_dir, stored), "wb") as out:
+                    shutil.copyfileobj(fp, out)
+                    out.flush()
+                    os.fsync(out.fileno())
+            names.append([stored, filename])
+        _write_json_atomic(os.path.join(tmp_dir, JOB_FILE), {
+            "embed": embed,
+            "files": names,
+            "webhook_url": webhook_url,
+            "channel_id": channel_id,
+            "attempts": 0,
+            "next_attempt": 0.0,
+            "created_at": time.time(),
+        })
+        os.replace(tmp_dir, self._job_dir(job_id))
+
+    async def enqueue(self,
+                      embed: discord.Embed,
+                      files: Sequence[Attachment] = (),
+                      webhook_url: Optional[str] = None,
+                      channel_id: Optional[int] = None) -> str:
+        job_id = f"{time.time_ns():020d}-{uuid.uuid4().hex[:8]}"
+        await asyncio.get_running_loop().run_in_executor(
+            None, self._persist, job_id, embed.to_dict(), list(files),
+            self.webhook_url if webhook_url is None else webhook_url,
+            self.fallback_channel_id if channel_id is None else channel_id,
+        )
+        self._pending.append(job_id)
+        self._wakeup.set()
+        return job_id
+
+    def _load(self, job_id: str) -> dict:
+        with open(os.path.join(self._job_dir(job_id), JOB_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _files(self, job_id: str, job: dict) -> List[discord.File]:
+        return [
+            discord.File(os.path.join(self._job_dir(job_id), stored), filename=filename)
+            for stored, filename in job["files"]
+        ]
+
+    async def _send_webhook(self, webhook: discord.Webhook, job_id: str, job: dict) -> None:
+        files = self._files(job_id, job)
+        try:
+            await webhook.send(embed=discord.Embed.from_dict(job["embed"]), files=files, username=self.username)
+        finally:
+            for f in files:
+                f.close()
+
+    async def _send_fallback(self, job_id: str, job: dict) -> bool:
+        log_ch = self.bot.get_channel(job.get("channel_id", self.fallback_channel_id)) if self.bot else None
+        if not isinstance(log_ch, discord.TextChannel):
+            return False
+        files = self._files(job_id, job)
+        try:
+            await log_ch.send(embed=discord.Embed.from_dict(job["embed"]), files=files)
+        finally:
+            for f in files:
+                f.close()
+        return True
+
+    def _delivered(self, job: dict, result: str) -> None:
+        DELIVERIES.inc(result=result)
+        DELIVERY_SECONDS.observe(max(0.0, time.time() - job.get("created_at", time.time())))
+
+    def _finish(self, job_id: str, failed: bool = False) -> None:
+        if failed:
+            os.replace(self._job_dir(job_id), os.path.join(self.failed_directory, job_id))
+        else:
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+    async def _attempt(self, job_id: str, job: dict) -> Optional[float]:
+        # Renvoie None si l'envoi est terminé, sinon le délai avant la prochaine tentative.
+        loop = asyncio.get_running_loop()
+        webhook_url = job.get("webhook_url", self.webhook_url)
+        webhook = None if webhook_url in self._dead_webhooks else self._webhook_for(webhook_url)
+        webhook_error: Optional[Exception] = None
+        if webhook is not None:
+            try:
+                await self._send_webhook(webhook, job_id, job)
+                self._delivered(job, "webhook")
+                await loop.run_in_executor(None, self._finish, job_id)
+                return None
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    DELIVERIES.inc(result="rate_limited")
+                    return retry_after
+                webhook_error = e
+                if isinstance(e, discord.NotFound):
+                    # Webhook supprimé : les envois suivants passent directement par le salon de logs.
+                    print("[logs] Webhook introuvable (404), envoi via le salon de logs uniquement.")
+                    self._dead_webhooks.add(webhook_url)
+
+        error: Optional[Exception] = webhook_error
+        webhook_rejected = webhook_url in self._dead_webhooks or (
+            webhook_error is not None and _is_permanent(webhook_error)
+        )
+        webhook_dead = webhook is None or webhook_rejected
+        if webhook_dead or job["attempts"] + 1 >= self.fallback_after:
+            try:
+                if await self._send_fallback(job_id, job):
+                    self._delivered(job, "fallback")
+                    await loop.run_in_executor(None, self._finish, job_id)
+                    return None
+                # Salon de logs introuvable alors que le cache est prêt : sans webhook, plus aucune issue.
+                if self.bot is not None and self.bot.is_ready() and (
+                    webhook_rejected or (webhook is None and job["attempts"] + 1 >= self.unresolved_after)
+                ):
+                    print(f"[logs] Envoi {job_id} sans webhook utilisable et salon de logs introuvable, "
+                          f"déplacé dans failed/.")
+                    DELIVERIES.inc(result="failed")
+                    await loop.run_in_executor(None, self._finish, job_id, True)
+                    return None
+            except Exception as e:
+                retry_after = _retry_after(e)
+                if retry_after is not None:
+                    DELIVERIES.inc(result="rate_limited")
+                    return retry_after
+                error = e
+                if webhook_dead and _is_permanent(e):
+                    print(f"[logs] Envoi {job_id} rejeté définitivement ({e}), déplacé dans failed/.")
+                    DELIVERIES.inc(result="failed")
+                    await loop.run_in_executor(None, self._finish, job_id, True)
+                    return None
+
+        DELIVERIES.inc(result="retry")
+        job["attempts"] += 1
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (job["attempts"] - 1)))
+        reason = error or "salon de logs introuvable"
+        print(f"[logs] Échec de l'envoi {job_id} (tentative {job['attempts']}) : {reason}. Nouvel essai dans {delay:.0f}s.")
+        return delay
+
+    async def _next_due(self) -> Tuple[Optional[str], Optional[float]]:
+        # Premier envoi dû dont aucun envoi plus ancien vers la même destination n'attend un nouvel essai ;
+        # sinon (None, échéance la plus proche).
+        loop = asyncio.get_running_loop()
+        now = time.time()
+        waiting = set()
+        soonest: Optional[float] = None
+        for job_id in list(self._pending):
+            job = self._jobs.get(job_id)
+            if job is None:
+                try:
+                    job = self._jobs[job_id] = await loop.run_in_executor(None, self._load, job_id)
+                except (OSError, ValueError) as e:
+                    print(f"[logs] Envoi {job_id} illisible, ignoré : {e}")
+                    self._pending.remove(job_id)
+                    continue
+            destination = (job.get("webhook_url", self.webhook_url), job.get("channel_id", self.fallback_channel_id))
+            if destination in waiting:
+                continue
+            if job["next_attempt"] > now:
+                waiting.add(destination)
+                soonest = job["next_attempt"] if soonest is None else min(soonest, job["next_attempt"])
+                continue
+            return job_id, None
+        return None, soonest
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            job_id, soonest = await self._next_due()
+            if job_id is None:
+                try:
+                    timeout = None if soonest is None else max(0.0, soonest - time.time())
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job = self._jobs[job_id]
+            delay = await self._attempt(job_id, job)
+            if delay is None:
+                self._pending.remove(job_id)
+                del self._jobs[job_id]
+                continue
+            job["next_attempt"] = time.time() + delay
+            await loop.run_in_executor(
+                None, _write_json_atomic, os.path.join(self._job_dir(job_id), JOB_FILE), job
+            )
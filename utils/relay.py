@@ -0,0 +1,144 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import discord
+
+from utils import metrics
+
+MAX_MESSAGE_LENGTH = 2000
+
+RELAY_SENDS = metrics.counter("ticket_relay_sends_total", "Messages envoyés par les workers de relais, par résultat.")
+RELAY_LINES = metrics.counter("ticket_relay_lines_total", "Lignes poussées dans les files de relais.")
+
+
+class TokenBucketLimiter:
+    # Un seau par destination (salon ou DM), calqué sur la limite Discord de 5 messages / 5 s.
+    def __init__(self, capacity: int = 5, per: float = 5.0, max_buckets: int = 4096):
+        self.capacity = capacity
+        self.rate = capacity / per
+        self.max_buckets = max_buckets
+        self._buckets: Dict[int, Tuple[float, float]] = {}
+
+    async def acquire(self, key: int) -> None:
+        while True:
+            now = time.monotonic()
+            tokens, last = self._buckets.get(key, (float(self.capacity), now))
+            tokens = min(float(self.capacity), tokens + (now - last) * self.rate)
+            if tokens >= 1.0:
+                self._buckets[key] = (tokens - 1.0, now)
+                if len(self._buckets) > self.max_buckets:
+                    self._buckets.pop(next(iter(self._buckets)))
+                return
+            self._buckets[key] = (tokens, now)
+            await asyncio.sleep((1.0 - tokens) / self.rate)
+
+
+class RelayTarget:
+    def __init__(self,
+                 key: int,
+                 send: Callable[[str], Awaitable[Any]],
+                 on_forbidden: Optional[Callable[[], Awaitable[Any]]] = None):
+        self.key = key
+        self.send = send
+        self.on_forbidden = on_forbidden
+
+
+def split_message(lines: List[str], limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    chunks: List[str] = []
+    current = ""
+    for line in lines:
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        if not current:
+            current = line
+        elif len(current) + 1 + len(line) <= limit:
+            current = f"{current}\n{line}"
+        else:
+            chunks.append(current)
+            current = line
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class TicketRelay:
+    # File ordonnée d'un ticket : un seul worker, les lignes arrivées dans la fenêtre sont fusionnées.
+    def __init__(self, limiter: TokenBucketLimiter, window: float = 0.2):
+        self.limiter = limiter
+        self.window = window
+        self._queue: "asyncio.Queue[Optional[Tuple[RelayTarget, str]]]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def push(self, target: RelayTarget, text: str) -> None:
+        RELAY_LINES.inc()
+        self._queue.put_nowait((target, text))
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _collect(self, first: Tuple[RelayTarget, str]) -> Tuple[List[Tuple[RelayTarget, List[str]]], bool]:
+        batches: List[Tuple[RelayTarget, List[str]]] = [(first[0], [first[1]])]
+        deadline = asyncio.get_running_loop().time() + self.window
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    return batches, False
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    return batches, False
+            if item is None:
+                return batches, True
+            target, text = item
+            if batches[-1][0] is target or batches[-1][0].key == target.key:
+                batches[-1][1].append(text)
+            else:
+                batches.append((target, [text]))
+
+    async def _deliver(self, target: RelayTarget, lines: List[str]) -> None:
+        for chunk in split_message(lines):
+            await self.limiter.acquire(target.key)
+            try:
+                await target.send(chunk)
+                RELAY_SENDS.inc(result="ok")
+            except discord.Forbidden:
+                RELAY_SENDS.inc(result="forbidden")
+                if target.on_forbidden is not None:
+                    try:
+                        await target.on_forbidden()
+                    except discord.HTTPException:
+                        pass
+                return
+            except discord.HTTPException as e:
+                RELAY_SENDS.inc(result="error")
+                print(f"[relay] Échec du relais vers {target.key} : {e}")
+
+    async def _run(self) -> None:
+        while True:
+            first = await self._queue.get()
+            if first is None:
+                return
+            batches, stop = await self._collect(first)
+            for target, lines in batches:
+                await self._deliver(target, lines)
+            if stop:
+                return
+
+    async def close(self) -> None:
+        if self._worker is None or self._worker.done():
+            return
+        self._queue.put_nowait(None)
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
@@ -0,0 +1,146 @@
+import asyncio
+import gzip
+import multiprocessing
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+
+from utils import metrics
+from utils.transcript_log import read_entries, read_mirrors, with_mirrors
+from utils.transcript_render import render_transcript
+
+RENDER_SECONDS = metrics.histogram(
+    "ticket_render_seconds", "Durée du rendu des transcripts (worker compris).",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+ARCHIVE_COMPRESSLEVEL = 6
+
+
+class RenderJob:
+    # Instantané picklable d'un ticket : le worker relit le transcript depuis le disque.
+    def __init__(self,
+                 transcript_path: str,
+                 header: str,
+                 basename: str,
+                 title: str,
+                 out_dir: str,
+                 archive_path: Optional[str] = None,
+                 gzip_output: bool = False,
+                 html_output: bool = False,
+                 mirrors_path: Optional[str] = None):
+        self.transcript_path = transcript_path
+        self.header = header
+        self.basename = basename
+        self.title = title
+        self.out_dir = out_dir
+        self.archive_path = archive_path
+        self.gzip_output = gzip_output
+        self.html_output = html_output
+        self.mirrors_path = mirrors_path
+
+
+class RenderResult:
+    # Seul ce petit résultat revient au processus du bot ; les fichiers restent sur disque.
+    def __init__(self, preview: str, truncated: bool, entries: int,
+                 files: List[Tuple[str, str]], archive_path: Optional[str]):
+        self.preview = preview
+        self.truncated = truncated
+        self.entries = entries
+        self.files = files
+        self.archive_path = archive_path
+
+    def discard(self) -> None:
+        for _name, path in self.files:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def render_job(job: RenderJob) -> RenderResult:
+    os.makedirs(job.out_dir, exist_ok=True)
+    archive = None
+    archive_tmp = None
+    if job.archive_path:
+        os.makedirs(os.path.dirname(job.archive_path), exist_ok=True)
+        archive_tmp = f"{job.archive_path}.tmp"
+        archive = gzip.open(archive_tmp, "wb", compresslevel=ARCHIVE_COMPRESSLEVEL)
+    entries = read_entries(job.transcript_path)
+    if job.mirrors_path:
+        entries = with_mirrors(entries, read_mirrors(job.mirrors_path))
+    try:
+        rendered = render_transcript(
+            entries,
+            job.header,
+            job.basename,
+            title=job.title,
+            gzip_output=job.gzip_output,
+            html_output=job.html_output,
+            archive=archive,
+        )
+    finally:
+        if archive is not None:
+            archive.close()
+    if archive_tmp is not None:
+        os.replace(archive_tmp, job.archive_path)
+
+    files: List[Tuple[str, str]] = []
+    try:
+        for name, fp in ((rendered.attachment_name, rendered.attachment), (rendered.html_name, rendered.html)):
+            if fp is None:
+                continue
+            path = os.path.join(job.out_dir, f"{uuid.uuid4().hex}-{name}")
+            with open(path, "wb") as out:
+                shutil.copyfileobj(fp, out)
+                out.flush()
+                os.fsync(out.fileno())
+            files.append((name, path))
+    finally:
+        rendered.close()
+    return RenderResult(rendered.preview, rendered.truncated, rendered.entries, files, job.archive_path)
+
+
+class RenderPool:
+    # `workers` à 0 : rendu dans le pool de threads par défaut (pas de processus séparé).
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _create(self) -> ProcessPoolExecutor:
+        # spawn : le bot a déjà des threads (stockage, transcripts) qu'un fork dupliquerait dans un état incohérent.
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def start(self) -> None:
+        if self.workers > 0 and self._executor is None:
+            self._executor = self._create()
+            # Démarre les workers tout de suite plutôt qu'à la première fermeture de ticket.
+            self._executor.submit(os.getpid)
+
+    async def stop(self) -> None:
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+    async def render(self, job: RenderJob) -> RenderResult:
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        try:
+            executor = self._executor
+            if executor is None:
+                return await loop.run_in_executor(None, render_job, job)
+            try:
+                return await loop.run_in_executor(executor, render_job, job)
+            except BrokenProcessPool:
+                # Un worker tué (OOM…) casse tout le pool : on le recrée et on retente une fois.
+                # Les rendus concurrents voient la même panne : seul le premier remplace le pool cassé.
+                if self._executor is executor:
+                    print("[render] Pool de rendu interrompu, redémarrage.")
+                    self._executor = self._create()
+                    executor.shutdown(wait=False)
+                return await loop.run_in_executor(self._executor, render_job, job)
+        finally:
+            RENDER_SECONDS.observe(time.perf_counter() - started)
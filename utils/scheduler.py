@@ -0,0 +1,93 @@
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Awaitable, Callable, Dict, Generic, Hashable, List, Optional, Set, Tuple, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+
+# Le callback d'une échéance renvoie la suivante (horodatage) ou None pour ne plus suivre la clé.
+Callback = Callable[[K], Awaitable[Optional[float]]]
+
+
+class DeadlineScheduler(Generic[K]):
+    # Un seul tas (échéance, n°, clé) et une seule tâche qui dort jusqu'à l'échéance la plus proche.
+    # Chaque clé n'a qu'une échéance valide (`_deadlines`) : replanifier ou annuler laisse l'ancienne entrée
+    # dans le tas, elle est ignorée quand elle remonte en tête.
+    def __init__(self, name: str = "scheduler", max_sleep: float = 60.0):
+        self.callback: Optional[Callback] = None
+        self.name = name
+        # Réveil au moins toutes les `max_sleep` secondes : les échéances sont en heure murale.
+        self.max_sleep = max_sleep
+        self._heap: List[Tuple[float, int, K]] = []
+        self._deadlines: Dict[K, float] = {}
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._running: Set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._deadlines
+
+    def schedule(self, key: K, when: float) -> None:
+        self._deadlines[key] = when
+        heapq.heappush(self._heap, (when, next(self._seq), key))
+        if self._heap[0][2] == key:
+            self._wakeup.set()
+        # Trop d'entrées périmées : on reconstruit le tas à partir des échéances valides.
+        if len(self._heap) > 2 * len(self._deadlines) + 64:
+            self._heap = [(w, next(self._seq), k) for k, w in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def cancel(self, key: K) -> None:
+        self._deadlines.pop(key, None)
+
+    def start(self, callback: Callback) -> None:
+        self.callback = callback
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = list(self._running)
+        if self._worker is not None:
+            tasks.append(self._worker)
+            self._worker = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fire(self, key: K) -> None:
+        try:
+            when = await self.callback(key)
+        except Exception as e:
+            print(f"[{self.name}] Échec du traitement de l'échéance {key} : {e}")
+            return
+        # Une échéance posée entre-temps (par schedule) prime sur celle renvoyée par le callback.
+        if when is not None and key not in self._deadlines:
+            self.schedule(key, when)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+            when, _seq, key = self._heap[0]
+            delay = when - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=min(delay, self.max_sleep))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            heapq.heappop(self._heap)
+            del self._deadlines[key]
+            # Le callback peut être long (fermeture d'un ticket) : il ne bloque pas les échéances suivantes.
+            task = asyncio.create_task(self._fire(key))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
@@ -0,0 +1,170 @@
+import asyncio
+import re
+import sqlite3
+import time
+from typing import List, Optional, Tuple
+
+from utils import metrics
+from utils.sqlite_writer import SQLiteWriter
+
+KIND_MESSAGE = 0
+KIND_ATTACHMENT = 1
+KIND_NOTE = 2
+
+SEARCH_SECONDS = metrics.histogram(
+    "ticket_search_seconds", "Durée des requêtes /recherche.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0),
+)
+
+# Contenu externe : le texte n'est stocké qu'une fois (dans `docs`), FTS5 ne garde que l'index inversé.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id          INTEGER PRIMARY KEY,
+    guild_id    INTEGER NOT NULL,
+    user_id     INTEGER NOT NULL,
+    channel_id  INTEGER NOT NULL,
+    category    TEXT NOT NULL,
+    kind        INTEGER NOT NULL,
+    by          TEXT NOT NULL,
+    ts          INTEGER NOT NULL,
+    content     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_docs_guild_user ON docs (guild_id, user_id, id);
+CREATE INDEX IF NOT EXISTS idx_docs_guild_category ON docs (guild_id, category, id);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    content, by, content='docs', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+);
+CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+    INSERT INTO docs_fts (rowid, content, by) VALUES (new.id, new.content, new.by);
+END;
+"""
+
+_TOKEN = re.compile(r"\S+")
+
+
+def build_match(text: str) -> str:
+    # Chaque mot devient une chaîne FTS5 entre guillemets (la saisie ne peut pas casser la syntaxe) ;
+    # un `*` final garde la recherche par préfixe.
+    terms = []
+    for token in _TOKEN.findall(text):
+        prefix = token.endswith("*") and len(token) > 1
+        token = token.rstrip("*")
+        if not token:
+            continue
+        quoted = '"' + token.replace('"', '""') + '"'
+        terms.append(quoted + ("*" if prefix else ""))
+    return " ".join(terms)
+
+
+class SearchHit:
+    __slots__ = ("id", "user_id", "channel_id", "category", "kind", "by", "ts", "snippet")
+
+    def __init__(self, id: int, user_id: int, channel_id: int, category: str, kind: int, by: str, ts: int, snippet: str):
+        self.id = id
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.category = category
+        self.kind = kind
+        self.by = by
+        self.ts = ts
+        self.snippet = snippet
+
+
+class SearchQuery:
+    def __init__(self,
+                 guild_id: int,
+                 text: str = "",
+                 user_id: Optional[int] = None,
+                 category: Optional[str] = None,
+                 since: Optional[int] = None,
+                 until: Optional[int] = None,
+                 limit: int = 10):
+        self.guild_id = guild_id
+        self.text = text
+        self.user_id = user_id
+        self.category = category
+        self.since = since
+        self.until = until
+        self.limit = limit
+
+
+class SearchIndex(SQLiteWriter):
+    # Index plein texte alimenté au fil de l'eau ; les résultats sont paginés par curseur sur `id`
+    # (ordre d'insertion, donc chronologique) : pas d'OFFSET, chaque page coûte le même prix.
+    def __init__(self, path: str, batch_size: int = 512, flush_interval: float = 0.2):
+        super().__init__(path, batch_size, flush_interval, name="search-index")
+
+    def _setup(self, conn: sqlite3.Connection) -> None:
+        conn.executescript(_SCHEMA)
+
+    def add(self, guild_id: int, user_id: int, channel_id: int, category: str,
+            kind: int, by: str, ts: int, content: str) -> None:
+        self._submit(
+            "INSERT INTO docs (guild_id, user_id, channel_id, category, kind, by, ts, content)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (guild_id, user_id, channel_id, category, kind, by, ts, content),
+        )
+
+    def _search(self, query: SearchQuery, cursor: Optional[int]) -> Tuple[List[SearchHit], Optional[int]]:
+        match = build_match(query.text)
+        # Un joueur a peu de lignes : on part de son index et on vérifie chaque ligne dans FTS5 par rowid,
+        # plutôt que de parcourir toute la liste d'occurrences d'un mot fréquent.
+        by_user = bool(match) and query.user_id is not None
+        where = ["d.guild_id = ?"]
+        params: list = [query.guild_id]
+        if query.user_id is not None:
+            where.append("d.user_id = ?")
+            params.append(query.user_id)
+        if query.category:
+            where.append("d.category = ?")
+            params.append(query.category)
+        if query.since is not None:
+            where.append("d.ts >= ?")
+            params.append(query.since)
+        if query.until is not None:
+            where.append("d.ts < ?")
+            params.append(query.until)
+        if cursor is not None:
+            # Quand FTS5 mène la requête, la contrainte porte sur son rowid pour qu'il saute directement au curseur.
+            where.append("docs_fts.rowid < ?" if match and not by_user else "d.id < ?")
+            params.append(cursor)
+        if by_user:
+            sql = (
+                "SELECT d.id, d.user_id, d.channel_id, d.category, d.kind, d.by, d.ts,"
+                " snippet(docs_fts, 0, '**', '**', '…', 16)"
+                " FROM docs d CROSS JOIN docs_fts ON docs_fts.rowid = d.id"
+                f" WHERE {' AND '.join(where)} AND docs_fts MATCH ?"
+                " ORDER BY d.id DESC LIMIT ?"
+            )
+            params.append(match)
+        elif match:
+            sql = (
+                "SELECT d.id, d.user_id, d.channel_id, d.category, d.kind, d.by, d.ts,"
+                " snippet(docs_fts, 0, '**', '**', '…', 16)"
+                " FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid"
+                f" WHERE docs_fts MATCH ? AND {' AND '.join(where)}"
+                " ORDER BY docs_fts.rowid DESC LIMIT ?"
+            )
+            params.insert(0, match)
+        else:
+            sql = (
+                "SELECT d.id, d.user_id, d.channel_id, d.category, d.kind, d.by, d.ts, d.content"
+                f" FROM docs d WHERE {' AND '.join(where)} ORDER BY d.id DESC LIMIT ?"
+            )
+        # Une ligne de plus que la page : sa présence indique qu'une page suivante existe.
+        params.append(query.limit + 1)
+        conn = self._connect()
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+        hits = [SearchHit(*row) for row in rows[:query.limit]]
+        next_cursor = hits[-1].id if len(rows) > query.limit else None
+        return hits, next_cursor
+
+    async def search(self, query: SearchQuery, cursor: Optional[int] = None) -> Tuple[List[SearchHit], Optional[int]]:
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, self._search, query, cursor)
+        finally:
+            SEARCH_SECONDS.observe(time.perf_counter() - started)
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import queue
+import sqlite3
+import threading
+from typing import Any, List, Optional, Sequence, Tuple
+
+_Op = Tuple[str, Sequence[Any]]
+
+
+class SQLiteWriter:
+    # WAL + un thread écrivain unique qui regroupe les écritures en transactions.
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 0.05, name: str = "sqlite-writer"):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.name = name
+        self._ops: "queue.Queue[Optional[object]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    def _setup(self, conn: sqlite3.Connection) -> None:
+        pass
+
+    def _init_db(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            self._setup(conn)
+            conn.commit()
+        finally:
+            conn.close()
+
+    async def open(self) -> None:
+        if self._writer is not None:
+            return
+        await asyncio.get_running_loop().run_in_executor(None, self._init_db)
+        self._writer = threading.Thread(target=self._writer_loop, name=f"{self.name}-writer", daemon=True)
+        self._writer.start()
+
+    async def close(self) -> None:
+        if self._writer is None:
+            return
+        self._ops.put(None)
+        await asyncio.get_running_loop().run_in_executor(None, self._writer.join)
+        self._writer = None
+
+    async def flush(self) -> None:
+        if self._writer is None:
+            return
+        done = threading.Event()
+        self._ops.put(done)
+        await asyncio.get_running_loop().run_in_executor(None, done.wait)
+
+    def _writer_loop(self) -> None:
+        conn = self._connect()
+        try:
+            running = True
+            while running:
+                item = self._ops.get()
+                batch: List[_Op] = []
+                waiters: List[threading.Event] = []
+                while True:
+                    if item is None:
+                        running = False
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                    if not running or len(batch) >= self.batch_size:
+                        break
+                    try:
+                        item = self._ops.get(timeout=self.flush_interval)
+                    except queue.Empty:
+                        break
+                if batch:
+                    try:
+                        with conn:
+                            for sql, params in batch:
+                                conn.execute(sql, params)
+                    except sqlite3.Error as e:
+                        print(f"[{self.name}] Échec d'écriture ({len(batch)} opération(s)) : {e}")
+                for w in waiters:
+                    w.set()
+        finally:
+            conn.close()
+
+    def pending_writes(self) -> int:
+        return self._ops.qsize()
+
+    def _submit(self, sql: str, params: Sequence[Any]) -> None:
+        self._ops.put((sql, params))
@@ -0,0 +1,283 @@
+import asyncio
+import json
+import math
+import sqlite3
+import time
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+from utils.sqlite_writer import SQLiteWriter
+
+HOUR = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stats_hours (
+    guild_id    INTEGER NOT NULL,
+    hour        INTEGER NOT NULL,
+    category    TEXT NOT NULL,
+    data        TEXT NOT NULL,
+    PRIMARY KEY (guild_id, hour, category)
+);
+"""
+
+
+class QuantileSketch:
+    # Esquisse à buckets logarithmiques (type DDSketch) : toute valeur ≥ MIN_VALUE est rangée dans le bucket
+    # ceil(log_γ(v)), ce qui garantit une erreur relative ≤ `RELATIVE_ACCURACY` sur chaque quantile.
+    # Deux esquisses se fusionnent en additionnant leurs buckets : une période = somme de ses heures.
+    RELATIVE_ACCURACY = 0.02
+    GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+    _LOG_GAMMA = math.log(GAMMA)
+    MIN_VALUE = 1.0
+
+    __slots__ = ("bins", "zeros", "count")
+
+    def __init__(self):
+        self.bins: Dict[int, int] = {}
+        self.zeros = 0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        if value < self.MIN_VALUE:
+            self.zeros += 1
+            return
+        index = math.ceil(math.log(value) / self._LOG_GAMMA)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def merge(self, other: "QuantileSketch") -> None:
+        self.count += other.count
+        self.zeros += other.zeros
+        for index, n in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + n
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zeros:
+            return 0.0
+        seen = self.zeros
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # Milieu du bucket ]γ^(i-1), γ^i] au sens de l'erreur relative.
+                return 2 * self.GAMMA ** index / (self.GAMMA + 1)
+        return 2 * self.GAMMA ** max(self.bins) / (self.GAMMA + 1)
+
+    def to_json(self) -> list:
+        return [self.zeros, [[i, n] for i, n in self.bins.items()]]
+
+    @classmethod
+    def from_json(cls, raw: list) -> "QuantileSketch":
+        sketch = cls()
+        sketch.zeros = raw[0]
+        sketch.bins = {i: n for i, n in raw[1]}
+        sketch.count = sketch.zeros + sum(sketch.bins.values())
+        return sketch
+
+
+class StatsBucket:
+    # Compteurs et esquisses d'une heure (ou d'une période fusionnée) pour une catégorie.
+    __slots__ = ("opened", "closed", "auto_closed", "player_messages", "staff_messages", "first_reply", "duration")
+
+    def __init__(self):
+        self.opened = 0
+        self.closed = 0
+        self.auto_closed = 0
+        self.player_messages = 0
+        self.staff_messages = 0
+        self.first_reply = QuantileSketch()
+        self.duration = QuantileSketch()
+
+    def merge(self, other: "StatsBucket") -> None:
+        self.opened += other.opened
+        self.closed += other.closed
+        self.auto_closed += other.auto_closed
+        self.player_messages += other.player_messages
+        self.staff_messages += other.staff_messages
+        self.first_reply.merge(other.first_reply)
+        self.duration.merge(other.duration)
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "opened": self.opened,
+            "closed": self.closed,
+            "auto_closed": self.auto_closed,
+            "player_messages": self.player_messages,
+            "staff_messages": self.staff_messages,
+            "first_reply": self.first_reply.to_json(),
+            "duration": self.duration.to_json(),
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str) -> "StatsBucket":
+        raw = json.loads(data)
+        bucket = cls()
+        bucket.opened = raw.get("opened", 0)
+        bucket.closed = raw.get("closed", 0)
+        bucket.auto_closed = raw.get("auto_closed", 0)
+        bucket.player_messages = raw.get("player_messages", 0)
+        bucket.staff_messages = raw.get("staff_messages", 0)
+        bucket.first_reply = QuantileSketch.from_json(raw.get("first_reply", [0, []]))
+        bucket.duration = QuantileSketch.from_json(raw.get("duration", [0, []]))
+        return bucket
+
+
+Table = Dict[int, Dict[int, Dict[str, StatsBucket]]]
+
+
+def _slot(table: Table, guild_id: int, key: int, category: str) -> StatsBucket:
+    categories = table.setdefault(guild_id, {}).setdefault(key, {})
+    bucket = categories.get(category)
+    if bucket is None:
+        bucket = categories[category] = StatsBucket()
+    return bucket
+
+
+def _merge_into(merged: Dict[str, StatsBucket], per_category: Dict[str, StatsBucket], wanted: Optional[Set[str]]) -> None:
+    for category, bucket in per_category.items():
+        if wanted is not None and category not in wanted:
+            continue
+        total = merged.get(category)
+        if total is None:
+            total = merged[category] = StatsBucket()
+        total.merge(bucket)
+
+
+class TicketStats(SQLiteWriter):
+    # Statistiques tenues à jour au fil des événements, par serveur, heure et catégorie, avec un cumul par jour
+    # pour les longues périodes ; une période se lit en fusionnant ces buckets en mémoire, sans relire les transcripts.
+    # Seules les heures sont persistées : celles modifiées sont réécrites toutes les `persist_interval` secondes,
+    # celles au-delà de `retention_days` sont oubliées.
+    def __init__(self, path: str, retention_days: int = 400, persist_interval: float = 60.0):
+        super().__init__(path, batch_size=256, flush_interval=0.2, name="stats")
+        self.retention_days = retention_days
+        self.persist_interval = persist_interval
+        self._hours: Table = {}
+        self._days: Table = {}
+        self._dirty: Set[Tuple[int, int, str]] = set()
+        self._persister: Optional[asyncio.Task] = None
+
+    def _setup(self, conn: sqlite3.Connection) -> None:
+        conn.executescript(_SCHEMA)
+
+    def _oldest_hour(self) -> int:
+        return int(time.time() // HOUR) - self.retention_days * 24
+
+    def _load(self) -> Tuple[Table, Table]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT guild_id, hour, category, data FROM stats_hours WHERE hour >= ?", (self._oldest_hour(),)
+            ).fetchall()
+        finally:
+            conn.close()
+        hours: Table = {}
+        days: Table = {}
+        for guild_id, hour, category, data in rows:
+            bucket = StatsBucket.from_json(data)
+            hours.setdefault(guild_id, {}).setdefault(hour, {})[category] = bucket
+            _slot(days, guild_id, hour // 24, category).merge(bucket)
+        return hours, days
+
+    async def open(self) -> None:
+        if self._writer is not None:
+            return
+        await super().open()
+        self._hours, self._days = await asyncio.get_running_loop().run_in_executor(None, self._load)
+        self._persister = asyncio.create_task(self._persist_loop())
+
+    async def close(self) -> None:
+        if self._writer is None:
+            return
+        if self._persister is not None:
+            self._persister.cancel()
+            try:
+                await self._persister
+            except asyncio.CancelledError:
+                pass
+            self._persister = None
+        self.persist()
+        await super().close()
+
+    def _buckets(self, guild_id: int, category: str, ts: Optional[float]) -> Tuple[StatsBucket, StatsBucket]:
+        hour = int((time.time() if ts is None else ts) // HOUR)
+        self._dirty.add((guild_id, hour, category))
+        return _slot(self._hours, guild_id, hour, category), _slot(self._days, guild_id, hour // 24, category)
+
+    def ticket_opened(self, guild_id: int, category: str, ts: Optional[float] = None) -> None:
+        for bucket in self._buckets(guild_id, category, ts):
+            bucket.opened += 1
+
+    def message(self, guild_id: int, category: str, staff: bool, ts: Optional[float] = None) -> None:
+        for bucket in self._buckets(guild_id, category, ts):
+            if staff:
+                bucket.staff_messages += 1
+            else:
+                bucket.player_messages += 1
+
+    def first_reply(self, guild_id: int, category: str, seconds: float, ts: Optional[float] = None) -> None:
+        for bucket in self._buckets(guild_id, category, ts):
+            bucket.first_reply.add(seconds)
+
+    def ticket_closed(self, guild_id: int, category: str, seconds: float, auto_closed: bool = False,
+                      ts: Optional[float] = None) -> None:
+        for bucket in self._buckets(guild_id, category, ts):
+            bucket.closed += 1
+            if auto_closed:
+                bucket.auto_closed += 1
+            bucket.duration.add(seconds)
+
+    def persist(self) -> None:
+        # Sérialise les heures modifiées sur la boucle (quelques centaines d'octets chacune), le thread écrivain fait le reste.
+        dirty, self._dirty = self._dirty, set()
+        for guild_id, hour, category in dirty:
+            bucket = self._hours.get(guild_id, {}).get(hour, {}).get(category)
+            if bucket is None:
+                continue
+            self._submit(
+                "INSERT INTO stats_hours (guild_id, hour, category, data) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (guild_id, hour, category) DO UPDATE SET data = excluded.data",
+                (guild_id, hour, category, bucket.to_json()),
+            )
+        oldest = self._oldest_hour()
+        expired = False
+        for hours in self._hours.values():
+            for hour in [h for h in hours if h < oldest]:
+                del hours[hour]
+                expired = True
+        for days in self._days.values():
+            for day in [d for d in days if (d + 1) * 24 <= oldest]:
+                del days[day]
+        if expired:
+            self._submit("DELETE FROM stats_hours WHERE hour < ?", (oldest,))
+
+    async def _persist_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.persist_interval)
+            self.persist()
+
+    def summary(self, guild_id: int, since: float, until: Optional[float] = None,
+                categories: Optional[Iterable[str]] = None) -> Dict[str, StatsBucket]:
+        # Heures [since, until[ : les jours complets viennent du cumul journalier, seules les heures des bords
+        # sont fusionnées une à une (au plus 46), quelle que soit la longueur de la période.
+        hours = self._hours.get(guild_id, {})
+        days = self._days.get(guild_id, {})
+        first = int(since // HOUR)
+        last = int(((time.time() if until is None else until) - 1) // HOUR)
+        wanted = set(categories) if categories is not None else None
+        merged: Dict[str, StatsBucket] = {}
+        first_day = -(-first // 24)
+        last_day = (last + 1) // 24 - 1
+        if first_day <= last_day:
+            for day in range(first_day, last_day + 1):
+                if day in days:
+                    _merge_into(merged, days[day], wanted)
+            edges = [range(first, first_day * 24), range((last_day + 1) * 24, last + 1)]
+        else:
+            edges = [range(first, last + 1)]
+        for span in edges:
+            for hour in span:
+                if hour in hours:
+                    _merge_into(merged, hours[hour], wanted)
+        return merged
@@ -0,0 +1,207 @@
+import asyncio
+import sqlite3
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from utils.sqlite_writer import SQLiteWriter
+
+TS_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+def _ts_to_db(ts: datetime) -> str:
+    return ts.strftime(TS_FORMAT)
+
+
+def _ts_from_db(raw: str) -> datetime:
+    return datetime.strptime(raw, TS_FORMAT)
+
+
+class StoreSnapshot:
+    def __init__(self):
+        self.tickets: List[dict] = []
+        self.comments: Dict[Tuple[int, int], List[dict]] = {}
+        self.comment_counts: Dict[Tuple[int, int], int] = {}
+        self.closing: List[dict] = []
+
+
+class TicketStore(ABC):
+    def pending_writes(self) -> int:
+        return 0
+
+    @abstractmethod
+    async def open(self) -> None: ...
+
+    @abstractmethod
+    async def close(self) -> None: ...
+
+    @abstractmethod
+    async def flush(self) -> None: ...
+
+    @abstractmethod
+    async def load_snapshot(self, comments_per_user: int = 100) -> StoreSnapshot: ...
+
+    @abstractmethod
+    async def load_comments_page(self, guild_id: int, user_id: int, offset: int, limit: int) -> List[dict]: ...
+
+    @abstractmethod
+    def save_ticket(self, guild_id: int, user_id: int, channel_id: int, reason: str, opened_at: datetime) -> None: ...
+
+    @abstractmethod
+    def delete_ticket(self, guild_id: int, user_id: int, channel_id: int) -> None: ...
+
+    @abstractmethod
+    def mark_closing(self, guild_id: int, user_id: int, channel_id: int, channel_name: str, reason: str,
+                     opened_at: datetime, closed_at: datetime, auto_closed: bool) -> None: ...
+
+    @abstractmethod
+    def delete_closing(self, channel_id: int) -> None: ...
+
+    @abstractmethod
+    def add_comment(self, guild_id: int, user_id: int, comment: dict) -> None: ...
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    guild_id    INTEGER NOT NULL,
+    user_id     INTEGER NOT NULL,
+    channel_id  INTEGER NOT NULL UNIQUE,
+    reason      TEXT NOT NULL,
+    opened_at   TEXT NOT NULL,
+    PRIMARY KEY (guild_id, user_id)
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id    INTEGER NOT NULL,
+    user_id     INTEGER NOT NULL,
+    by          TEXT NOT NULL,
+    content     TEXT NOT NULL,
+    ts          TEXT NOT NULL,
+    channel_id  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_comments_guild_user ON comments (guild_id, user_id, ts);
+CREATE TABLE IF NOT EXISTS closing (
+    channel_id   INTEGER PRIMARY KEY,
+    guild_id     INTEGER NOT NULL,
+    user_id      INTEGER NOT NULL,
+    channel_name TEXT NOT NULL,
+    reason       TEXT NOT NULL,
+    opened_at    TEXT NOT NULL,
+    closed_at    TEXT NOT NULL,
+    auto_closed  INTEGER NOT NULL
+);
+"""
+
+
+class SQLiteTicketStore(SQLiteWriter, TicketStore):
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 0.05):
+        super().__init__(path, batch_size, flush_interval, name="ticket-store")
+
+    def _setup(self, conn: sqlite3.Connection) -> None:
+        conn.executescript(_SCHEMA)
+
+    def save_ticket(self, guild_id: int, user_id: int, channel_id: int, reason: str, opened_at: datetime) -> None:
+        self._submit(
+            "INSERT OR REPLACE INTO tickets (guild_id, user_id, channel_id, reason, opened_at) VALUES (?, ?, ?, ?, ?)",
+            (guild_id, user_id, channel_id, reason, _ts_to_db(opened_at)),
+        )
+
+    def delete_ticket(self, guild_id: int, user_id: int, channel_id: int) -> None:
+        self._submit(
+            "DELETE FROM tickets WHERE guild_id = ? AND user_id = ? AND channel_id = ?",
+            (guild_id, user_id, channel_id),
+        )
+
+    # Le ticket passe de `tickets` à `closing` jusqu'à ce que ses logs soient en file : une fermeture
+    # interrompue par un arrêt est reprise au démarrage. Même file d'écriture, donc même ordre.
+    def mark_closing(self, guild_id: int, user_id: int, channel_id: int, channel_name: str, reason: str,
+                     opened_at: datetime, closed_at: datetime, auto_closed: bool) -> None:
+        self._submit(
+            "INSERT OR REPLACE INTO closing (channel_id, guild_id, user_id, channel_name, reason, opened_at, closed_at,"
+            " auto_closed) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (channel_id, guild_id, user_id, channel_name, reason, _ts_to_db(opened_at), _ts_to_db(closed_at),
+             int(auto_closed)),
+        )
+        self.delete_ticket(guild_id, user_id, channel_id)
+
+    def delete_closing(self, channel_id: int) -> None:
+        self._submit("DELETE FROM closing WHERE channel_id = ?", (channel_id,))
+
+    def add_comment(self, guild_id: int, user_id: int, comment: dict) -> None:
+        self._submit(
+            "INSERT INTO comments (guild_id, user_id, by, content, ts, channel_id) VALUES (?, ?, ?, ?, ?, ?)",
+            (guild_id, user_id, comment["by"], comment["content"], _ts_to_db(comment["ts"]), comment["channel_id"]),
+        )
+
+    def _read_snapshot(self, comments_per_user: int) -> StoreSnapshot:
+        snap = StoreSnapshot()
+        conn = self._connect()
+        try:
+            # Une seule transaction de lecture : vue cohérente de tout l'état ouvert.
+            conn.execute("BEGIN")
+            for guild_id, user_id, channel_id, reason, opened_at in conn.execute(
+                "SELECT guild_id, user_id, channel_id, reason, opened_at FROM tickets"
+            ):
+                snap.tickets.append({
+                    "guild_id": guild_id,
+                    "user_id": user_id,
+                    "channel_id": channel_id,
+                    "reason": reason,
+                    "opened_at": _ts_from_db(opened_at),
+                })
+            for channel_id, guild_id, user_id, channel_name, reason, opened_at, closed_at, auto_closed in conn.execute(
+                "SELECT channel_id, guild_id, user_id, channel_name, reason, opened_at, closed_at, auto_closed FROM closing"
+            ):
+                snap.closing.append({
+                    "guild_id": guild_id,
+                    "user_id": user_id,
+                    "channel_id": channel_id,
+                    "channel_name": channel_name,
+                    "reason": reason,
+                    "opened_at": _ts_from_db(opened_at),
+                    "closed_at": _ts_from_db(closed_at),
+                    "auto_closed": bool(auto_closed),
+                })
+            for guild_id, user_id, by, content, ts, channel_id, total in conn.execute(
+                "SELECT guild_id, user_id, by, content, ts, channel_id, total FROM ("
+                "  SELECT *, ROW_NUMBER() OVER (PARTITION BY guild_id, user_id ORDER BY ts DESC, id DESC) AS rn,"
+                "         COUNT(*) OVER (PARTITION BY guild_id, user_id) AS total"
+                "  FROM comments"
+                ") WHERE rn <= ? ORDER BY guild_id, user_id, ts, id",
+                (comments_per_user,),
+            ):
+                key = (guild_id, user_id)
+                snap.comments.setdefault(key, []).append({
+                    "by": by,
+                    "content": content,
+                    "ts": _ts_from_db(ts),
+                    "channel_id": channel_id,
+                })
+                snap.comment_counts[key] = total
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return snap
+
+    async def load_snapshot(self, comments_per_user: int = 100) -> StoreSnapshot:
+        return await asyncio.get_running_loop().run_in_executor(None, self._read_snapshot, comments_per_user)
+
+    def _read_comments_page(self, guild_id: int, user_id: int, offset: int, limit: int) -> List[dict]:
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT by, content, ts, channel_id FROM comments WHERE guild_id = ? AND user_id = ? "
+                "ORDER BY ts DESC, id DESC LIMIT ? OFFSET ?",
+                (guild_id, user_id, limit, offset),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [
+            {"by": by, "content": content, "ts": _ts_from_db(ts), "channel_id": channel_id}
+            for by, content, ts, channel_id in rows
+        ]
+
+    async def load_comments_page(self, guild_id: int, user_id: int, offset: int, limit: int) -> List[dict]:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._read_comments_page, guild_id, user_id, offset, limit
+        )
@@ -0,0 +1,197 @@
+import asyncio
+import gzip
+import mmap
+import os
+import re
+import sqlite3
+import struct
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+SEGMENT_PATTERN = re.compile(r"^segment-(\d{6})\.bin$")
+COPY_CHUNK = 1 << 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    guild_id    INTEGER NOT NULL,
+    channel_id  INTEGER NOT NULL,
+    user_id     INTEGER NOT NULL,
+    category    TEXT NOT NULL,
+    reason      TEXT NOT NULL,
+    opened_at   INTEGER NOT NULL,
+    closed_at   INTEGER NOT NULL,
+    segment     INTEGER NOT NULL,
+    offset      INTEGER NOT NULL,
+    length      INTEGER NOT NULL,
+    raw_length  INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archived_user ON archived (guild_id, user_id, closed_at);
+CREATE INDEX IF NOT EXISTS idx_archived_closed ON archived (guild_id, closed_at);
+CREATE INDEX IF NOT EXISTS idx_archived_channel ON archived (channel_id);
+"""
+
+_COLUMNS = ("id, guild_id, channel_id, user_id, category, reason, opened_at, closed_at,"
+            " segment, offset, length, raw_length")
+
+
+class ArchiveRecord:
+    __slots__ = ("id", "guild_id", "channel_id", "user_id", "category", "reason",
+                 "opened_at", "closed_at", "segment", "offset", "length", "raw_length")
+
+    def __init__(self, id: int, guild_id: int, channel_id: int, user_id: int, category: str, reason: str,
+                 opened_at: int, closed_at: int, segment: int, offset: int, length: int, raw_length: int):
+        self.id = id
+        self.guild_id = guild_id
+        self.channel_id = channel_id
+        self.user_id = user_id
+        self.category = category
+        self.reason = reason
+        self.opened_at = opened_at
+        self.closed_at = closed_at
+        self.segment = segment
+        self.offset = offset
+        self.length = length
+        self.raw_length = raw_length
+
+
+def _gzip_size(path: str) -> int:
+    # Champ ISIZE de la fin du membre gzip : taille décompressée (modulo 2^32).
+    with open(path, "rb") as f:
+        f.seek(-4, os.SEEK_END)
+        return struct.unpack("<I", f.read(4))[0]
+
+
+class TranscriptArchive:
+    # Transcripts fermés ajoutés bout à bout (un membre gzip chacun) dans des segments de taille bornée ;
+    # un index SQLite donne segment/offset/longueur, la lecture ne décompresse que le ticket demandé.
+    def __init__(self, directory: str, segment_max_bytes: int = 64 * 1024 * 1024, max_open_segments: int = 8):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.max_open_segments = max_open_segments
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._segment = 0
+        self._segment_size = 0
+        self._maps: "OrderedDict[int, Tuple[object, mmap.mmap]]" = OrderedDict()
+        self._maps_lock = threading.Lock()
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.bin")
+
+    def _open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        conn = sqlite3.connect(os.path.join(self.directory, "index.db"), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+        self._conn = conn
+        segments = [int(m.group(1)) for m in map(SEGMENT_PATTERN.match, os.listdir(self.directory)) if m]
+        self._segment = max(segments, default=1)
+        # Taille utile = fin du dernier ticket indexé ; au-delà, ce sont les restes d'un ajout interrompu.
+        (end,) = conn.execute(
+            "SELECT COALESCE(MAX(offset + length), 0) FROM archived WHERE segment = ?", (self._segment,)
+        ).fetchone()
+        self._segment_size = end
+
+    async def open(self) -> None:
+        if self._conn is None:
+            await asyncio.get_running_loop().run_in_executor(None, self._open)
+
+    def _close(self) -> None:
+        with self._maps_lock:
+            for fp, mm in self._maps.values():
+                mm.close()
+                fp.close()
+            self._maps.clear()
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def close(self) -> None:
+        await asyncio.get_running_loop().run_in_executor(None, self._close)
+
+    def _append(self, guild_id: int, channel_id: int, user_id: int, category: str, reason: str,
+                opened_at: int, closed_at: int, blob_path: str) -> ArchiveRecord:
+        length = os.path.getsize(blob_path)
+        raw_length = _gzip_size(blob_path)
+        with self._lock:
+            if self._segment_size and self._segment_size + length > self.segment_max_bytes:
+                self._segment += 1
+                self._segment_size = 0
+            segment, offset = self._segment, self._segment_size
+            with open(blob_path, "rb") as src, open(self._segment_path(segment), "ab") as out:
+                # Repart de la fin du dernier ticket indexé : les octets orphelins d'un ajout interrompu sont écrasés.
+                out.truncate(offset)
+                while True:
+                    chunk = src.read(COPY_CHUNK)
+                    if not chunk:
+                        break
+                    out.write(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            self._segment_size = offset + length
+        with self._db_lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT INTO archived (guild_id, channel_id, user_id, category, reason, opened_at, closed_at,"
+                " segment, offset, length, raw_length) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (guild_id, channel_id, user_id, category, reason, opened_at, closed_at,
+                 segment, offset, length, raw_length),
+            )
+        os.remove(blob_path)
+        return ArchiveRecord(cur.lastrowid, guild_id, channel_id, user_id, category, reason,
+                             opened_at, closed_at, segment, offset, length, raw_length)
+
+    async def store(self, guild_id: int, channel_id: int, user_id: int, category: str, reason: str,
+                    opened_at: int, closed_at: int, blob_path: str) -> ArchiveRecord:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._append, guild_id, channel_id, user_id, category, reason, opened_at, closed_at, blob_path
+        )
+
+    def _query(self, sql: str, params: tuple) -> List[ArchiveRecord]:
+        with self._db_lock:
+            rows = self._conn.execute(f"SELECT {_COLUMNS} FROM archived WHERE {sql}", params).fetchall()
+        return [ArchiveRecord(*row) for row in rows]
+
+    async def get(self, guild_id: int, archive_id: int) -> Optional[ArchiveRecord]:
+        rows = await asyncio.get_running_loop().run_in_executor(
+            None, self._query, "guild_id = ? AND id = ?", (guild_id, archive_id)
+        )
+        return rows[0] if rows else None
+
+    async def for_user(self, guild_id: int, user_id: int, limit: int = 10) -> List[ArchiveRecord]:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._query, "guild_id = ? AND user_id = ? ORDER BY closed_at DESC LIMIT ?",
+            (guild_id, user_id, limit)
+        )
+
+    def _map(self, segment: int, end: int) -> mmap.mmap:
+        entry = self._maps.get(segment)
+        if entry is not None and len(entry[1]) >= end:
+            self._maps.move_to_end(segment)
+            return entry[1]
+        if entry is not None:
+            # Segment courant agrandi depuis le mappage : on le remappe à sa nouvelle taille.
+            entry[1].close()
+            entry[0].close()
+        fp = open(self._segment_path(segment), "rb")
+        mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        self._maps[segment] = (fp, mm)
+        self._maps.move_to_end(segment)
+        while len(self._maps) > self.max_open_segments:
+            _seg, (old_fp, old_mm) = self._maps.popitem(last=False)
+            old_mm.close()
+            old_fp.close()
+        return mm
+
+    def read_compressed(self, record: ArchiveRecord) -> bytes:
+        end = record.offset + record.length
+        with self._maps_lock:
+            return self._map(record.segment, end)[record.offset:end]
+
+    def read_text(self, record: ArchiveRecord) -> bytes:
+        return gzip.decompress(self.read_compressed(record))
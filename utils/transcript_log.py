@@ -0,0 +1,248 @@
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, Iterator, List, Optional
+
+READ_CHUNK = 1 << 20
+
+FLAG_INTERNAL = 1
+FLAG_ATTACHMENT = 2
+
+
+class TranscriptEntry:
+    __slots__ = ("ts", "by", "content", "flags")
+
+    def __init__(self, ts: int, by: str, content: str, flags: int = 0):
+        self.ts = ts
+        self.by = sys.intern(by)
+        self.content = content
+        self.flags = flags
+
+    @classmethod
+    def now(cls, by: str, content: str, internal: bool = False, is_attachment: bool = False) -> "TranscriptEntry":
+        flags = (FLAG_INTERNAL if internal else 0) | (FLAG_ATTACHMENT if is_attachment else 0)
+        return cls(int(time.time()), by, content, flags)
+
+    @property
+    def internal(self) -> bool:
+        return bool(self.flags & FLAG_INTERNAL)
+
+    @property
+    def is_attachment(self) -> bool:
+        return bool(self.flags & FLAG_ATTACHMENT)
+
+    @property
+    def when(self) -> datetime:
+        return datetime.utcfromtimestamp(self.ts)
+
+    def __repr__(self) -> str:
+        return f"TranscriptEntry(ts={self.ts}, by={self.by!r}, content={self.content!r}, flags={self.flags})"
+
+
+def _encode(entry: TranscriptEntry) -> str:
+    return json.dumps([entry.ts, entry.by, entry.content, entry.flags], ensure_ascii=False) + "\n"
+
+
+def _decode(line: str) -> TranscriptEntry:
+    return TranscriptEntry(*json.loads(line))
+
+
+def read_entries(path: str) -> Iterator[TranscriptEntry]:
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield _decode(line)
+
+
+def read_mirrors(path: str) -> Dict[str, str]:
+    # URL d'origine → copie locale, pour les pièces jointes dont la copie a abouti.
+    mirrors: Dict[str, str] = {}
+    if not os.path.exists(path):
+        return mirrors
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                url, ref = json.loads(line)
+                mirrors[url] = ref
+    return mirrors
+
+
+COPY_MARK = " (copie : "
+
+
+def with_mirrors(entries: Iterable[TranscriptEntry], mirrors: Dict[str, str]) -> Iterator[TranscriptEntry]:
+    # Une copie servie en HTTP (TICKET_ATTACHMENT_BASE_URL) remplace l'URL du CDN ; un simple chemin local
+    # est ajouté à côté de l'URL d'origine, qui reste le lien utilisable tant qu'elle n'a pas expiré.
+    for entry in entries:
+        ref = mirrors.get(entry.content) if entry.is_attachment else None
+        if ref is not None:
+            content = ref if "://" in ref else f"{entry.content}{COPY_MARK}{ref})"
+            entry = TranscriptEntry(entry.ts, entry.by, content, entry.flags)
+        yield entry
+
+
+class TranscriptLog:
+    # Journal append-only d'un ticket : seules les `tail_size` dernières entrées restent en mémoire.
+    # Les copies locales des pièces jointes, qui aboutissent après coup, vont dans un fichier à part
+    # (`mirrors_path`) appliqué au rendu : les entrées restent dans leur ordre d'arrivée.
+    def __init__(self, path: str, tail_size: int = 20):
+        self.path = path
+        self.mirrors_path = os.path.splitext(path)[0] + ".mirrors.jsonl"
+        self.tail: Deque[TranscriptEntry] = deque(maxlen=tail_size)
+        self.count = 0
+        self.bytes_written = 0
+        self._pending: List[str] = []
+        self._pending_mirrors: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[TranscriptEntry]:
+        return self.iter_entries()
+
+    def append(self, entry: TranscriptEntry) -> None:
+        line = _encode(entry)
+        with self._lock:
+            self._pending.append(line)
+        self.tail.append(entry)
+        self.count += 1
+
+    def add_mirror(self, url: str, ref: str) -> None:
+        line = json.dumps([url, ref], ensure_ascii=False) + "\n"
+        with self._lock:
+            self._pending_mirrors.append(line)
+
+    def has_pending(self) -> bool:
+        return bool(self._pending or self._pending_mirrors)
+
+    @staticmethod
+    def _write(path: str, lines: List[str], fsync: bool) -> int:
+        data = "".join(lines).encode("utf-8")
+        lines.clear()
+        with open(path, "ab") as f:
+            f.write(data)
+            f.flush()
+            if fsync:
+                os.fsync(f.fileno())
+        return len(data)
+
+    def flush(self, fsync: bool = True) -> None:
+        with self._lock:
+            if self._pending:
+                self.bytes_written += self._write(self.path, self._pending, fsync)
+            if self._pending_mirrors:
+                self._write(self.mirrors_path, self._pending_mirrors, fsync)
+
+    def load_existing(self) -> None:
+        if not os.path.exists(self.path):
+            return
+        count = 0
+        with open(self.path, "rb") as f:
+            while True:
+                chunk = f.read(READ_CHUNK)
+                if not chunk:
+                    break
+                count += chunk.count(b"\n")
+            size = f.tell()
+            start = max(0, size - READ_CHUNK)
+            f.seek(start)
+            lines = f.read().splitlines()
+        if start > 0 and lines:
+            lines = lines[1:]
+        self.count = count
+        self.bytes_written = size
+        self.tail.clear()
+        for line in lines[-(self.tail.maxlen or 0):]:
+            try:
+                self.tail.append(_decode(line.decode("utf-8")))
+            except (ValueError, KeyError):
+                continue
+
+    def iter_entries(self) -> Iterator[TranscriptEntry]:
+        self.flush(fsync=False)
+        yield from read_entries(self.path)
+
+    def move_to(self, directory: str) -> None:
+        self.flush()
+        os.makedirs(directory, exist_ok=True)
+        for path in (self.path, self.mirrors_path):
+            if os.path.exists(path):
+                os.replace(path, os.path.join(directory, os.path.basename(path)))
+
+    def remove(self) -> None:
+        with self._lock:
+            self._pending.clear()
+            self._pending_mirrors.clear()
+            for path in (self.path, self.mirrors_path):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+class TranscriptLogRegistry:
+    def __init__(self, directory: str, tail_size: int = 20, fsync_interval: float = 1.0):
+        self.directory = directory
+        self.tail_size = tail_size
+        self.fsync_interval = fsync_interval
+        self._logs: Dict[int, TranscriptLog] = {}
+        self._flusher: Optional[asyncio.Task] = None
+
+    def _path(self, channel_id: int) -> str:
+        return os.path.join(self.directory, f"{channel_id}.jsonl")
+
+    def open(self, channel_id: int) -> TranscriptLog:
+        log = self._logs.get(channel_id)
+        if log is None:
+            os.makedirs(self.directory, exist_ok=True)
+            log = TranscriptLog(self._path(channel_id), self.tail_size)
+            self._logs[channel_id] = log
+        return log
+
+    def preload(self, channel_ids: Iterable[int]) -> None:
+        for channel_id in channel_ids:
+            self.open(channel_id).load_existing()
+
+    def discard(self, channel_id: int) -> None:
+        log = self._logs.pop(channel_id, None) or TranscriptLog(self._path(channel_id))
+        log.remove()
+
+    def set_aside(self, channel_id: int, directory: str) -> None:
+        # Transcript dont les logs n'ont pas pu être mis en file : conservé pour un envoi à la main.
+        log = self._logs.pop(channel_id, None) or TranscriptLog(self._path(channel_id))
+        log.move_to(directory)
+
+    def total_bytes(self) -> int:
+        return sum(log.bytes_written for log in list(self._logs.values()))
+
+    def flush_all(self, fsync: bool = True) -> None:
+        for log in list(self._logs.values()):
+            if log.has_pending():
+                log.flush(fsync=fsync)
+
+    async def _flush_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            try:
+                await loop.run_in_executor(None, self.flush_all)
+            except OSError as e:
+                print(f"[transcripts] Échec d'écriture des transcripts : {e}")
+
+    def start(self) -> None:
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+        await asyncio.get_running_loop().run_in_executor(None, self.flush_all)
@@ -0,0 +1,161 @@
+import gzip
+import html
+import tempfile
+import time
+from typing import IO, Iterable, List, Optional
+
+from utils.transcript_log import COPY_MARK, TranscriptEntry
+
+MAX_DESC = 4000
+PREVIEW_MARGIN = 50
+SPOOL_MAX_MEMORY = 2 * 1024 * 1024
+
+_FENCE_OPEN = "```txt\n"
+_FENCE_CLOSE = "\n```"
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="fr"><head><meta charset="utf-8"><title>{title}</title>
+<style>
+body{{font-family:system-ui,sans-serif;background:#313338;color:#dbdee1;margin:2em}}
+h1{{font-size:1.3em}} pre.meta{{color:#949ba4}}
+.m{{padding:.3em 0;border-bottom:1px solid #3f4147}} .ts{{color:#949ba4;font-size:.85em}}
+.by{{font-weight:600;color:#f2f3f5}} .note{{background:#3c3a2a}} .tag{{color:#f0b232;font-size:.8em}}
+.c{{white-space:pre-wrap}} img{{max-width:480px;display:block;margin-top:.3em}}
+</style></head><body>
+<h1>{title}</h1><pre class="meta">{meta}</pre>
+"""
+_HTML_TAIL = "</body></html>\n"
+_IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".gif", ".webp")
+
+
+def _fmt_ts(ts: int) -> str:
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts))
+
+
+def format_entry(entry: TranscriptEntry) -> str:
+    content = (entry.content or "").strip()
+    tag_note = " [note]" if entry.internal else ""
+    tag_file = " [fichier]" if entry.is_attachment else ""
+    return f"[{_fmt_ts(entry.ts)} UTC]{tag_note}{tag_file} {entry.by}: {content}"
+
+
+def _html_entry(entry: TranscriptEntry) -> str:
+    content = (entry.content or "").strip()
+    classes = "m note" if entry.internal else "m"
+    tags = ""
+    if entry.internal:
+        tags += ' <span class="tag">[note]</span>'
+    if entry.is_attachment:
+        tags += ' <span class="tag">[fichier]</span>'
+        link, _mark, copy = content.partition(COPY_MARK)
+        url = html.escape(link, quote=True)
+        body = f'<a href="{url}">{url}</a>'
+        if copy:
+            body += html.escape(COPY_MARK + copy)
+        if link.lower().split("?", 1)[0].endswith(_IMAGE_EXTS):
+            body += f'<img src="{url}" alt="">'
+    else:
+        body = html.escape(content)
+    return (
+        f'<div class="{classes}"><span class="ts">{_fmt_ts(entry.ts)} UTC</span> '
+        f'<span class="by">{html.escape(entry.by)}</span>{tags}<div class="c">{body}</div></div>\n'
+    )
+
+
+class RenderedTranscript:
+    def __init__(self):
+        self.preview = ""
+        self.truncated = False
+        self.entries = 0
+        self.attachment: Optional[IO[bytes]] = None
+        self.attachment_name: Optional[str] = None
+        self.html: Optional[IO[bytes]] = None
+        self.html_name: Optional[str] = None
+
+    def close(self) -> None:
+        for fp in (self.attachment, self.html):
+            if fp is not None:
+                fp.close()
+        self.attachment = None
+        self.html = None
+
+
+def render_transcript(entries: Iterable[TranscriptEntry],
+                      header: str,
+                      basename: str,
+                      title: str = "Transcript Ticket",
+                      gzip_output: bool = False,
+                      html_output: bool = False,
+                      max_desc: int = MAX_DESC,
+                      archive: Optional[IO[bytes]] = None) -> RenderedTranscript:
+    # Une seule passe : l'aperçu de l'embed se remplit jusqu'au budget pendant que
+    # le texte complet est écrit au fil de l'eau dans la pièce jointe (et dans `archive` si fournie).
+    out = RenderedTranscript()
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    sink: IO[bytes] = gzip.GzipFile(fileobj=spool, mode="wb", mtime=0) if gzip_output else spool
+    html_spool = None
+    if html_output:
+        html_spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        html_spool.write(_HTML_HEAD.format(title=html.escape(title), meta=html.escape(header)).encode("utf-8"))
+
+    sink.write(header.encode("utf-8"))
+    if archive is not None:
+        archive.write(header.encode("utf-8"))
+
+    budget = max_desc - len(_FENCE_OPEN) - len(_FENCE_CLOSE)
+    cut_budget = max_desc - PREVIEW_MARGIN
+    acc: List[str] = []
+    acc_len = 0
+    cut_index = 0
+    total_chars = 0
+    total_lines = 0
+    first = True
+
+    for entry in entries:
+        text = format_entry(entry)
+        raw = text.encode("utf-8") + b"\n"
+        sink.write(raw)
+        if archive is not None:
+            archive.write(raw)
+        if html_spool is not None:
+            html_spool.write(_html_entry(entry).encode("utf-8"))
+        out.entries += 1
+
+        total_chars += len(text) + (0 if first else 1)
+        first = False
+        if acc_len <= budget:
+            for line in (text + "\n").splitlines(True):
+                acc.append(line)
+                acc_len += len(line)
+                if acc_len <= cut_budget:
+                    cut_index = len(acc)
+                if acc_len > budget:
+                    break
+        total_lines += text.count("\n") + 1
+
+    if total_chars <= budget:
+        body = "".join(acc).rstrip("\n")
+        out.preview = f"{_FENCE_OPEN}{body}{_FENCE_CLOSE}"
+    else:
+        out.truncated = True
+        hidden = max(0, total_lines - cut_index)
+        body = "".join(acc[:cut_index]).rstrip() + f"\n… (+{hidden} lignes masquées)"
+        out.preview = f"{_FENCE_OPEN}{body}{_FENCE_CLOSE}"
+
+    if gzip_output:
+        sink.close()
+
+    if out.truncated:
+        spool.seek(0)
+        out.attachment = spool
+        out.attachment_name = f"{basename}.txt.gz" if gzip_output else f"{basename}.txt"
+    else:
+        spool.close()
+
+    if html_spool is not None:
+        html_spool.write(_HTML_TAIL.encode("utf-8"))
+        html_spool.seek(0)
+        out.html = html_spool
+        out.html_name = f"{basename}.html"
+
+    return out